@@ -1,25 +1,14 @@
 # Importação.py
 import streamlit as st
-import pandas as pd
 import os
+import time
 import uuid
-from dotenv import load_dotenv
 
 from app_utils.auto_refresh import set_auto_refresh_controller
-from tasks import process_csv
-from celery import Celery
+from app_utils.connections import PROCESS_CSV_TASK, get_celery_app
 
 global count
 
-load_dotenv()
-redis_host = os.getenv('REDIS_HOST')
-redis_port = os.getenv('REDIS_PORT')
-app = Celery(
-    'tasks',
-    broker=f'redis://{redis_host}:{redis_port}/0',
-    backend=f'redis://{redis_host}:{redis_port}/0'
-)
-
 
 def main():
     hide_streamlit_style = """
@@ -53,8 +42,12 @@ def main():
             with open(temp_file_path, 'wb') as f:
                 f.write(uploaded_file.getbuffer())
 
-            # Enviar tarefa para o Celery
-            task = process_csv.delay(temp_file_path)
+            # Enviar tarefa para o Celery; published_at alimenta a métrica de espera na fila do worker
+            task = get_celery_app().send_task(
+                PROCESS_CSV_TASK,
+                args=[temp_file_path],
+                headers={'published_at': time.time()}
+            )
             st.session_state.task_ids.append(task.id)
             st.success(f'Tarefa {task.id} enviada para processamento!')
         else:
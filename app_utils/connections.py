@@ -0,0 +1,40 @@
+import os
+
+import streamlit as st
+from dotenv import load_dotenv
+
+# Nome da tarefa registrada no worker: o app publica por nome, sem importar tasks.py (cliente do GLPI, pandas...)
+PROCESS_CSV_TASK = 'tasks.process_csv'
+
+# Roda uma vez por processo do Streamlit (o módulo fica em cache entre os reruns)
+load_dotenv()
+
+
+def _redis_url() -> str:
+    return f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}/0"
+
+
+@st.cache_resource
+def get_celery_app():
+    """
+    Celery app used by the pages to publish imports and read task states,
+    built once per Streamlit process instead of on every rerun.
+    """
+    from celery import Celery
+
+    return Celery('tasks', broker=_redis_url(), backend=_redis_url())
+
+
+@st.cache_resource
+def get_result_backend():
+    """
+    Result backend shared by every session. ``app.backend`` is per thread in
+    Celery and Streamlit runs each rerun in a new thread, so without this each
+    rerun would open a new backend and Redis connection pool.
+    """
+    return get_celery_app().backend
+
+
+def get_redis_client():
+    # Mesmo pool de conexões do backend de resultados (o Redis do progresso e o do Celery são o mesmo)
+    return get_result_backend().client
@@ -0,0 +1,62 @@
+import os
+
+from app_utils.task_rows import load_result_csv
+from glpi_importer.result_store import RESULT_FILTERS, columnar_paths, export_result_csv, read_actor_logs, read_result_page
+from glpi_importer.streaming import path_with_suffix
+
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def _download(st_app, label, file_name, cache_key, build):
+    # O CSV só é gerado quando pedido, e guardado na sessão: reruns (auto-refresh) não o releem
+    downloads = st_app.session_state.setdefault('result_downloads', {})
+    if cache_key not in downloads:
+        if not st_app.button(f'Preparar {label}', key=f'prepare_{cache_key}'):
+            return
+        downloads[cache_key] = build()
+    st_app.download_button(label, downloads[cache_key], file_name=file_name, mime='text/csv', key=f'download_{cache_key}')
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def show_result(st_app, result_csv_path, key):
+    """
+    Shows a processed import. With its Parquet copy, each rerun reads only the
+    page being shown, filtered in the file; results written before it (CSV
+    only) are loaded whole, once per session.
+
+    :param key: prefix of the widget keys, unique per task shown on the page
+    """
+    if not os.path.exists(result_csv_path):
+        # Arquivo removido (limpeza da pasta de processados) ou em outro volume
+        st_app.error('O arquivo de resultado não foi encontrado.')
+        return
+    path, actors_path = columnar_paths(result_csv_path)
+    csv_name = os.path.basename(result_csv_path)
+    modified = os.path.getmtime(result_csv_path)
+    if not os.path.exists(path):
+        st_app.dataframe(load_result_csv(st_app, result_csv_path))
+        _download(st_app, 'CSV', csv_name, f'{key}_{modified}', lambda: _read_file(result_csv_path))
+        return
+
+    filter_col, size_col, page_col = st_app.columns(3)
+    filter_name = filter_col.selectbox('Linhas', list(RESULT_FILTERS), key=f'{key}_filter')
+    page_size = size_col.selectbox('Linhas por página', PAGE_SIZES, key=f'{key}_page_size')
+    page_number = page_col.number_input('Página', min_value=1, value=1, step=1, key=f'{key}_page')
+    row_filter = RESULT_FILTERS[filter_name]
+    page, total = read_result_page(path, (page_number - 1) * page_size, page_size, row_filter)
+    st_app.caption(f'{total} linhas, página {page_number} de {max(-(-total // page_size), 1)}')
+    st_app.dataframe(page)
+    if not page.empty:
+        with st_app.expander('Logs dos atores desta página'):
+            st_app.dataframe(read_actor_logs(actors_path, page.index.tolist()), hide_index=True)
+
+    _download(st_app, 'CSV completo', csv_name, f'{key}_{modified}', lambda: _read_file(result_csv_path))
+    if row_filter is not None:
+        _download(
+            st_app, f'CSV ({filter_name.lower()})', path_with_suffix(csv_name, '_filtrado'),
+            f'{key}_{modified}_{filter_name}', lambda: export_result_csv(path, row_filter)
+        )
@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+
+from glpi_importer.progress import read_new_rows
+
+# Entradas lidas do stream por chamada ao Redis
+ROWS_PER_READ = 10_000
+
+
+def load_task_rows(st_app, redis_client, task_id):
+    """
+    Row outcomes published by the worker for ``task_id``. They are kept in the
+    session with the id of the last stream entry read, so each rerun only
+    fetches the rows finished since the previous one.
+
+    :return: DataFrame indexed by the row position in the upload, or None when nothing was published
+    """
+    cache = st_app.session_state.setdefault('task_rows', {})
+    last_id, frames = cache.get(task_id, ('0', []))
+    while True:
+        rows, last_id = read_new_rows(redis_client, task_id, last_id, count=ROWS_PER_READ)
+        if rows:
+            frames.append(pd.DataFrame(rows))
+        if len(rows) < ROWS_PER_READ:
+            break
+    if len(frames) > 1:
+        frames = [pd.concat(frames, ignore_index=True)]
+    cache[task_id] = (last_id, frames)
+    if not frames:
+        return None
+    # Blocos do fan-out terminam fora de ordem
+    return frames[0].set_index('position').sort_index()
+
+
+def load_result_csv(st_app, result_csv_path):
+    """
+    Result CSV kept in the session while the file does not change, instead of
+    being read again on every click or auto-refresh.
+    """
+    cache = st_app.session_state.setdefault('result_csv', {})
+    modified = os.path.getmtime(result_csv_path)
+    if result_csv_path not in cache or cache[result_csv_path][0] != modified:
+        cache[result_csv_path] = (modified, pd.read_csv(result_csv_path))
+    return cache[result_csv_path][1]
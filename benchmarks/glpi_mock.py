@@ -0,0 +1,223 @@
+"""
+Local stand-in for the GLPI REST endpoints used by the importer.
+
+Answers ``initSession``/``killSession``, ``Ticket`` (POST, GET and PUT
+``Ticket/{id}``), ``TicketTask`` and the ``Ticket_User``/``Group_Ticket``
+actor endpoints (single and batched POSTs, GETs), keeping the tickets in
+memory so the single-shot and ``poll`` flows see what was stored.
+
+Run it standalone and point ``GLPI_API_ENDPOINT`` at it::
+
+    python -m benchmarks.glpi_mock --port 8090 --latency 0.05 --error-rate 0.01 --session-lifetime 60
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from glpi_client.payloads import ACTOR_TYPES
+
+API_PATH = '/apirest.php'
+ACTOR_ENDPOINTS = {'Ticket_User': 'users', 'Group_Ticket': 'groups'}
+# '_users_id_requester' -> ('users', 1)
+INLINE_ACTOR_FIELDS = {
+    f'_{kind}_id_{type_name}': (kind, type_id)
+    for kind in ('users', 'groups')
+    for type_id, type_name in ACTOR_TYPES.items()
+}
+
+
+class GLPIMockServer:
+    """
+    Threaded HTTP server faking GLPI.
+
+    :param latency: seconds added to every answer (0 = as fast as possible)
+    :param jitter: random extra latency, between 0 and ``jitter`` seconds
+    :param error_rate: fraction of the API requests (not ``initSession``) answered with ``error_status``
+    :param error_status: status of the injected errors; 429/503 are retried even for POSTs
+    :param session_lifetime: seconds a session token stays valid, after that requests get a 401 (0 = never expires)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, session_lifetime: float = 0.0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.session_lifetime = session_lifetime
+        self.stats = Counter()
+        self._tickets = {}
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{API_PATH}'
+
+    def start(self) -> 'GLPIMockServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='glpi-mock', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def __enter__(self) -> 'GLPIMockServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def _open_session(self) -> str:
+        token = f'mock{self._next_id()}'
+        with self._lock:
+            self._sessions[token] = time.monotonic()
+        self._count('sessions_opened')
+        return token
+
+    def _session_valid(self, token: str | None) -> bool:
+        with self._lock:
+            opened_at = self._sessions.get(token)
+            if opened_at is None:
+                return False
+            if self.session_lifetime and time.monotonic() - opened_at > self.session_lifetime:
+                del self._sessions[token]
+                self._count('sessions_expired')
+                return False
+            return True
+
+    def _kill_session(self, token: str | None) -> None:
+        with self._lock:
+            self._sessions.pop(token, None)
+        self._count('sessions_killed')
+
+    def handle(self, method: str, path: str, token: str | None, body) -> tuple[int, object]:
+        """
+        :return: status code and JSON body of the answer
+        """
+        if path == '/initSession':
+            return 200, {'session_token': self._open_session()}
+        if path == '/killSession':
+            self._kill_session(token)
+            return 200, {}
+        if not self._session_valid(token):
+            return 401, ['ERROR_SESSION_TOKEN_INVALID', 'session_token seems invalid']
+        if self.error_rate and random.random() < self.error_rate:
+            self._count('errors_injected')
+            return self.error_status, ['ERROR', 'erro injetado pelo mock']
+
+        match = re.fullmatch(r'/Ticket(?:/(\d+)(?:/(\w+))?)?|/TicketTask', path)
+        if match is None:
+            return 400, ['ERROR_RESOURCE_NOT_FOUND_NOR_COMMONDBTM', '']
+        ticket_id, child = match.groups()
+        if path == '/TicketTask' and method == 'POST':
+            return 201, {'id': self._next_id(), 'message': ''}
+        if ticket_id is None and method == 'POST':
+            return 201, {'id': self._add_ticket(body['input']), 'message': ''}
+
+        with self._lock:
+            ticket = self._tickets.get(int(ticket_id)) if ticket_id else None
+        if ticket is None:
+            return 404, ['ERROR_ITEM_NOT_FOUND', '']
+        if child is None:
+            if method == 'PUT':
+                ticket['status'] = body['input']['status']
+                return 200, [{ticket_id: True, 'message': ''}]
+            return 200, {'id': int(ticket_id), 'status': ticket['status']}
+        if child not in ACTOR_ENDPOINTS:
+            return 400, ['ERROR_RESOURCE_NOT_FOUND_NOR_COMMONDBTM', '']
+        actors = ticket[ACTOR_ENDPOINTS[child]]
+        if method == 'GET':
+            return 200, list(actors)
+        items = body['input'] if isinstance(body['input'], list) else [body['input']]
+        actors.extend(items)
+        answers = [{'id': self._next_id(), 'message': ''} for _ in items]
+        return 201, answers if isinstance(body['input'], list) else answers[0]
+
+    def _add_ticket(self, fields: dict) -> int:
+        ticket = {'status': fields.get('status', 1), 'users': [], 'groups': []}
+        for field, values in fields.items():
+            if field in INLINE_ACTOR_FIELDS:
+                kind, type_id = INLINE_ACTOR_FIELDS[field]
+                ticket[kind].extend({f'{kind}_id': value, 'type': type_id} for value in values)
+        ticket_id = self._next_id()
+        with self._lock:
+            self._tickets[ticket_id] = ticket
+        return ticket_id
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Cabeçalhos e corpo saem em escritas separadas: sem isso o Nagle soma ~40 ms a cada resposta
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _answer(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                path = self.path.split('?')[0]
+                path = path[len(API_PATH):] if path.startswith(API_PATH) else path
+                mock._count(f'{self.command} {re.sub(r"/[0-9]+", "/{id}", path)}')
+                if mock.latency or mock.jitter:
+                    time.sleep(mock.latency + random.uniform(0, mock.jitter))
+                status, answer = mock.handle(self.command, path, self.headers.get('Session-Token'), body)
+                data = json.dumps(answer).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = _answer
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Servidor local que imita a API REST do GLPI')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.0, help='segundos somados a cada resposta')
+    parser.add_argument('--jitter', type=float, default=0.0, help='latência extra aleatória, até este valor')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração das requisições respondidas com erro')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--session-lifetime', type=float, default=0.0,
+                        help='segundos até a sessão expirar (401); 0 = nunca')
+    args = parser.parse_args()
+    server = GLPIMockServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status,
+                            args.session_lifetime)
+    print(f'GLPI mock em {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
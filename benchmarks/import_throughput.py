@@ -0,0 +1,226 @@
+"""
+End-to-end throughput benchmark of ``tasks.process_csv`` against the local
+GLPI mock (:mod:`benchmarks.glpi_mock`).
+
+For every size a synthetic CSV (with actors, status and task columns, like
+``example.csv``) is imported in a fresh process, so the peak RSS reported is
+the one of that import alone. The task runs eagerly (no broker, result
+backend in memory); the ``IMPORT_*``/``GLPI_*`` variables of the environment
+apply as in the worker::
+
+    IMPORT_ENGINE=asyncio IMPORT_CONCURRENCY=8 python -m benchmarks.import_throughput --rows 100 1000 10000 \\
+        --latency 0.02 --output bench.json
+
+    # mesma medição depois da alteração; termina com código 1 se houver regressão
+    python -m benchmarks.import_throughput --rows 100 1000 10000 --latency 0.02 --baseline bench.json
+
+Fan-out (``IMPORT_CHUNK_ROWS``) and the journal (``IMPORT_JOURNAL``) need
+Redis and are turned off here. ``IMPORT_STATUS_WAIT`` defaults to ``poll``:
+the ``sleep`` mode would only measure its fixed pause.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.glpi_mock import GLPIMockServer
+from glpi_importer.streaming import CSV_OPTIONS
+
+DEFAULT_ROWS = [100, 1_000, 10_000]
+
+
+def write_synthetic_csv(file_path: str, rows: int, seed: int = 0) -> None:
+    """
+    Writes ``rows`` tickets with 1 to 3 users, 0 or 1 group, a status (some of
+    them closed, without task) and a task.
+    """
+    rng = np.random.default_rng(seed)
+    index = np.arange(rows)
+    users = pd.Series([
+        ','.join(f'{user_id}:{user_type}' for user_id, user_type in zip(rng.integers(2, 500, count), rng.integers(1, 4, count)))
+        for count in rng.integers(1, 4, rows)
+    ])
+    groups = pd.Series(np.where(rng.random(rows) < 0.5, [f'{group_id}:2' for group_id in rng.integers(1, 50, rows)], ''))
+    pd.DataFrame({
+        'ticket_name': [f'Benchmark {i}' for i in index],
+        'ticket_content': 'Ticket criado pelo benchmark de importação',
+        'ticket_status': rng.choice([1, 2, 5, 6], rows),
+        'ticket_type': rng.integers(1, 3, rows),
+        'ticket_actors_users': users,
+        'ticket_actors_groups': groups,
+        'task_content': 'Tarefa criada pelo benchmark de importação',
+        'task_state': rng.integers(1, 3, rows),
+    }).to_csv(file_path, index=False, **CSV_OPTIONS)
+
+
+def _percentiles_ms(values: list) -> dict:
+    if not values:
+        return {'calls': 0, 'p50_ms': None, 'p99_ms': None}
+    p50, p99 = np.percentile(values, [50, 99]).tolist()
+    return {'calls': len(values), 'p50_ms': round(p50 * 1000, 2), 'p99_ms': round(p99 * 1000, 2)}
+
+
+def _run_import(csv_path: str, rows: int, glpi_url: str, processed_folder: str, results) -> None:
+    """
+    Child process: imports ``csv_path`` with ``tasks.process_csv`` and puts the measurements in ``results``.
+    """
+    os.environ.update(GLPI_API_ENDPOINT=glpi_url, PROCESSED_FOLDER=processed_folder, IMPORT_CHUNK_ROWS='0',
+                      IMPORT_JOURNAL='0', GLPI_RATE_LIMIT_SCOPE='local')
+    os.environ.setdefault('IMPORT_STATUS_WAIT', 'poll')
+    os.environ.setdefault('GLPI_APP_USER', 'benchmark')
+    os.environ.setdefault('GLPI_APP_PASS', 'benchmark')
+
+    from glpi_client import metrics
+    import tasks
+
+    tasks.app.conf.update(task_always_eager=True, result_backend='cache+memory://')
+
+    # Latência de cada tentativa, vista pelo cliente (inclui a fila do pool de conexões)
+    latencies = defaultdict(list)
+    observe_response, observe_error = metrics.observe_response, metrics.observe_error
+
+    def record_response(endpoint, seconds, response):
+        latencies[endpoint].append(seconds)
+        observe_response(endpoint, seconds, response)
+
+    def record_error(endpoint, seconds, error):
+        latencies[endpoint].append(seconds)
+        observe_error(endpoint, seconds, error)
+
+    metrics.observe_response, metrics.observe_error = record_response, record_error
+
+    # Os prints do cliente e da tarefa vão para o devnull: o custo de formatá-los continua na medição
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        result = tasks.process_csv.apply(args=[csv_path]).result
+        seconds = time.perf_counter() - started
+        tasks.close_glpi_sessions()
+
+    if result['status'] == 'failed':
+        results.put({'rows': rows, 'error': result['error']})
+        return
+    all_calls = [value for values in latencies.values() for value in values]
+    results.put({
+        'rows': rows,
+        'engine': tasks.import_engine,
+        'concurrency': tasks.import_concurrency,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds, 2),
+        'failed_rows': len(result.get('error', [])),
+        # ru_maxrss em KiB no Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'latency': _percentiles_ms(all_calls),
+        'endpoints': {endpoint: _percentiles_ms(values) for endpoint, values in sorted(latencies.items())},
+        'retries': tasks.session_pool.retry_policy.counters(),
+    })
+
+
+def run_benchmark(rows: int, mock_options: dict, work_dir: str) -> dict:
+    csv_path = os.path.join(work_dir, f'bench_{rows}.csv')
+    write_synthetic_csv(csv_path, rows)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    with GLPIMockServer(**mock_options) as server:
+        process = context.Process(target=_run_import, args=(csv_path, rows, server.url, work_dir, results))
+        process.start()
+        measurement = results.get()
+        process.join()
+        measurement['mock'] = dict(server.stats)
+    os.remove(csv_path)
+    return measurement
+
+
+def print_report(measurement: dict) -> None:
+    if 'error' in measurement:
+        print(f"{measurement['rows']:>8} linhas  FALHA: {measurement['error']}")
+        return
+    latency = measurement['latency']
+    print(
+        f"{measurement['rows']:>8} linhas  {measurement['seconds']:>9.2f} s  {measurement['rows_per_second']:>9.1f} linhas/s  "
+        f"p50 {latency['p50_ms']} ms  p99 {latency['p99_ms']} ms  RSS máx. {measurement['peak_rss_mb']} MB  "
+        f"falhas {measurement['failed_rows']}"
+    )
+    for endpoint, stats in measurement['endpoints'].items():
+        print(f"{'':>10}{endpoint:<36} {stats['calls']:>8} chamadas  p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms")
+
+
+def find_regressions(measurements: list, baseline: list, tolerance: float) -> list:
+    """
+    :return: one message per size whose rows/s dropped, or whose peak RSS or
+        p99 latency grew, by more than ``tolerance`` compared to ``baseline``
+    """
+    previous = {item['rows']: item for item in baseline if 'error' not in item}
+    regressions = []
+    for measurement in measurements:
+        before = previous.get(measurement['rows'])
+        if before is None:
+            continue
+        if 'error' in measurement:
+            regressions.append(f"{measurement['rows']} linhas: importação falhou")
+            continue
+        if measurement['rows_per_second'] < before['rows_per_second'] * (1 - tolerance):
+            regressions.append(
+                f"{measurement['rows']} linhas: {measurement['rows_per_second']} linhas/s (antes {before['rows_per_second']})"
+            )
+        if measurement['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(
+                f"{measurement['rows']} linhas: RSS máx. {measurement['peak_rss_mb']} MB (antes {before['peak_rss_mb']})"
+            )
+        if measurement['latency']['p99_ms'] > before['latency']['p99_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{measurement['rows']} linhas: p99 {measurement['latency']['p99_ms']} ms "
+                f"(antes {before['latency']['p99_ms']})"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark de ponta a ponta do process_csv contra o mock do GLPI')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='tamanhos dos CSVs sintéticos')
+    parser.add_argument('--latency', type=float, default=0.0, help='latência do mock, em segundos')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--session-lifetime', type=float, default=0.0)
+    parser.add_argument('--output', help='salva as medições neste arquivo JSON')
+    parser.add_argument('--baseline', help='medições anteriores (JSON) para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='variação aceita em relação ao baseline')
+    args = parser.parse_args()
+
+    mock_options = {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'error_status': args.error_status,
+        'session_lifetime': args.session_lifetime,
+    }
+    measurements = []
+    with tempfile.TemporaryDirectory(prefix='glpi_bench_') as work_dir:
+        for rows in args.rows:
+            measurement = run_benchmark(rows, mock_options, work_dir)
+            print_report(measurement)
+            measurements.append(measurement)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(measurements, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = find_regressions(measurements, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSÃO >> {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
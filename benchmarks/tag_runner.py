@@ -0,0 +1,364 @@
+"""
+Benchmark of :class:`glpi_tag_manager.runner.Runner` on a seeded copy of the
+GLPI tables it reads, with the indexes GLPI creates on them.
+
+The tables are seeded with the volumes given, the runner is started on them
+and, before each cycle, ``--closed-per-cycle`` tasks are closed and
+``--followups-per-cycle`` follow-ups are added. Each phase of the cycle
+(``check_active_tasks``, ``link_return_tag``, ``process_glpi_followups``) is
+timed, with the number of queries sent and of rows fetched::
+
+    python -m benchmarks.tag_runner --tickets 50000 --tasks 200000 --followups 1000000 --cycles 5 --output runner.json
+    TASKS_TRACKING=incremental python -m benchmarks.tag_runner ... --baseline runner.json
+
+The runner variables (``TASKS_TRACKING``, ``FOLLOWUPS_BATCH``,
+``TAG_RULES_FILE``...) apply as in production. SQLite is used by default; with
+``--database-url`` pointing at MySQL the six tables are DROPPED and recreated
+there, so use a scratch database.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import (Column, DateTime, Index, Integer, MetaData, String, Table, UniqueConstraint, create_engine,
+                        event, insert, update)
+
+from glpi_tag_manager.runner import Runner
+
+PHASES = ['check_active_tasks', 'link_return_tag', 'process_glpi_followups']
+SEED_BATCH = 10_000
+
+metadata = MetaData()
+glpi_tickets = Table(
+    'glpi_tickets', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('status', Integer),
+    Column('itilcategories_id', Integer),
+    Column('date_mod', DateTime),
+    Index('status', 'status'),
+    Index('itilcategories_id', 'itilcategories_id'),
+)
+glpi_tickettasks = Table(
+    'glpi_tickettasks', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('tickets_id', Integer),
+    Column('state', Integer),
+    Column('users_id_tech', Integer),
+    Column('date_mod', DateTime),
+    Index('tickets_id', 'tickets_id'),
+    Index('state', 'state'),
+    Index('date_mod', 'date_mod'),
+)
+glpi_itilfollowups = Table(
+    'glpi_itilfollowups', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('itemtype', String(100)),
+    Column('items_id', Integer),
+    Column('users_id', Integer),
+    Column('date_mod', DateTime),
+    Index('item_id', 'items_id'),
+    Index('item', 'itemtype', 'items_id'),
+    Index('users_id', 'users_id'),
+)
+glpi_tickets_users = Table(
+    'glpi_tickets_users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('tickets_id', Integer),
+    Column('users_id', Integer),
+    Column('type', Integer),
+    UniqueConstraint('tickets_id', 'type', 'users_id', name='unicity'),
+    Index('user', 'users_id', 'type'),
+)
+glpi_groups_tickets = Table(
+    'glpi_groups_tickets', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('tickets_id', Integer),
+    Column('groups_id', Integer),
+    Column('type', Integer),
+    UniqueConstraint('tickets_id', 'type', 'groups_id', name='unicity'),
+    Index('group', 'groups_id', 'type'),
+)
+glpi_plugin_tag_tagitems = Table(
+    'glpi_plugin_tag_tagitems', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('plugin_tag_tags_id', Integer),
+    Column('items_id', Integer),
+    Column('itemtype', String(255)),
+    UniqueConstraint('items_id', 'itemtype', 'plugin_tag_tags_id', name='unicity'),
+)
+
+# No SQLite os nomes de índice são globais; no MySQL (como no GLPI) são por tabela
+for table in metadata.tables.values():
+    for index in table.indexes:
+        index.name = f'{table.name}_{index.name}'
+
+
+def _insert_rows(connection, table: Table, columns: dict) -> None:
+    """
+    :param columns: one numpy array per column, all of the same length
+    """
+    total = len(next(iter(columns.values())))
+    for start in range(0, total, SEED_BATCH):
+        connection.execute(insert(table), [
+            dict(zip(columns, values))
+            for values in zip(*(array[start:start + SEED_BATCH].tolist() for array in columns.values()))
+        ])
+
+
+def _past_dates(rng, count: int) -> np.ndarray:
+    # Alterações espalhadas pelo último ano, como numa base em uso
+    now = datetime.now().replace(microsecond=0)
+    return np.array([now - timedelta(seconds=seconds) for seconds in rng.integers(60, 365 * 24 * 3600, count).tolist()],
+                    dtype=object)
+
+
+def seed(engine, tickets: int, tasks: int, followups: int, users: int, tagged: float, seed_value: int = 0):
+    """
+    Recreates the tables and fills them: 1 to 3 user actors and 0 to 1 group
+    per ticket, ``tasks`` tasks (about a third of them closed), ``followups``
+    follow-ups and the tags 8/9 on a ``tagged`` fraction of the tickets.
+
+    :return: ids of the tasks left open, in random order
+    """
+    rng = np.random.default_rng(seed_value)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        ticket_ids = np.arange(1, tickets + 1)
+        _insert_rows(connection, glpi_tickets, {
+            'id': ticket_ids,
+            'status': rng.integers(1, 7, tickets),
+            'itilcategories_id': rng.integers(0, 20, tickets),
+        })
+
+        actor_tickets = np.repeat(ticket_ids, rng.integers(1, 4, tickets))
+        actors = np.unique(np.column_stack([
+            actor_tickets, rng.integers(1, 4, len(actor_tickets)), rng.integers(1, users + 1, len(actor_tickets))
+        ]), axis=0)
+        _insert_rows(connection, glpi_tickets_users, {
+            'tickets_id': actors[:, 0], 'type': actors[:, 1], 'users_id': actors[:, 2],
+        })
+
+        group_tickets = ticket_ids[rng.random(tickets) < 0.5]
+        _insert_rows(connection, glpi_groups_tickets, {
+            'tickets_id': group_tickets,
+            'groups_id': rng.integers(1, 50, len(group_tickets)),
+            'type': np.full(len(group_tickets), 2),
+        })
+
+        task_states = np.where(rng.random(tasks) < 0.35, 2, 1)
+        _insert_rows(connection, glpi_tickettasks, {
+            'id': np.arange(1, tasks + 1),
+            'tickets_id': rng.integers(1, tickets + 1, tasks),
+            'state': task_states,
+            'users_id_tech': rng.integers(1, users + 1, tasks),
+            'date_mod': _past_dates(rng, tasks),
+        })
+
+        _insert_rows(connection, glpi_itilfollowups, {
+            'itemtype': np.full(followups, 'Ticket', dtype=object),
+            'items_id': rng.integers(1, tickets + 1, followups),
+            'users_id': rng.integers(1, users + 1, followups),
+            'date_mod': _past_dates(rng, followups),
+        })
+
+        tagged_tickets = ticket_ids[rng.random(tickets) < tagged]
+        _insert_rows(connection, glpi_plugin_tag_tagitems, {
+            'plugin_tag_tags_id': np.concatenate([np.full(len(tagged_tickets), 8), np.full(len(tagged_tickets), 9)]),
+            'items_id': np.concatenate([tagged_tickets, tagged_tickets]),
+            'itemtype': np.full(2 * len(tagged_tickets), 'Ticket', dtype=object),
+        })
+    open_tasks = np.flatnonzero(task_states == 1) + 1
+    rng.shuffle(open_tasks)
+    return open_tasks.tolist()
+
+
+def simulate_changes(engine, open_tasks: list, closed: int, followups: int, tickets: int, users: int, rng) -> None:
+    """
+    Closes ``closed`` of the open tasks and adds ``followups`` follow-ups, as GLPI would between two cycles.
+    """
+    now = datetime.now().replace(microsecond=0)
+    closing = [open_tasks.pop() for _ in range(min(closed, len(open_tasks)))]
+    with engine.begin() as connection:
+        if closing:
+            connection.execute(
+                update(glpi_tickettasks).where(glpi_tickettasks.c.id.in_(closing)).values(state=2, date_mod=now)
+            )
+        if followups:
+            _insert_rows(connection, glpi_itilfollowups, {
+                'itemtype': np.full(followups, 'Ticket', dtype=object),
+                'items_id': rng.integers(1, tickets + 1, followups),
+                'users_id': rng.integers(1, users + 1, followups),
+                'date_mod': np.array([now] * followups, dtype=object),
+            })
+
+
+class StatementCounter:
+    """
+    Counts the queries sent through ``engine`` and the rows fetched by the
+    sessions of ``session_factory``.
+    """
+
+    def __init__(self, engine, session_factory) -> None:
+        self.queries = 0
+        self.rows = 0
+        event.listen(engine, 'before_cursor_execute', self._count_query)
+        event.listen(session_factory, 'do_orm_execute', self._count_rows)
+
+    def _count_query(self, *args) -> None:
+        self.queries += 1
+
+    def _count_rows(self, orm_execute_state):
+        result = orm_execute_state.invoke_statement()
+        if not result.returns_rows:
+            return result
+        # Materializa o resultado para contá-lo; o runner lê todas as linhas de qualquer forma
+        frozen = result.freeze()
+        self.rows += len(frozen.data)
+        return frozen()
+
+    def snapshot(self) -> tuple[int, int]:
+        return self.queries, self.rows
+
+
+def run_cycle(runner: Runner, counter: StatementCounter, trace_memory: bool) -> dict:
+    """
+    Runs the phases of one loop of :meth:`Runner.job`, measuring each one.
+    """
+    cycle = {}
+    for phase in PHASES:
+        queries, rows = counter.snapshot()
+        if trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        getattr(runner, phase)()
+        seconds = time.perf_counter() - started
+        cycle[phase] = {
+            'seconds': seconds,
+            'queries': counter.queries - queries,
+            'rows_fetched': counter.rows - rows,
+        }
+        if trace_memory:
+            cycle[phase]['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        if phase == 'link_return_tag':
+            runner.save_checkpoint()
+    runner.session.remove()
+    return cycle
+
+
+def summarize(cycles: list) -> dict:
+    summary = {}
+    for phase in PHASES:
+        values = {key: [cycle[phase][key] for cycle in cycles] for key in cycles[0][phase]}
+        summary[phase] = {
+            'mean_seconds': round(float(np.mean(values['seconds'])), 4),
+            'max_seconds': round(float(np.max(values['seconds'])), 4),
+            'queries': round(float(np.mean(values['queries'])), 1),
+            'rows_fetched': round(float(np.mean(values['rows_fetched'])), 1),
+        }
+        if 'peak_traced_mb' in values:
+            summary[phase]['peak_traced_mb'] = round(float(np.max(values['peak_traced_mb'])), 1)
+    return summary
+
+
+def print_report(result: dict) -> None:
+    print(f"Runner ({result['tasks_tracking']}): {result['volumes']}, {result['cycles']} ciclos, "
+          f"RSS máx. {result['peak_rss_mb']} MB, {result['tags_added']} tags adicionadas")
+    for phase, stats in result['phases'].items():
+        memory = f"  memória máx. {stats['peak_traced_mb']} MB" if 'peak_traced_mb' in stats else ''
+        print(f"  {phase:<24} média {stats['mean_seconds'] * 1000:>9.1f} ms  máx. {stats['max_seconds'] * 1000:>9.1f} ms  "
+              f"{stats['queries']:>6} consultas  {stats['rows_fetched']:>10} linhas{memory}")
+
+
+def find_regressions(result: dict, baseline: dict, tolerance: float) -> list:
+    """
+    :return: one message per phase that got slower than ``tolerance`` allows or sends more queries than before
+    """
+    if result['volumes'] != baseline['volumes']:
+        return [f"volumes diferentes do baseline: {baseline['volumes']}"]
+    regressions = []
+    for phase, stats in result['phases'].items():
+        before = baseline['phases'][phase]
+        if stats['mean_seconds'] > before['mean_seconds'] * (1 + tolerance):
+            regressions.append(f"{phase}: {stats['mean_seconds']} s por ciclo (antes {before['mean_seconds']})")
+        if stats['queries'] > before['queries']:
+            regressions.append(f"{phase}: {stats['queries']} consultas por ciclo (antes {before['queries']})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark do runner de tags sobre uma cópia semeada das tabelas do GLPI')
+    parser.add_argument('--database-url', help='padrão: SQLite temporário; no MySQL as tabelas são recriadas')
+    parser.add_argument('--tickets', type=int, default=10_000)
+    parser.add_argument('--tasks', type=int, default=50_000)
+    parser.add_argument('--followups', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=2_000, help='usuários distintos entre atores e autores')
+    parser.add_argument('--tagged', type=float, default=0.2, help='fração dos tickets que já têm as tags 8 e 9')
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--closed-per-cycle', type=int, default=100)
+    parser.add_argument('--followups-per-cycle', type=int, default=1_000)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='pico de memória Python por fase (tracemalloc; deixa as fases mais lentas)')
+    parser.add_argument('--output', help='salva o resultado neste arquivo JSON')
+    parser.add_argument('--baseline', help='resultado anterior (JSON) para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='variação de tempo aceita em relação ao baseline')
+    args = parser.parse_args()
+
+    # O benchmark não deve retomar nem gravar o estado do runner de produção, nem disputar seus shards
+    for variable in ('RUNNER_STATE_FILE', 'SHARD_LEASE', 'SHARD_COUNT', 'CHANGE_CAPTURE'):
+        os.environ.pop(variable, None)
+
+    with tempfile.TemporaryDirectory(prefix='glpi_runner_bench_') as work_dir:
+        engine = create_engine(args.database_url or f'sqlite:///{work_dir}/glpi.db')
+        started = time.perf_counter()
+        open_tasks = seed(engine, args.tickets, args.tasks, args.followups, args.users, args.tagged)
+        print(f'Tabelas semeadas em {time.perf_counter() - started:.1f}s')
+
+        runner = Runner(engine=engine)
+        counter = StatementCounter(engine, runner.session.session_factory)
+        rng = np.random.default_rng(1)
+        if args.trace_memory:
+            tracemalloc.start()
+        cycles = []
+        for _ in range(args.cycles):
+            simulate_changes(engine, open_tasks, args.closed_per_cycle, args.followups_per_cycle, args.tickets,
+                             args.users, rng)
+            cycles.append(run_cycle(runner, counter, args.trace_memory))
+        engine.dispose()
+
+    result = {
+        'tasks_tracking': runner.tasks_tracking,
+        'volumes': {
+            'tickets': args.tickets, 'tasks': args.tasks, 'followups': args.followups,
+            'closed_per_cycle': args.closed_per_cycle, 'followups_per_cycle': args.followups_per_cycle,
+        },
+        'cycles': args.cycles,
+        'tags_added': sum(rule.tagged for rule in runner.rules),
+        # ru_maxrss em KiB no Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'phases': summarize(cycles),
+        'rules': runner.rule_stats(),
+    }
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = find_regressions(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSÃO >> {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+import asyncio
+import os
+import time
+from typing import Any
+
+from dotenv import load_dotenv
+import httpx
+
+from . import metrics, payloads
+from .error import InitSessionError, ClientGlpiError401, ClientGlpiError400, ClientGlpiRequestError
+from .interface import BasicAuth
+from .rate_limit import TokenBucket
+from .retry import RetryPolicy
+
+
+class AsyncGLPIApiClient:
+    """
+    Asyncio twin of :class:`glpi_client.interface.GLPIApiClient`.
+
+    A single instance keeps one ``httpx.AsyncClient`` connection pool and one
+    session token that are shared by every coroutine using it, so a bulk import
+    can keep many requests in flight from one worker process.
+
+    Usage::
+
+        async with AsyncGLPIApiClient(username, password) as glpi_client:
+            ticket_id = await glpi_client.add_tiket(name='...', content='...')
+    """
+
+    def __init__(self, username: str, password: str, max_connections: int = 100, session_token: str = '',
+                 retry_policy: RetryPolicy | None = None, rate_limiter: TokenBucket | None = None) -> None:
+        """
+        :param session_token: reuse an already opened GLPI session instead of calling ``initSession``
+        :param retry_policy: retry rules and counters; by default built from the ``GLPI_RETRY_*`` variables
+        :param rate_limiter: bucket consulted before every request (and retry) sent to GLPI
+        """
+        load_dotenv()
+        self.__api_server_endpoint: str = os.getenv('GLPI_API_ENDPOINT', 'http://localhost:8090/apirest.php')
+        self.__app_token: str = os.getenv('GLPI_APP_TOKEN', 'no_token_found')
+        self.__basic_auth: BasicAuth = BasicAuth(username=username, password=password)
+        self.__session_token: str = session_token
+        self.__session_lock = asyncio.Lock()
+        self.retry_policy: RetryPolicy = retry_policy or RetryPolicy.from_env()
+        self.rate_limiter: TokenBucket | None = rate_limiter
+        self._api_client = httpx.AsyncClient(
+            auth=self.__basic_auth.auth,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # Aguardar uma conexão livre do pool não deve derrubar a requisição
+            timeout=httpx.Timeout(5.0, pool=None),
+        )
+
+    async def __aenter__(self) -> 'AsyncGLPIApiClient':
+        if not self.__session_token:
+            await self._init_session()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Closes the connection pool. The GLPI session stays open so its token can
+        be handed back to a session pool; call :meth:`kill_session` to end it.
+        """
+        await self._api_client.aclose()
+
+    @property
+    def session_token(self) -> str:
+        return self.__session_token
+
+    async def kill_session(self) -> None:
+        if not self.__session_token:
+            return
+        endpoint = self.__api_server_endpoint + '/killSession'
+        try:
+            await self._api_client.get(endpoint, headers=self.auth_headers)
+        finally:
+            self.__session_token = ''
+
+    @property
+    def auth_headers(self) -> httpx.Headers:
+        headers = {
+            'App-Token': self.__app_token,
+            'Accept': '*/*',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+        }
+        if self.__session_token:
+            headers['Session-Token'] = self.__session_token
+        return httpx.Headers(headers, 'UTF-8')
+
+    async def _init_session(self, expired_token: str | None = None) -> None:
+        """
+        Opens a GLPI session. Concurrent callers wait on the same lock and only
+        the first one hits ``initSession``; ``expired_token`` lets a caller that
+        got a 401 skip the refresh when another coroutine already replaced it.
+        """
+        async with self.__session_lock:
+            if expired_token is not None and self.__session_token and self.__session_token != expired_token:
+                return
+            self.__session_token = ''
+            endpoint = self.__api_server_endpoint + '/initSession'
+            response = await self._api_client.post(endpoint, headers=self.auth_headers)
+            print(response.text)
+            if response.status_code == 200:
+                self.__session_token = response.json()['session_token']
+            else:
+                raise InitSessionError()
+
+    async def _request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        """
+        See :meth:`glpi_client.interface.GLPIApiClient._request`.
+        """
+        path = endpoint[len(self.__api_server_endpoint):]
+        endpoint_label = self.retry_policy.endpoint_label(method, path)
+        session_refreshed = False
+        retry = 0
+        while True:
+            session_token = self.__session_token
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            started = time.perf_counter()
+            try:
+                response = await self._api_client.request(method, endpoint, headers=self.auth_headers, **kwargs)
+            except httpx.TransportError as e:
+                metrics.observe_error(endpoint_label, time.perf_counter() - started, e)
+                if not self.retry_policy.should_retry(method, retry, error=e):
+                    raise
+                delay = self.retry_policy.delay(retry)
+            else:
+                metrics.observe_response(endpoint_label, time.perf_counter() - started, response)
+                if response.status_code == 401 and not session_refreshed:
+                    session_refreshed = True
+                    self.retry_policy.record(method, path, 'session_refresh')
+                    await self._init_session(expired_token=session_token)
+                    continue
+                if not self.retry_policy.should_retry(method, retry, response=response):
+                    return response
+                delay = self.retry_policy.delay(retry, response)
+            print(f"RETRY >> {method} {endpoint} >> in {delay:.2f}s")
+            self.retry_policy.record(method, path)
+            retry += 1
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def __request_error_handler(status_code: int, message: str):
+        if status_code == 401:
+            # A sessão já foi renovada e a requisição repetida em _request
+            raise ClientGlpiError401()
+        elif status_code == 400:
+            raise ClientGlpiError400()
+        else:
+            raise ClientGlpiRequestError(f'{message} (HTTP {status_code})')
+
+    async def __post_created(self, endpoint: str, body_data: dict) -> tuple[int, Any]:
+        response = await self._request('POST', endpoint, json=body_data)
+        print(response.text)
+        if response.status_code == 201:
+            return response.status_code, response.json()['id']
+        return response.status_code, None
+
+    async def add_tiket(self, name: str, content: str, **kwargs) -> str:
+        endpoint = self.__api_server_endpoint + '/Ticket'
+        status_code, ticket_id = await self.__post_created(endpoint, payloads.ticket_body(name, content, **kwargs))
+        if status_code == 201:
+            return ticket_id
+        return self.__request_error_handler(status_code, 'unhandled error on add ticket')
+
+    async def add_task_on_ticket(self, tickets_id: str, content: str, state: int = 1, **kwargs) -> str:
+        endpoint = self.__api_server_endpoint + '/TicketTask'
+        status_code, task_id = await self.__post_created(
+            endpoint, payloads.task_body(tickets_id, content, state, **kwargs)
+        )
+        if status_code == 201:
+            return task_id
+        return self.__request_error_handler(status_code, 'unhandled error on add task')
+
+    async def __submit_post_actors(self, endpoint: str, request_body: dict, action: str, tickets_id: str) -> dict:
+        response = await self._request('POST', endpoint, json=request_body)
+        print(f"POST ACTORS >> {endpoint} >> {response.status_code}")
+        return payloads.actor_log(tickets_id, action, response.status_code, response.text)
+
+    async def __add_actors(self, endpoint: str, actors: list, action: str, tickets_id: str, batched: bool) -> list:
+        if batched:
+            response = await self._request('POST', endpoint, json={'input': actors})
+            print(f"POST ACTORS (batch of {len(actors)}) >> {endpoint} >> {response.status_code}")
+            return payloads.batched_actor_logs(tickets_id, action, len(actors), response.status_code, response)
+        # Os atores de um mesmo ticket são enviados em sequência, como no cliente síncrono
+        process_log = []
+        for actor in actors:
+            process_log.append(
+                await self.__submit_post_actors(endpoint, {'input': actor}, action, tickets_id)
+            )
+        return process_log
+
+    async def add_ticket_user_actors(self, tickets_id: str, actors_users: str | list, batched: bool = False) -> list:
+        endpoint_users = self.__api_server_endpoint + f'/Ticket/{tickets_id}/Ticket_User'
+        users_actors = payloads.ticket_actors(tickets_id, actors_users, 'users_id')
+        return await self.__add_actors(endpoint_users, users_actors, 'add_user_actor', tickets_id, batched)
+
+    async def add_ticket_group_actors(self, tickets_id: str, actors_groups: str | list, batched: bool = False) -> list:
+        endpoint_groups = self.__api_server_endpoint + f'/Ticket/{tickets_id}/Group_Ticket'
+        groups_actors = payloads.ticket_actors(tickets_id, actors_groups, 'groups_id')
+        return await self.__add_actors(endpoint_groups, groups_actors, 'add_group_actor', tickets_id, batched)
+
+    async def __get_json(self, endpoint: str):
+        response = await self._request('GET', endpoint)
+        print(f"GET >> {endpoint} >> {response.status_code}")
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+    async def add_ticket_single_shot(self, name: str, content: str, actors_users: str | list = '', actors_groups: str | list = '', **kwargs) -> dict:
+        """
+        See :meth:`glpi_client.interface.GLPIApiClient.add_ticket_single_shot`.
+        The read-back requests run concurrently.
+        """
+        users = payloads.ticket_actors(None, actors_users, 'users_id') if actors_users else []
+        groups = payloads.ticket_actors(None, actors_groups, 'groups_id') if actors_groups else []
+        ticket_id = await self.add_tiket(
+            name,
+            content,
+            **payloads.inline_actor_fields(users, 'users_id'),
+            **payloads.inline_actor_fields(groups, 'groups_id'),
+            **kwargs
+        )
+        endpoint = self.__api_server_endpoint + f'/Ticket/{ticket_id}'
+        ticket_data, users_data, groups_data = await asyncio.gather(
+            self.__get_json(endpoint),
+            self.__get_json(endpoint + '/Ticket_User') if users else asyncio.sleep(0, result=[]),
+            self.__get_json(endpoint + '/Group_Ticket') if groups else asyncio.sleep(0, result=[]),
+        )
+        return payloads.single_shot_report(
+            ticket_id, users, groups, kwargs.get('status'), ticket_data, users_data, groups_data
+        )
+
+    async def wait_ticket_ready(self, tickets_id: str, actors_users: str | list = '', actors_groups: str | list = '',
+                                timeout: float = 10.0, initial_delay: float = 0.05, max_delay: float = 2.0) -> float:
+        """
+        See :meth:`glpi_client.interface.GLPIApiClient.wait_ticket_ready`.
+        """
+        users = payloads.ticket_actors(tickets_id, actors_users, 'users_id') if actors_users else []
+        groups = payloads.ticket_actors(tickets_id, actors_groups, 'groups_id') if actors_groups else []
+        endpoint = self.__api_server_endpoint + f'/Ticket/{tickets_id}'
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        delay = initial_delay
+        while True:
+            users_data, groups_data = await asyncio.gather(
+                self.__get_json(endpoint + '/Ticket_User') if users else asyncio.sleep(0, result=[]),
+                self.__get_json(endpoint + '/Group_Ticket') if groups else asyncio.sleep(0, result=[]),
+            )
+            ready = not payloads.missing_actors(users, users_data, 'users_id') \
+                and not payloads.missing_actors(groups, groups_data, 'groups_id')
+            remaining = timeout - (loop.time() - started)
+            if ready or remaining <= 0:
+                return round(loop.time() - started, 3)
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+    async def update_ticket_status(self, tickets_id: str, status_id: str) -> bool:
+        endpoint = self.__api_server_endpoint + f'/Ticket/{tickets_id}'
+        body_data = payloads.status_body(status_id)
+        response = await self._request('PUT', endpoint, json=body_data)
+        print(f"PUT >> {endpoint} >> {response.status_code}>> {response.text}")
+        return response.status_code == 200
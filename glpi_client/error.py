@@ -15,3 +15,6 @@ class ClientGlpiError401(GlpiClientGenericError):
 
 class ClientGlpiError400(GlpiClientGenericError):
     BASE_MESSAGE =  "The server returns a 400 Bad Request."
+
+class ClientGlpiRequestError(GlpiClientGenericError):
+    BASE_MESSAGE =  "The server returned an unexpected response."
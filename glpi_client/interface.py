@@ -1,13 +1,18 @@
 import base64
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from typing import Tuple, Any
 
 from dotenv import load_dotenv
 import httpx
 
-from .error import InitSessionError, ClientGlpiError401, ClientGlpiError400
+from . import metrics, payloads
+from .error import InitSessionError, ClientGlpiError401, ClientGlpiError400, ClientGlpiRequestError
+from .rate_limit import TokenBucket
+from .retry import RetryPolicy
 
 
 class BasicAuth:
@@ -20,15 +25,33 @@ class BasicAuth:
         return httpx.BasicAuth(username=self.username, password=self.password)
 
 class GLPIApiClient:
-    def __init__(self, username: str, password: str) -> None:
+    def __init__(self, username: str, password: str, session_token: str = '',
+                 retry_policy: RetryPolicy | None = None, rate_limiter: TokenBucket | None = None) -> None:
+        """
+        :param session_token: reuse an already opened GLPI session instead of calling ``initSession``
+        :param retry_policy: retry rules and counters; by default built from the ``GLPI_RETRY_*`` variables
+        :param rate_limiter: bucket consulted before every request (and retry) sent to GLPI
+        """
         load_dotenv()
         self.__api_server_endpoint: str = os.getenv('GLPI_API_ENDPOINT', 'http://localhost:8090/apirest.php')
         self.__app_token: str = os.getenv('GLPI_APP_TOKEN', 'no_token_found')
         self.__basic_auth: BasicAuth = BasicAuth(username=username, password=password)
-        self.__session_token: str = ''
+        self.__session_token: str = session_token
+        self.__session_lock = threading.Lock()
+        self.retry_policy: RetryPolicy = retry_policy or RetryPolicy.from_env()
+        self.rate_limiter: TokenBucket | None = rate_limiter
         self._api_client = httpx.Client(auth=self.__basic_auth.auth)
 
-        self._init_session()
+        if not self.__session_token:
+            self._init_session()
+
+    @property
+    def session_token(self) -> str:
+        return self.__session_token
+
+    @session_token.setter
+    def session_token(self, session_token: str) -> None:
+        self.__session_token = session_token
 
     @property
     def auth_headers(self) -> httpx.Headers:
@@ -46,25 +69,87 @@ class GLPIApiClient:
         print(header_request)
         return header_request
 
-    def _init_session(self) -> None:
-        endpoint = self.__api_server_endpoint + '/initSession'
-        response = self._api_client.post(endpoint, headers=self.auth_headers)
-        print(response.text)
-        if response.status_code == 200:
-            self.__session_token = response.json()['session_token']
-        else:
-            raise InitSessionError()
+    def _init_session(self, expired_token: str | None = None) -> None:
+        """
+        Opens a new GLPI session.
+
+        :param expired_token: token that got a 401. When another thread already
+            replaced it, the new session is kept and no request is made.
+        """
+        with self.__session_lock:
+            if expired_token is not None and self.__session_token and self.__session_token != expired_token:
+                return
+            self.__session_token = ''
+            endpoint = self.__api_server_endpoint + '/initSession'
+            response = self._api_client.post(endpoint, headers=self.auth_headers)
+            print(response.text)
+            if response.status_code == 200:
+                self.__session_token = response.json()['session_token']
+            else:
+                raise InitSessionError()
+
+    def kill_session(self) -> None:
+        """
+        Closes the GLPI session, so it does not stay in GLPI's session table.
+        """
+        if not self.__session_token:
+            return
+        endpoint = self.__api_server_endpoint + '/killSession'
+        try:
+            self._api_client.get(endpoint, headers=self.auth_headers)
+        finally:
+            self.__session_token = ''
+
+    def close(self) -> None:
+        try:
+            self.kill_session()
+        finally:
+            self._api_client.close()
+
+    def _request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        """
+        Sends a request with the session headers.
+
+        A 401 means GLPI dropped the session: a new one is opened and the request
+        is replayed. Transient failures (see :class:`RetryPolicy`) are retried
+        with jittered exponential backoff; the last response is returned once
+        the attempts run out.
+        """
+        path = endpoint[len(self.__api_server_endpoint):]
+        endpoint_label = self.retry_policy.endpoint_label(method, path)
+        session_refreshed = False
+        retry = 0
+        while True:
+            session_token = self.__session_token
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self._api_client.request(method, endpoint, headers=self.auth_headers, **kwargs)
+            except httpx.TransportError as e:
+                metrics.observe_error(endpoint_label, time.perf_counter() - started, e)
+                if not self.retry_policy.should_retry(method, retry, error=e):
+                    raise
+                delay = self.retry_policy.delay(retry)
+            else:
+                metrics.observe_response(endpoint_label, time.perf_counter() - started, response)
+                if response.status_code == 401 and not session_refreshed:
+                    session_refreshed = True
+                    self.retry_policy.record(method, path, 'session_refresh')
+                    self._init_session(expired_token=session_token)
+                    continue
+                if not self.retry_policy.should_retry(method, retry, response=response):
+                    return response
+                delay = self.retry_policy.delay(retry, response)
+            print(f"RETRY >> {method} {endpoint} >> in {delay:.2f}s")
+            self.retry_policy.record(method, path)
+            retry += 1
+            time.sleep(delay)
 
     def __request_add_ticket(self, name: str, content:str, **kwargs) -> tuple[Any, Any] | tuple[Any, None]:
         endpoint = self.__api_server_endpoint + '/Ticket'
-        body_data = {
-            'input': {
-                'name': name,
-                'content': content,
-                **kwargs
-            }
-        }
-        response = self._api_client.post(endpoint, headers=self.auth_headers, json=body_data)
+        body_data = payloads.ticket_body(name, content, **kwargs)
+        response = self._request('POST', endpoint, json=body_data)
         print(response.text)
         if response.status_code == 201:
             return response.status_code, response.json()['id']
@@ -80,26 +165,19 @@ class GLPIApiClient:
 
     def __request_error_handler(self, status_code: int, message:str):
         if status_code == 401:
-            self._init_session()
+            # A sessão já foi renovada e a requisição repetida em _request
             raise ClientGlpiError401()
         elif status_code == 400:
             #! TODO: tratamento de erro para APP_TOKEN inválido
             raise ClientGlpiError400()
         else:
-            return message
+            raise ClientGlpiRequestError(f'{message} (HTTP {status_code})')
 
     def __request_add_task_on_ticket(self, tickets_id: str, content: str, state: int = 1, **kwargs) -> tuple[Any, Any] | tuple[Any, None]:
         endpoint = self.__api_server_endpoint + '/TicketTask'
-        body_data = {
-            'input': {
-                'tickets_id': tickets_id,
-                'content': content,
-                'state': state,
-                **kwargs
-            }
-        }
+        body_data = payloads.task_body(tickets_id, content, state, **kwargs)
         print(json.dumps(body_data))
-        response = self._api_client.post(endpoint, headers=self.auth_headers, json=body_data)
+        response = self._request('POST', endpoint, json=body_data)
         print(response.text)
         if response.status_code == 201:
             return response.status_code, response.json()['id']
@@ -110,49 +188,26 @@ class GLPIApiClient:
         if data[0] == 201:
             return data[1]
         else:
-            return self.__request_error_handler(data[0], 'unhandled error on add ticket')
-
-    @staticmethod
-    def __generate_actors_body(tickets_id: str, actors_string: str, target_str: str = 'users_id'):
-        """
-        A string deve ter o formato: '1:2,3:4' seguindo o padrão 'user_id|group_id:type_actor'
-        :param tickets_id:
-        :param actors_string:
-        :return:
-        """
-        result = []
-        pairs = actors_string.split(',')
-        print("Pairs: ", pairs, len(pairs))
-        for pair in pairs:
-            object_id, type_actor = pair.split(':')
-            result.append({
-                'tickets_id': tickets_id,
-                target_str: int(object_id),
-                'type': int(type_actor)
-            })
-        print("Result: ", result)
-        return result
+            return self.__request_error_handler(data[0], 'unhandled error on add task')
 
     def __submit_post_actors(self, endpoint:str, request_body: dict, action: str, tickets_id: str, **kwargs):
-        response = self._api_client.post(endpoint, headers=self.auth_headers, json=request_body)
+        response = self._request('POST', endpoint, json=request_body)
         print(f"POST ACTORS >> {endpoint} >> {response.status_code}")
-        if response.status_code != 201:
-            return {
-                'ticket': tickets_id,
-                'action': action,
-                'status': 'fail',
-                'response': response.text
-            }
-        else:
-            return {
-                'ticket': tickets_id,
-                'action': action,
-                'status': 'success'
-            }
+        return payloads.actor_log(tickets_id, action, response.status_code, response.text)
 
-    def add_ticket_user_actors(self, tickets_id: str, actors_users: str) -> list:
+    def __submit_post_actors_batch(self, endpoint: str, actors: list, action: str, tickets_id: str) -> list:
+        response = self._request('POST', endpoint, json={'input': actors})
+        print(f"POST ACTORS (batch of {len(actors)}) >> {endpoint} >> {response.status_code}")
+        return payloads.batched_actor_logs(tickets_id, action, len(actors), response.status_code, response)
+
+    def add_ticket_user_actors(self, tickets_id: str, actors_users: str | list, batched: bool = False) -> list:
+        """
+        :param batched: send every user of the ticket in a single POST instead of one POST per user
+        """
         endpoint_users = self.__api_server_endpoint + f'/Ticket/{tickets_id}/Ticket_User'
-        users_actors = self.__generate_actors_body(tickets_id, actors_users, 'users_id')
+        users_actors = payloads.ticket_actors(tickets_id, actors_users, 'users_id')
+        if batched:
+            return self.__submit_post_actors_batch(endpoint_users, users_actors, 'add_user_actor', tickets_id)
         process_log = []
 
         for user_actor in users_actors:
@@ -169,9 +224,14 @@ class GLPIApiClient:
             process_log.append(log_dict)
         return process_log
 
-    def add_ticket_group_actors(self, tickets_id: str, actors_groups: str) -> list:
+    def add_ticket_group_actors(self, tickets_id: str, actors_groups: str | list, batched: bool = False) -> list:
+        """
+        :param batched: send every group of the ticket in a single POST instead of one POST per group
+        """
         endpoint_groups = self.__api_server_endpoint + f'/Ticket/{tickets_id}/Group_Ticket'
-        groups_actors = self.__generate_actors_body(tickets_id, actors_groups, 'groups_id')
+        groups_actors = payloads.ticket_actors(tickets_id, actors_groups, 'groups_id')
+        if batched:
+            return self.__submit_post_actors_batch(endpoint_groups, groups_actors, 'add_group_actor', tickets_id)
         process_log = []
 
         for group_actor in groups_actors:
@@ -187,14 +247,73 @@ class GLPIApiClient:
             process_log.append(log_dict)
         return process_log
 
+    def __get_json(self, endpoint: str):
+        response = self._request('GET', endpoint)
+        print(f"GET >> {endpoint} >> {response.status_code}")
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+    def add_ticket_single_shot(self, name: str, content: str, actors_users: str | list = '', actors_groups: str | list = '', **kwargs) -> dict:
+        """
+        Creates the ticket with its actors (``_users_id_requester``, ``_groups_id_assign``...)
+        and status inside the ``Ticket`` POST, then reads the ticket back to check
+        what GLPI actually stored.
+
+        :param actors_users: users in the 'user_id:type_actor' format
+        :param actors_groups: groups in the 'group_id:type_actor' format
+        :return: dict with ``ticket_id``, the per-actor logs of the honored actors
+            (``users_response``/``groups_response``), the actors GLPI ignored
+            (``missing_users``/``missing_groups``) and ``status_honored``
+        """
+        users = payloads.ticket_actors(None, actors_users, 'users_id') if actors_users else []
+        groups = payloads.ticket_actors(None, actors_groups, 'groups_id') if actors_groups else []
+        ticket_id = self.add_tiket(
+            name,
+            content,
+            **payloads.inline_actor_fields(users, 'users_id'),
+            **payloads.inline_actor_fields(groups, 'groups_id'),
+            **kwargs
+        )
+        endpoint = self.__api_server_endpoint + f'/Ticket/{ticket_id}'
+        return payloads.single_shot_report(
+            ticket_id,
+            users,
+            groups,
+            kwargs.get('status'),
+            ticket_data=self.__get_json(endpoint),
+            users_data=self.__get_json(endpoint + '/Ticket_User') if users else [],
+            groups_data=self.__get_json(endpoint + '/Group_Ticket') if groups else [],
+        )
+
+    def wait_ticket_ready(self, tickets_id: str, actors_users: str | list = '', actors_groups: str | list = '',
+                          timeout: float = 10.0, initial_delay: float = 0.05, max_delay: float = 2.0) -> float:
+        """
+        Polls the ticket actors until every user and group is linked to the ticket,
+        with exponential backoff between polls, or until ``timeout`` seconds pass.
+
+        :return: seconds spent waiting
+        """
+        users = payloads.ticket_actors(tickets_id, actors_users, 'users_id') if actors_users else []
+        groups = payloads.ticket_actors(tickets_id, actors_groups, 'groups_id') if actors_groups else []
+        endpoint = self.__api_server_endpoint + f'/Ticket/{tickets_id}'
+        started = time.monotonic()
+        delay = initial_delay
+        while True:
+            users_ready = not users or not payloads.missing_actors(
+                users, self.__get_json(endpoint + '/Ticket_User'), 'users_id')
+            groups_ready = not groups or not payloads.missing_actors(
+                groups, self.__get_json(endpoint + '/Group_Ticket'), 'groups_id')
+            remaining = timeout - (time.monotonic() - started)
+            if (users_ready and groups_ready) or remaining <= 0:
+                return round(time.monotonic() - started, 3)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
     def update_ticket_status(self, tickets_id: str, status_id: str):
         endpoint = self.__api_server_endpoint + f'/Ticket/{tickets_id}'
-        body_data = {
-            'input': {
-                'status': int(status_id)
-            }
-        }
-        response = self._api_client.put(endpoint, headers=self.auth_headers, json=body_data)
+        body_data = payloads.status_body(status_id)
+        response = self._request('PUT', endpoint, json=body_data)
         print("Body: ", body_data)
         print(f"PUT >> {endpoint} >> {response.status_code}>> {response.text}")
         return response.status_code == 200
@@ -0,0 +1,35 @@
+import httpx
+from prometheus_client import Counter, Histogram
+
+# Rótulo 'endpoint' igual ao dos contadores do RetryPolicy: 'PUT /Ticket/{id}'
+REQUEST_SECONDS = Histogram(
+    'glpi_request_duration_seconds',
+    'Latency of each attempt of a GLPI API request',
+    ['endpoint'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+RESPONSES = Counter(
+    'glpi_responses_total',
+    'GLPI API responses, by status code',
+    ['endpoint', 'status_code'],
+)
+REQUEST_ERRORS = Counter(
+    'glpi_request_errors_total',
+    'GLPI API attempts that got no response, by transport error',
+    ['endpoint', 'error'],
+)
+RETRIES = Counter(
+    'glpi_request_retries_total',
+    "GLPI API requests sent again: 'retry' after a transient failure, 'session_refresh' after a 401",
+    ['endpoint', 'outcome'],
+)
+
+
+def observe_response(endpoint: str, seconds: float, response: httpx.Response) -> None:
+    REQUEST_SECONDS.labels(endpoint).observe(seconds)
+    RESPONSES.labels(endpoint, str(response.status_code)).inc()
+
+
+def observe_error(endpoint: str, seconds: float, error: Exception) -> None:
+    REQUEST_SECONDS.labels(endpoint).observe(seconds)
+    REQUEST_ERRORS.labels(endpoint, type(error).__name__).inc()
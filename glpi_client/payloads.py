@@ -0,0 +1,167 @@
+"""
+Request bodies and response logs shared by the sync and async GLPI clients.
+"""
+
+
+def ticket_body(name: str, content: str, **kwargs) -> dict:
+    return {
+        'input': {
+            'name': name,
+            'content': content,
+            **kwargs
+        }
+    }
+
+
+def task_body(tickets_id: str, content: str, state: int = 1, **kwargs) -> dict:
+    return {
+        'input': {
+            'tickets_id': tickets_id,
+            'content': content,
+            'state': state,
+            **kwargs
+        }
+    }
+
+
+def status_body(status_id: str) -> dict:
+    return {
+        'input': {
+            'status': int(status_id)
+        }
+    }
+
+
+def generate_actors_body(tickets_id: str, actors_string: str, target_str: str = 'users_id') -> list:
+    """
+    A string deve ter o formato: '1:2,3:4' seguindo o padrão 'user_id|group_id:type_actor'
+    :param tickets_id:
+    :param actors_string:
+    :param target_str: field that receives the object id ('users_id' or 'groups_id')
+    :return:
+    """
+    result = []
+    pairs = actors_string.split(',')
+    print("Pairs: ", pairs, len(pairs))
+    for pair in pairs:
+        object_id, type_actor = pair.split(':')
+        result.append({
+            'tickets_id': tickets_id,
+            target_str: int(object_id),
+            'type': int(type_actor)
+        })
+    print("Result: ", result)
+    return result
+
+
+def ticket_actors(tickets_id, actors: str | list, target_str: str = 'users_id') -> list:
+    """
+    Actor bodies of a ticket, from an actor string or from actors already
+    parsed (e.g. by the import plan), which are only bound to ``tickets_id``.
+    """
+    if isinstance(actors, str):
+        return generate_actors_body(tickets_id, actors, target_str)
+    return [{'tickets_id': tickets_id, **actor} for actor in actors]
+
+
+def actor_log(tickets_id: str, action: str, status_code: int, response_text: str) -> dict:
+    if status_code != 201:
+        return {
+            'ticket': tickets_id,
+            'action': action,
+            'status': 'fail',
+            'response': response_text
+        }
+    return {
+        'ticket': tickets_id,
+        'action': action,
+        'status': 'success'
+    }
+
+
+def batched_actor_logs(tickets_id: str, action: str, actors_count: int, status_code: int, response) -> list:
+    """
+    Splits the response of a batched actor POST (``{'input': [...]}``) back into
+    one log entry per actor, in the same format as :func:`actor_log`.
+
+    GLPI answers 201 when every item was created and 207 (Multi-Status) when
+    some failed; in both cases the body is a list with one ``{'id', 'message'}``
+    per submitted item, in submission order.
+    """
+    try:
+        items = response.json()
+    except ValueError:
+        items = None
+    if status_code not in (201, 207) or not isinstance(items, list) or len(items) != actors_count:
+        return [actor_log(tickets_id, action, status_code, response.text) for _ in range(actors_count)]
+
+    process_log = []
+    for item in items:
+        if isinstance(item, dict) and item.get('id'):
+            process_log.append(actor_log(tickets_id, action, 201, ''))
+        else:
+            message = item.get('message') if isinstance(item, dict) else item
+            process_log.append(actor_log(tickets_id, action, status_code, str(message)))
+    return process_log
+
+
+# Tipos de ator do GLPI (campo 'type' de Ticket_User/Group_Ticket)
+ACTOR_TYPES = {1: 'requester', 2: 'assign', 3: 'observer'}
+
+
+def inline_actor_fields(actors: list, target_str: str = 'users_id') -> dict:
+    """
+    Converts parsed actors into the ``_users_id_<type>``/``_groups_id_<type>``
+    fields accepted by a ``Ticket`` POST, so the actors are created together
+    with the ticket.
+    """
+    fields = {}
+    for actor in actors:
+        key = f'_{target_str}_{ACTOR_TYPES[actor["type"]]}'
+        fields.setdefault(key, []).append(actor[target_str])
+    return fields
+
+
+def missing_actors(expected: list, existing, target_str: str = 'users_id') -> list:
+    """
+    :param expected: actors parsed by :func:`generate_actors_body`
+    :param existing: decoded response of ``GET Ticket/{id}/Ticket_User`` (or ``Group_Ticket``)
+    :return: the expected actors that are not linked to the ticket
+    """
+    if not isinstance(existing, list):
+        return list(expected)
+    linked = {(int(item[target_str]), int(item['type'])) for item in existing if isinstance(item, dict)}
+    return [actor for actor in expected if (actor[target_str], actor['type']) not in linked]
+
+
+def actors_string(actors: list, target_str: str = 'users_id') -> str:
+    """Inverse of :func:`generate_actors_body`."""
+    return ','.join(f'{actor[target_str]}:{actor["type"]}' for actor in actors)
+
+
+def single_shot_report(tickets_id, users: list, groups: list, status_id,
+                       ticket_data, users_data, groups_data) -> dict:
+    """
+    Compares what a single-shot ticket POST asked for with what GLPI stored.
+
+    The actors GLPI honored get the same success entries the multi-call flow
+    logs; the missing ones are returned as actor strings so the caller can fall
+    back to the per-actor endpoints.
+    """
+    missing_users = missing_actors(users, users_data, 'users_id')
+    missing_groups = missing_actors(groups, groups_data, 'groups_id')
+    status_honored = status_id is None or (
+        isinstance(ticket_data, dict) and str(ticket_data.get('status')) == str(int(status_id))
+    )
+    return {
+        'ticket_id': tickets_id,
+        'users_response': [
+            actor_log(tickets_id, 'add_user_actor', 201, '') for _ in range(len(users) - len(missing_users))
+        ],
+        'groups_response': [
+            actor_log(tickets_id, 'add_group_actor', 201, '') for _ in range(len(groups) - len(missing_groups))
+        ],
+        'missing_users': actors_string(missing_users, 'users_id'),
+        'missing_groups': actors_string(missing_groups, 'groups_id'),
+        'status_honored': status_honored,
+    }
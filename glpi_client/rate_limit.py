@@ -0,0 +1,128 @@
+import asyncio
+import os
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    In-memory token bucket: ``rate`` requests per second with bursts of up to
+    ``burst`` requests. It only coordinates the threads/coroutines of one
+    process; see :class:`RedisTokenBucket` for a budget shared by every worker.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self.rate = rate
+        self.burst = max(burst or rate, 1)
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token when one is available.
+
+        :return: 0 when the token was taken, otherwise the seconds to wait before trying again
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        while wait := self.reserve():
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        while wait := self.reserve():
+            await asyncio.sleep(wait)
+
+
+class RedisTokenBucket(TokenBucket):
+    """
+    Token bucket stored in Redis and shared by every client that uses the same
+    ``key``, so horizontally scaled workers stay inside one GLPI request budget.
+
+    Refill and take run atomically in a Lua script using the Redis clock, so
+    workers on different hosts agree on the time. If Redis becomes unreachable
+    the bucket keeps working with the local, per-process budget.
+    """
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(state[1]) or burst
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+    return tostring(wait)
+    """
+
+    # Segundos usando o limite local antes de tentar o Redis novamente
+    REDIS_RETRY_INTERVAL = 30
+
+    def __init__(self, redis_client, key: str, rate: float, burst: float | None = None) -> None:
+        super().__init__(rate, burst)
+        self.key = key
+        self._script = redis_client.register_script(self.SCRIPT)
+        self._redis_retry_at = 0.0
+
+    def reserve(self) -> float:
+        if time.monotonic() < self._redis_retry_at:
+            return super().reserve()
+        try:
+            return float(self._script(keys=[self.key], args=[self.rate, self.burst]))
+        except Exception as e:
+            print(f'Rate limiter: Redis indisponível, usando limite local ({e})')
+            self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_INTERVAL
+            return super().reserve()
+
+    async def acquire_async(self) -> None:
+        # O EVALSHA bloqueia: roda no executor para não parar o event loop (e as outras linhas do motor asyncio)
+        loop = asyncio.get_running_loop()
+        while wait := await loop.run_in_executor(None, self.reserve):
+            await asyncio.sleep(wait)
+
+
+def rate_limiter_from_env(redis_url: str | None = None) -> TokenBucket | None:
+    """
+    Builds the limiter described by the environment:
+
+    - ``GLPI_RATE_LIMIT``: requests per second to GLPI (0 or unset disables the limiter)
+    - ``GLPI_RATE_LIMIT_BURST``: bucket size, defaults to the rate
+    - ``GLPI_RATE_LIMIT_SCOPE``: ``global`` (Redis, shared by all workers) or ``local``
+    - ``GLPI_RATE_LIMIT_KEY``: Redis key of the shared bucket
+
+    :param redis_url: Redis used by the ``global`` scope; without it the limiter is local
+    """
+    rate = float(os.getenv('GLPI_RATE_LIMIT', 0) or 0)
+    if rate <= 0:
+        return None
+    burst = float(os.getenv('GLPI_RATE_LIMIT_BURST', 0) or 0) or None
+    if redis_url and os.getenv('GLPI_RATE_LIMIT_SCOPE', 'global') == 'global':
+        import redis
+        from redis.backoff import NoBackoff
+        from redis.retry import Retry
+
+        return RedisTokenBucket(
+            # Sem retries no cliente Redis: se ele cair, o bucket passa para o limite local imediatamente
+            redis.Redis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1, retry=Retry(NoBackoff(), 0)),
+            key=os.getenv('GLPI_RATE_LIMIT_KEY', 'glpi_automator:rate_limit'),
+            rate=rate,
+            burst=burst,
+        )
+    return TokenBucket(rate, burst)
@@ -0,0 +1,113 @@
+import os
+import random
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from . import metrics
+
+
+class RetryPolicy:
+    """
+    Retry rules shared by the GLPI clients: which failures are transient, how
+    long to wait before the next attempt and how many retries each endpoint
+    needed.
+
+    Waits use exponential backoff with full jitter (a random delay between 0
+    and ``backoff * 2 ** retry``, capped at ``max_backoff``), so workers that
+    failed together do not retry together. A ``Retry-After`` header from GLPI
+    or its proxy takes precedence.
+
+    POST requests are not idempotent: they are only retried when GLPI surely
+    did not process them (429, 503 or a connection that was never
+    established). GET/PUT are also retried on 500/502/504 and read timeouts.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    RETRY_STATUS_NOT_PROCESSED = {429, 503}
+    RETRY_ERRORS_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+    def __init__(self, attempts: int = 3, backoff: float = 0.5, max_backoff: float = 30.0) -> None:
+        """
+        :param attempts: total tries of a request, including the first one
+        :param backoff: base delay in seconds
+        :param max_backoff: upper bound of any single wait, including ``Retry-After``
+        """
+        self.attempts = max(attempts, 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicy':
+        return cls(
+            attempts=int(os.getenv('GLPI_RETRY_ATTEMPTS', 3)),
+            backoff=float(os.getenv('GLPI_RETRY_BACKOFF', 0.5)),
+            max_backoff=float(os.getenv('GLPI_RETRY_MAX_BACKOFF', 30)),
+        )
+
+    def should_retry(self, method: str, retry: int, response: httpx.Response | None = None,
+                     error: Exception | None = None) -> bool:
+        """
+        :param retry: retries already made for this request
+        """
+        if retry + 1 >= self.attempts:
+            return False
+        if error is not None:
+            if method == 'POST':
+                return isinstance(error, self.RETRY_ERRORS_NOT_SENT)
+            return isinstance(error, httpx.TransportError)
+        if method == 'POST':
+            return response.status_code in self.RETRY_STATUS_NOT_PROCESSED
+        return response.status_code in self.RETRY_STATUS
+
+    def delay(self, retry: int, response: httpx.Response | None = None) -> float:
+        retry_after = self._retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float | None:
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    @staticmethod
+    def endpoint_label(method: str, path: str) -> str:
+        """'PUT /Ticket/123' -> 'PUT /Ticket/{id}', so counters group by endpoint."""
+        return method + ' ' + re.sub(r'/\d+', '/{id}', path)
+
+    def record(self, method: str, path: str, outcome: str = 'retry') -> None:
+        """
+        :param outcome: 'retry' for a new attempt, 'session_refresh' for a replay after a 401
+        """
+        endpoint = self.endpoint_label(method, path)
+        metrics.RETRIES.labels(endpoint, outcome).inc()
+        with self._lock:
+            self._counters[(endpoint, outcome)] += 1
+
+    def counters(self) -> dict:
+        """
+        :return: ``{'POST /Ticket': {'retry': 2, 'session_refresh': 1}, ...}``
+        """
+        with self._lock:
+            items = list(self._counters.items())
+        result = {}
+        for (endpoint, outcome), total in items:
+            result.setdefault(endpoint, {})[outcome] = total
+        return result
@@ -0,0 +1,83 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from .interface import GLPIApiClient
+from .rate_limit import TokenBucket
+from .retry import RetryPolicy
+
+
+class GLPISessionPool:
+    """
+    Process-level pool of authenticated :class:`GLPIApiClient` instances.
+
+    Sessions are opened lazily, the first time :meth:`acquire` finds no idle
+    client, and are reused by every task running in the same worker process
+    afterwards. Each client is used by one caller at a time, so concurrent rows
+    never share a GLPI session. Sessions idle for more than ``max_idle_seconds``
+    are closed with ``killSession`` on the next acquire/release, and
+    :meth:`close_all` closes the remaining ones on worker shutdown.
+    """
+
+    def __init__(self, username: str, password: str, max_idle_seconds: float = 300,
+                 retry_policy: RetryPolicy | None = None, rate_limiter: TokenBucket | None = None) -> None:
+        self.username = username
+        self.password = password
+        # Compartilhada por todos os clientes do pool, para que os contadores de retry sejam do processo
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        self.rate_limiter = rate_limiter
+        self.max_idle_seconds = max_idle_seconds
+        self._idle: list[tuple[GLPIApiClient, float]] = []
+        self._lock = threading.Lock()
+
+    def _pop_expired(self) -> list:
+        deadline = time.monotonic() - self.max_idle_seconds
+        expired = [client for client, last_used in self._idle if last_used < deadline]
+        self._idle = [(client, last_used) for client, last_used in self._idle if last_used >= deadline]
+        return expired
+
+    @staticmethod
+    def _close(clients: list) -> None:
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                print(f'killSession failed: {e}')
+
+    def acquire(self) -> GLPIApiClient:
+        with self._lock:
+            expired = self._pop_expired()
+            # LIFO: a sessão usada mais recentemente é a que tem menos chance de ter expirado no GLPI
+            client = self._idle.pop()[0] if self._idle else None
+        self._close(expired)
+        if client is None:
+            client = GLPIApiClient(
+                username=self.username,
+                password=self.password,
+                retry_policy=self.retry_policy,
+                rate_limiter=self.rate_limiter,
+            )
+        return client
+
+    def release(self, client: GLPIApiClient) -> None:
+        if not client.session_token:
+            client.close()
+            return
+        with self._lock:
+            self._idle.append((client, time.monotonic()))
+            expired = self._pop_expired()
+        self._close(expired)
+
+    @contextmanager
+    def session(self):
+        client = self.acquire()
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def close_all(self) -> None:
+        with self._lock:
+            clients = [client for client, _ in self._idle]
+            self._idle = []
+        self._close(clients)
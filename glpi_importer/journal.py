@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+import json
+
+FILE_DIGEST_BLOCK = 1024 * 1024
+
+
+def file_digest(file_path: str) -> str:
+    # Identificador do upload: arquivos iguais (reenviados ou reprocessados) compartilham o mesmo diário
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while block := f.read(FILE_DIGEST_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImportJournal:
+    """
+    Per-row checkpoint journal of an import, stored in Redis.
+
+    Each row gets a hash ``glpi_automator:journal:<upload digest>:<row hash>``
+    with one field per finished step (``ticket``, ``single_shot``, ``users``,
+    ``groups``, ``status``, ``task``) holding the JSON result of that step, plus
+    the id of the task that wrote it. The upload digest, not the Celery task
+    id, scopes the journal, so both a redelivered task and the same file
+    submitted again find the steps already done and only run the missing ones.
+
+    Only successful steps are recorded (a failed status PUT runs again). The
+    ``users``/``groups`` steps hold ``{'id:type': log}`` with the actors
+    already linked, so only the actors that failed are sent again.
+    """
+
+    def __init__(self, redis_client, upload_digest: str, task_id: str, ttl_seconds: int = 7 * 24 * 60 * 60) -> None:
+        self.redis = redis_client
+        self.upload_digest = upload_digest
+        self.task_id = task_id
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def row_hash(position: int, row, columns: list) -> str:
+        """
+        :param position: row position in the whole upload (identical rows stay distinct)
+        :param columns: input columns that identify the row
+        """
+        payload = json.dumps([position, [str(row[col]) for col in columns]], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def entry(self, row_hash: str) -> 'JournalEntry':
+        key = f'glpi_automator:journal:{self.upload_digest}:{row_hash}'
+        steps = {
+            field.decode(): json.loads(value)
+            for field, value in self.redis.hgetall(key).items()
+            if field != b'task_id'
+        }
+        return JournalEntry(self, key, steps)
+
+    def record(self, key: str, step: str, value) -> None:
+        pipeline = self.redis.pipeline()
+        pipeline.hset(key, mapping={step: json.dumps(value, default=str), 'task_id': self.task_id})
+        pipeline.expire(key, self.ttl_seconds)
+        pipeline.execute()
+
+
+class JournalEntry:
+    """Steps already done for one row; :meth:`record` checkpoints a new one."""
+
+    def __init__(self, journal: ImportJournal, key: str, steps: dict) -> None:
+        self.journal = journal
+        self.key = key
+        self.steps = steps
+
+    def __contains__(self, step: str) -> bool:
+        return step in self.steps
+
+    def __getitem__(self, step: str):
+        return self.steps[step]
+
+    def record(self, step: str, value) -> None:
+        self.steps[step] = value
+        self.journal.record(self.key, step, value)
+
+    async def record_async(self, step: str, value) -> None:
+        # O HSET bloqueia: roda no executor para não parar o event loop (e as outras linhas do motor asyncio)
+        self.steps[step] = value
+        await asyncio.get_running_loop().run_in_executor(None, self.journal.record, self.key, step, value)
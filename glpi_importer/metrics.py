@@ -0,0 +1,54 @@
+import glob
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, start_http_server
+from prometheus_client import multiprocess
+
+IMPORT_ROWS = Counter(
+    'glpi_import_rows_total',
+    "CSV rows finished by the worker, by outcome ('ok' or 'failed')",
+    ['outcome'],
+)
+IMPORT_SECONDS = Histogram(
+    'glpi_import_duration_seconds',
+    'Duration of each import (or fan-out chunk), from the first row read to the last row written',
+    buckets=(1, 5, 15, 60, 300, 900, 1800, 3600, 7200, 21600),
+)
+IMPORT_ROWS_PER_SECOND = Histogram(
+    'glpi_import_rows_per_second',
+    'Throughput of each finished import (or fan-out chunk)',
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250),
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    'glpi_task_queue_wait_seconds',
+    'Time between publishing a task and a worker starting it',
+    ['task'],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+)
+
+
+def observe_import(rows: int, seconds: float) -> None:
+    IMPORT_SECONDS.observe(seconds)
+    if seconds > 0:
+        IMPORT_ROWS_PER_SECOND.observe(rows / seconds)
+
+
+def start_metrics_server(port: int) -> None:
+    """
+    Serves ``/metrics`` on ``port``.
+
+    With the prefork pool the rows are imported in child processes: when
+    ``PROMETHEUS_MULTIPROC_DIR`` is set, each child writes its samples to that
+    directory and the server sums them. The directory is emptied here, so call
+    it before the pool starts.
+    """
+    multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not multiproc_dir:
+        start_http_server(port)
+        return
+    for path in glob.glob(os.path.join(multiproc_dir, '*.db')):
+        os.remove(path)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+
@@ -0,0 +1,143 @@
+import pandas as pd
+
+from glpi_client.payloads import ACTOR_TYPES
+from .streaming import iter_csv_chunks
+
+# Colunas sem as quais nenhuma linha do arquivo pode ser importada
+REQUIRED_COLUMNS = ['ticket_name', 'ticket_content', 'task_content']
+# Colunas tratadas pelo plano; as demais colunas ticket_*/task_* viram campos extras das requisições
+PLAN_COLUMNS = REQUIRED_COLUMNS + ['ticket_actors_users', 'ticket_actors_groups', 'Resultado']
+ACTOR_COLUMNS = {'ticket_actors_users': 'users_id', 'ticket_actors_groups': 'groups_id'}
+# 'id:tipo', ex.: '12:2'
+ACTOR_PATTERN = r'^\s*(\d+)\s*:\s*(\d+)\s*$'
+
+
+def _records(frame: pd.DataFrame) -> list:
+    # Sem colunas, to_dict('records') devolve [] e o zip do prepare pararia na primeira linha
+    if frame.columns.empty:
+        return [{} for _ in range(len(frame))]
+    return frame.to_dict('records')
+
+
+class RowPlan:
+    """
+    Ready-to-send arguments of one CSV row. ``users``/``groups`` are parsed
+    actors (``{'users_id'|'groups_id': id, 'type': type}``) and ``error`` is set
+    when the row is malformed and must not reach GLPI.
+    """
+
+    __slots__ = ('ticket_args', 'task_args', 'users', 'groups', 'status', 'error')
+
+    def __init__(self, ticket_args: dict, task_args: dict, users: list, groups: list,
+                 status: int | None, error: str | None = None) -> None:
+        self.ticket_args = ticket_args
+        self.task_args = task_args
+        self.users = users
+        self.groups = groups
+        self.status = status
+        self.error = error
+
+
+class ImportPlan:
+    """
+    Compiled once per upload from its header: checks the required columns and
+    classifies the optional ``ticket_*``/``task_*`` columns, so :meth:`prepare`
+    only has to turn each chunk of rows into :class:`RowPlan` objects, parsing
+    the actor strings and extracting the extra arguments column-wise.
+    """
+
+    def __init__(self, columns: list) -> None:
+        missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing:
+            raise ValueError(f'Colunas obrigatórias ausentes no arquivo: {", ".join(missing)}')
+        self.columns = list(columns)
+        self.actor_columns = [col for col in ACTOR_COLUMNS if col in columns]
+        # Mesma regra de antes: a coluna vai para o ticket/tarefa sem o prefixo
+        self.ticket_extra_columns = {
+            col: col.replace('ticket_', '') for col in columns if col not in PLAN_COLUMNS and col.find('ticket_') != -1
+        }
+        self.task_extra_columns = {
+            col: col.replace('task_', '') for col in columns if col not in PLAN_COLUMNS and col.find('task_') != -1
+        }
+
+    @staticmethod
+    def parse_actors(values: pd.Series, target_str: str) -> tuple[dict, pd.Series]:
+        """
+        Parses a whole actor column (``'id:type,id:type'`` per cell). Empty cells
+        have no actors.
+
+        :return: the actors of each row by index, and the mask of rows with a malformed actor
+        """
+        cells = values.fillna('').astype(str)
+        pairs = cells[cells.str.strip() != ''].str.split(',').explode()
+        parsed = pairs.str.extract(ACTOR_PATTERN)
+        types = pd.to_numeric(parsed[1], errors='coerce')
+        valid = parsed[0].notna() & types.isin(list(ACTOR_TYPES))
+        invalid_rows = (~valid).groupby(level=0).any().reindex(values.index, fill_value=False)
+
+        actors = {index: [] for index in values.index}
+        for index, object_id, type_actor in zip(
+            parsed.index[valid], parsed[0][valid].astype(int).tolist(), types[valid].astype(int).tolist()
+        ):
+            actors[index].append({target_str: object_id, 'type': type_actor})
+        return actors, invalid_rows
+
+    def prepare(self, frame: pd.DataFrame) -> list:
+        """
+        :return: one :class:`RowPlan` per row of ``frame``, in order
+        """
+        errors = pd.Series('', index=frame.index)
+        errors[frame['ticket_name'].fillna('').astype(str).str.strip() == ''] = 'ticket_name vazio'
+
+        status = None
+        if 'status' in self.ticket_extra_columns.values():
+            status_column = next(col for col, arg in self.ticket_extra_columns.items() if arg == 'status')
+            status = pd.to_numeric(frame[status_column], errors='coerce')
+            # Status fracionário (ex.: 2.5) também é inválido: só inteiros são convertidos abaixo
+            status = status.where(status % 1 == 0)
+            errors[(errors == '') & status.isna()] = f'{status_column} inválido'
+
+        actors = {}
+        for column in self.actor_columns:
+            target_str = ACTOR_COLUMNS[column]
+            actors[target_str], invalid = self.parse_actors(frame[column], target_str)
+            errors[(errors == '') & invalid] = f'ator inválido em {column}'
+
+        ticket_extra = frame[list(self.ticket_extra_columns)].rename(columns=self.ticket_extra_columns)
+        task_extra = frame[list(self.task_extra_columns)].rename(columns=self.task_extra_columns)
+        if status is not None:
+            ticket_extra['status'] = status.astype('Int64').astype(object).where(status.notna(), None)
+
+        plans = []
+        for index, name, content, task_content, ticket_args, task_args, error in zip(
+            frame.index,
+            frame['ticket_name'].tolist(),
+            frame['ticket_content'].tolist(),
+            frame['task_content'].tolist(),
+            _records(ticket_extra),
+            _records(task_extra),
+            errors.tolist(),
+        ):
+            plans.append(RowPlan(
+                ticket_args={'name': name, 'content': content, **ticket_args},
+                task_args={'content': task_content, **task_args},
+                users=actors.get('users_id', {}).get(index, []),
+                groups=actors.get('groups_id', {}).get(index, []),
+                status=ticket_args.get('status'),
+                error=error or None,
+            ))
+        return plans
+
+
+def iter_planned_rows(file_path: str, chunk_rows: int, plan: ImportPlan):
+    """
+    Yields ``(position, row, row_plan)`` for every row of the upload, reading
+    ``chunk_rows`` rows at a time and preparing each chunk at once. Each row
+    starts with ``Resultado = 'WAIT'``.
+    """
+    position = 0
+    for chunk in iter_csv_chunks(file_path, chunk_rows):
+        chunk['Resultado'] = 'WAIT'
+        for (_, row), row_plan in zip(chunk.iterrows(), plan.prepare(chunk)):
+            yield position, row, row_plan
+            position += 1
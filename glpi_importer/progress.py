@@ -0,0 +1,150 @@
+import json
+import math
+import time
+
+PROGRESS_KEY = 'glpi_automator:progress:{task_id}'
+ROWS_KEY = 'glpi_automator:progress:{task_id}:rows'
+# Colunas do resultado publicadas para cada linha, além da posição no arquivo
+ROW_FIELDS = ['Resultado', 'created_ticket_id', 'created_task_id']
+# Erros guardados no hash do progresso; a lista completa fica no resultado da tarefa
+MAX_STORED_ERRORS = 100
+
+
+def _cell(value) -> str:
+    # Sem pandas aqui: as páginas do Streamlit importam este módulo em toda carga
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value)
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class ProgressPublisher:
+    """
+    Progress of one import, published to Redis at most every ``min_interval``
+    seconds instead of on every row.
+
+    The hash ``glpi_automator:progress:<task id>`` holds ``total``, ``done``,
+    ``failed`` and ``status`` (``PROGRESS``, then the status of the task
+    result, with ``result_csv``/``error``). The outcome of each row (position
+    in the upload and :data:`ROW_FIELDS`) is appended to the stream
+    ``glpi_automator:progress:<task id>:rows``, so the status pages only read
+    the entries after the last one they showed. Fan-out chunks publish to the
+    hash and stream of the parent task: ``done``/``failed`` are incremented,
+    never overwritten.
+    """
+
+    def __init__(self, redis_client, task_id: str, total_rows: int | None = None, min_interval: float = 1.0,
+                 ttl_seconds: int = 24 * 60 * 60, on_publish=None) -> None:
+        """
+        :param redis_client: without it (e.g. eager runs with an in-memory result backend) only ``on_publish`` is called
+        :param on_publish: called with ``(done, total)`` after each publication, e.g. to update the Celery state
+        """
+        self.redis = redis_client
+        self.key = PROGRESS_KEY.format(task_id=task_id)
+        self.rows_key = ROWS_KEY.format(task_id=task_id)
+        self.total_rows = total_rows
+        self.min_interval = min_interval
+        self.ttl_seconds = ttl_seconds
+        self.on_publish = on_publish
+        self.done = 0
+        self._rows = []
+        self._failed = 0
+        self._published_at = 0.0
+
+    def start(self, total_rows: int) -> None:
+        self.total_rows = total_rows
+        self._update({'total': total_rows, 'status': 'PROGRESS'})
+
+    def row_done(self, position: int, row, error: str | None) -> None:
+        self._rows.append({'position': position, **{field: _cell(row.get(field)) for field in ROW_FIELDS}})
+        if error is not None:
+            self._failed += 1
+        if time.monotonic() - self._published_at >= self.min_interval:
+            self.publish()
+
+    def publish(self) -> None:
+        """
+        Sends the rows finished since the last publication in one round trip.
+        """
+        if not self._rows:
+            return
+        if self.redis is None:
+            self.done += len(self._rows)
+        else:
+            pipeline = self.redis.pipeline()
+            pipeline.hincrby(self.key, 'done', len(self._rows))
+            pipeline.hincrby(self.key, 'failed', self._failed)
+            pipeline.hset(self.key, 'updated_at', time.time())
+            for row in self._rows:
+                pipeline.xadd(self.rows_key, row)
+            pipeline.expire(self.key, self.ttl_seconds)
+            pipeline.expire(self.rows_key, self.ttl_seconds)
+            self.done = pipeline.execute()[0]
+        self._rows = []
+        self._failed = 0
+        self._published_at = time.monotonic()
+        if self.on_publish is not None:
+            self.on_publish(self.done, self.total_rows)
+
+    def finish(self, status: str, result_csv: str | None = None, error: list | None = None) -> None:
+        self.publish()
+        fields = {'status': status}
+        if result_csv is not None:
+            fields['result_csv'] = result_csv
+        if error:
+            fields['error'] = json.dumps(error[:MAX_STORED_ERRORS], ensure_ascii=False)
+        self._update(fields)
+
+    def _update(self, fields: dict) -> None:
+        if self.redis is None:
+            return
+        pipeline = self.redis.pipeline()
+        pipeline.hset(self.key, mapping={**fields, 'updated_at': time.time()})
+        pipeline.expire(self.key, self.ttl_seconds)
+        pipeline.execute()
+
+
+def read_progress(redis_client, task_ids: list) -> dict:
+    """
+    Reads the progress of every task in one round trip.
+
+    :return: ``{task_id: {'status', 'total', 'done', 'failed', 'result_csv', 'error'}}``; tasks that published
+        nothing yet (still queued, or expired) are left out
+    """
+    pipeline = redis_client.pipeline(transaction=False)
+    for task_id in task_ids:
+        pipeline.hgetall(PROGRESS_KEY.format(task_id=task_id))
+    progress = {}
+    for task_id, fields in zip(task_ids, pipeline.execute()):
+        if not fields:
+            continue
+        fields = {_text(field): _text(value) for field, value in fields.items()}
+        progress[task_id] = {
+            'status': fields.get('status', 'PROGRESS'),
+            'total': int(fields.get('total', 0)),
+            'done': int(fields.get('done', 0)),
+            'failed': int(fields.get('failed', 0)),
+            'result_csv': fields.get('result_csv'),
+            'error': json.loads(fields['error']) if 'error' in fields else [],
+        }
+    return progress
+
+
+def read_new_rows(redis_client, task_id: str, last_id: str = '0', count: int = 10_000) -> tuple[list, str]:
+    """
+    Reads the row outcomes published after ``last_id``.
+
+    :return: the rows (dicts with ``position`` and :data:`ROW_FIELDS`) and the id to pass on the next call
+    """
+    response = redis_client.xread({ROWS_KEY.format(task_id=task_id): last_id}, count=count)
+    rows = []
+    for _, entries in response:
+        for entry_id, fields in entries:
+            row = {_text(field): _text(value) for field, value in fields.items()}
+            row['position'] = int(row['position'])
+            rows.append(row)
+            last_id = _text(entry_id)
+    return rows, last_id
@@ -0,0 +1,215 @@
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .streaming import RESULT_COLUMNS
+
+# Tipos das colunas preenchidas pelo processamento; as colunas do upload ficam como texto, do jeito que vieram
+RESULT_TYPES = {
+    'Resultado': pa.string(),
+    'created_ticket_id': pa.int64(),
+    'ticket_ready_wait': pa.float64(),
+    'ticket_update_status_response': pa.bool_(),
+    'created_task_id': pa.int64(),
+}
+# Listas de logs dos atores, levadas para a tabela de logs (uma linha por ator)
+ACTOR_LOG_COLUMNS = {'ticket_actors_users_response': 'user', 'ticket_actors_groups_response': 'group'}
+ACTOR_LOG_SCHEMA = pa.schema([
+    ('position', pa.int64()),
+    ('actor', pa.string()),
+    ('seq', pa.int32()),
+    ('ticket', pa.int64()),
+    ('action', pa.string()),
+    ('status', pa.string()),
+    ('response', pa.string()),
+])
+# Ids e contagens com vazios continuam inteiros ao voltar para o pandas (em vez de virar float)
+PANDAS_TYPES = {pa.int64(): pd.Int64Dtype(), pa.int32(): pd.Int32Dtype(), pa.bool_(): pd.BooleanDtype()}
+# Filtros oferecidos pelas páginas
+RESULT_FILTERS = {
+    'Todas as linhas': None,
+    'Linhas com falha': ds.field('Resultado') != 'OK',
+    'Linhas com falha em atores': ds.field('actors_failed') > 0,
+}
+
+
+def columnar_paths(result_csv_path: str) -> tuple[str, str]:
+    """
+    :return: the Parquet files stored next to ``{task_id}_processed.csv``: the rows and the actor logs
+    """
+    base = result_csv_path[:-len('.csv')] if result_csv_path.endswith('.csv') else result_csv_path
+    return base + '.parquet', base + '_actors.parquet'
+
+
+def _text_column(values: pd.Series) -> pa.Array:
+    # Colunas numéricas com vazios chegam como float: 6.0 volta a ser '6'
+    values = values.map(lambda value: int(value) if isinstance(value, float) and value.is_integer() else value)
+    return pa.array(values.astype('string'), type=pa.string(), from_pandas=True)
+
+
+def _typed_column(values: pd.Series, data_type: pa.DataType) -> pa.Array:
+    if pa.types.is_integer(data_type):
+        values = pd.to_numeric(values, errors='coerce').astype('Int64')
+    elif pa.types.is_floating(data_type):
+        values = pd.to_numeric(values, errors='coerce')
+    elif pa.types.is_boolean(data_type):
+        values = values.map(lambda value: value if isinstance(value, bool) else None).astype('boolean')
+    else:
+        return _text_column(values)
+    return pa.array(values, type=data_type, from_pandas=True)
+
+
+class ParquetResultWriter:
+    """
+    Columnar copy of the result CSV, fed with the same frames (rows already
+    in upload order) by :class:`~glpi_importer.streaming.OrderedResultWriter`.
+
+    ``<base>.parquet`` has one row per upload row: ``position`` (row in the
+    upload), the upload columns as text, the result columns typed as in
+    :data:`RESULT_TYPES` and ``actors_failed``. The actor log lists are
+    normalized into ``<base>_actors.parquet``, one row per actor, linked by
+    ``position``. Rows are buffered into row groups of ``row_group_rows`` and
+    both files are written to ``.part`` and renamed on :meth:`close`, like
+    the CSV.
+    """
+
+    def __init__(self, result_csv_path: str, columns: list, row_offset: int = 0,
+                 row_group_rows: int = 10_000) -> None:
+        """
+        :param columns: result columns, as given to the CSV writer
+        :param row_offset: position of the first row written (fan-out chunks)
+        """
+        self.path, self.actors_path = columnar_paths(result_csv_path)
+        self.input_columns = [col for col in columns if col not in RESULT_COLUMNS]
+        self.schema = pa.schema(
+            [('position', pa.int64())]
+            + [(col, pa.string()) for col in self.input_columns]
+            + [(col, data_type) for col, data_type in RESULT_TYPES.items()]
+            + [('actors_failed', pa.int32())]
+        )
+        self.row_group_rows = row_group_rows
+        self._next_position = row_offset
+        self._rows = []
+        self._actor_logs = []
+        self._buffered_rows = 0
+        self._writer = pq.ParquetWriter(self.path + '.part', self.schema)
+        self._actors_writer = pq.ParquetWriter(self.actors_path + '.part', ACTOR_LOG_SCHEMA)
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if frame.empty:
+            return
+        positions = pd.RangeIndex(self._next_position, self._next_position + len(frame))
+        self._next_position += len(frame)
+        actor_logs = self._actor_logs_table(frame, positions)
+        columns = {'position': pa.array(positions, type=pa.int64())}
+        for col in self.input_columns:
+            columns[col] = _text_column(frame[col]) if col in frame else pa.nulls(len(frame), pa.string())
+        for col, data_type in RESULT_TYPES.items():
+            columns[col] = _typed_column(frame[col], data_type) if col in frame else pa.nulls(len(frame), data_type)
+        failed = actor_logs.filter(pc.equal(actor_logs['status'], 'fail'))['position'].to_pandas().value_counts()
+        columns['actors_failed'] = pa.array(failed.reindex(positions, fill_value=0), type=pa.int32())
+        self._add(pa.table(columns, schema=self.schema), actor_logs)
+
+    def append_file(self, result_csv_path: str) -> None:
+        """
+        Appends the files of another writer (a fan-out chunk), whose positions are already those of the upload.
+        """
+        path, actors_path = columnar_paths(result_csv_path)
+        rows = pq.read_table(path)
+        self._next_position += rows.num_rows
+        self._add(rows, pq.read_table(actors_path))
+
+    def _actor_logs_table(self, frame: pd.DataFrame, positions: pd.RangeIndex) -> pa.Table:
+        logs = []
+        for col, actor in ACTOR_LOG_COLUMNS.items():
+            if col not in frame:
+                continue
+            for position, entries in zip(positions, frame[col]):
+                # Células sem atores ficam NaN; só listas de logs vão para a tabela
+                if not isinstance(entries, list):
+                    continue
+                for seq, entry in enumerate(entries):
+                    logs.append({
+                        'position': position,
+                        'actor': actor,
+                        'seq': seq,
+                        'ticket': pd.to_numeric(entry.get('ticket'), errors='coerce'),
+                        'action': entry.get('action'),
+                        'status': entry.get('status'),
+                        'response': None if entry.get('response') is None else str(entry['response']),
+                    })
+        if not logs:
+            return ACTOR_LOG_SCHEMA.empty_table()
+        return pa.Table.from_pandas(
+            pd.DataFrame(logs).astype({'ticket': 'Int64'}), schema=ACTOR_LOG_SCHEMA, preserve_index=False
+        )
+
+    def _add(self, rows: pa.Table, actor_logs: pa.Table) -> None:
+        self._rows.append(rows)
+        self._actor_logs.append(actor_logs)
+        self._buffered_rows += rows.num_rows
+        if self._buffered_rows >= self.row_group_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._rows:
+            self._writer.write_table(pa.concat_tables(self._rows))
+        if any(table.num_rows for table in self._actor_logs):
+            self._actors_writer.write_table(pa.concat_tables(self._actor_logs))
+        self._rows = []
+        self._actor_logs = []
+        self._buffered_rows = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+        self._actors_writer.close()
+        os.replace(self.path + '.part', self.path)
+        os.replace(self.actors_path + '.part', self.actors_path)
+
+
+def remove_columnar_files(result_csv_path: str) -> None:
+    for path in columnar_paths(result_csv_path):
+        for leftover in (path, path + '.part'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def read_result_page(path: str, offset: int, limit: int, row_filter: ds.Expression | None = None) -> tuple[pd.DataFrame, int]:
+    """
+    Reads one page of the rows matching ``row_filter``: only the ``position``
+    column is scanned to find the page, then just the row groups holding those
+    positions are read.
+
+    :return: the page indexed by ``position`` and the number of matching rows
+    """
+    dataset = ds.dataset(path, format='parquet')
+    positions = dataset.to_table(columns=['position'], filter=row_filter)['position']
+    page_positions = positions.slice(offset, limit)
+    page = dataset.to_table(filter=ds.field('position').isin(page_positions.to_pylist()))
+    page = page.to_pandas(types_mapper=PANDAS_TYPES.get)
+    return page.set_index('position').sort_index(), len(positions)
+
+
+def read_actor_logs(actors_path: str, positions: list) -> pd.DataFrame:
+    dataset = ds.dataset(actors_path, format='parquet')
+    logs = dataset.to_table(filter=ds.field('position').isin(positions)).to_pandas(types_mapper=PANDAS_TYPES.get)
+    return logs.sort_values(['position', 'actor', 'seq'])
+
+
+def export_result_csv(path: str, row_filter: ds.Expression | None = None) -> bytes:
+    """
+    CSV of the rows matching ``row_filter``, without the actor logs (they are
+    in the actor log table and in the full result CSV).
+    """
+    dataset = ds.dataset(path, format='parquet')
+    buffer = io.StringIO()
+    buffer.write(','.join(dataset.schema.names) + '\n')
+    for batch in dataset.to_batches(filter=row_filter):
+        batch.to_pandas(types_mapper=PANDAS_TYPES.get).to_csv(buffer, header=False, index=False)
+    return buffer.getvalue().encode('utf-8')
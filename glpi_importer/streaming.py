@@ -0,0 +1,120 @@
+import os
+import shutil
+
+import pandas as pd
+
+CSV_OPTIONS = {'sep': ';', 'encoding': 'utf-8'}
+# Células lidas como texto, exatamente como estão no arquivo (sem inferir tipos: 7 não vira 7.0 numa coluna com vazios)
+RAW_CSV_OPTIONS = {'dtype': str, 'keep_default_na': False}
+
+# Colunas que o processamento de uma linha pode preencher, na ordem em que aparecem no resultado
+RESULT_COLUMNS = [
+    'Resultado',
+    'created_ticket_id',
+    'ticket_actors_users_response',
+    'ticket_actors_groups_response',
+    'ticket_ready_wait',
+    'ticket_update_status_response',
+    'created_task_id',
+]
+
+
+def read_csv_header(file_path: str) -> list:
+    return list(pd.read_csv(file_path, nrows=0, **CSV_OPTIONS).columns)
+
+
+def count_csv_rows(file_path: str, chunk_rows: int = 10_000) -> int:
+    """
+    Counts the data rows of an upload without loading it, parsing only the
+    first column (quoted cells may span several physical lines).
+    """
+    return sum(len(chunk) for chunk in pd.read_csv(file_path, usecols=[0], chunksize=chunk_rows, **CSV_OPTIONS))
+
+
+def iter_csv_chunks(file_path: str, chunk_rows: int, **options):
+    yield from pd.read_csv(file_path, chunksize=chunk_rows, **CSV_OPTIONS, **options)
+
+
+def path_with_suffix(path: str, suffix: str) -> str:
+    # 'pasta.csv/upload.csv' -> 'pasta.csv/upload<suffix>.csv': só a extensão do arquivo é considerada
+    root, ext = os.path.splitext(path)
+    return f'{root}{suffix}{ext}'
+
+
+def result_columns(input_columns: list) -> list:
+    return [col for col in input_columns if col not in RESULT_COLUMNS] + RESULT_COLUMNS
+
+
+class OrderedResultWriter:
+    """
+    Appends processed rows to the result CSV as soon as every row before them
+    is done, so rows finished out of order by the concurrent engines still land
+    in upload order and memory only holds the rows still waiting for a
+    predecessor.
+
+    Rows go to ``<path>.part`` while the import runs, so partial results are
+    on disk during the job; :meth:`close` renames it to ``path``, which is what
+    tells the Streamlit pages that the import finished.
+    """
+
+    def __init__(self, path: str, columns: list, flush_rows: int = 100, columnar=None) -> None:
+        """
+        :param columnar: :class:`~glpi_importer.result_store.ParquetResultWriter` that gets the same rows
+        """
+        self.path = path
+        self.partial_path = path + '.part'
+        self.columns = columns
+        self.flush_rows = flush_rows
+        self.columnar = columnar
+        self._next_position = 0
+        self._waiting = {}
+        self._ready = []
+        self._header_written = False
+
+    def add(self, position: int, row: pd.Series) -> None:
+        self._waiting[position] = row
+        while self._next_position in self._waiting:
+            self._ready.append(self._waiting.pop(self._next_position))
+            self._next_position += 1
+        if len(self._ready) >= self.flush_rows:
+            self.flush()
+
+    def is_added(self, position: int) -> bool:
+        return position < self._next_position or position in self._waiting
+
+    def flush(self) -> None:
+        if not self._ready and self._header_written:
+            return
+        # object: ids com vazios (tarefa não criada) continuam inteiros no CSV, em vez de virar float
+        frame = pd.DataFrame(self._ready, dtype=object).reindex(columns=self.columns)
+        frame.to_csv(self.partial_path, mode='a' if self._header_written else 'w',
+                     header=not self._header_written, index=False)
+        if self.columnar is not None:
+            self.columnar.write(frame)
+        self._header_written = True
+        self._ready = []
+
+    def append_frame(self, frame: pd.DataFrame) -> None:
+        """Appends rows that are already in order (e.g. a whole chunk result)."""
+        self.flush()
+        frame = frame.reindex(columns=self.columns)
+        frame.to_csv(self.partial_path, mode='a', header=False, index=False)
+        if self.columnar is not None:
+            self.columnar.write(frame)
+
+    def append_csv(self, path: str) -> None:
+        """
+        Appends, byte for byte, the rows of a CSV written by another writer with
+        the same columns (a fan-out chunk result), without parsing it again.
+        Only the CSV gets them: a Parquet copy has to be fed separately.
+        """
+        self.flush()
+        with open(path, 'rb') as source, open(self.partial_path, 'ab') as target:
+            source.readline()
+            shutil.copyfileobj(source, target)
+
+    def close(self) -> None:
+        self.flush()
+        if self.columnar is not None:
+            self.columnar.close()
+        os.replace(self.partial_path, self.path)
@@ -0,0 +1,25 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+CYCLE_SECONDS = Histogram(
+    'glpi_tag_runner_cycle_duration_seconds',
+    'Duration of each runner loop, without the interval',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+CYCLE_ERRORS = Counter(
+    'glpi_tag_runner_cycle_errors_total',
+    'Runner loops interrupted by a database error',
+)
+LAST_CYCLE = Gauge(
+    'glpi_tag_runner_last_cycle_timestamp_seconds',
+    'Unix time the last runner loop finished',
+)
+ROWS_SCANNED = Counter(
+    'glpi_tag_runner_rows_scanned_total',
+    'Changed rows (closed tasks, new follow-ups) read by the runner, by trigger',
+    ['trigger'],
+)
+TAGS_INSERTED = Counter(
+    'glpi_tag_runner_tags_inserted_total',
+    'Tag links inserted by the runner, by trigger',
+    ['trigger'],
+)
@@ -0,0 +1,148 @@
+import json
+import time
+
+import pandas as pd
+
+# Lotes de linhas alteradas que disparam regras: tarefas que passaram para o estado 2 e novos followups
+TRIGGERS = ('task_closed', 'followup')
+
+# Regras que eram fixas no runner
+DEFAULT_RULES = [
+    {'name': 'tarefa_encerrada', 'tag': 8, 'trigger': 'task_closed'},
+    {'name': 'followup_do_requerente', 'tag': 9, 'trigger': 'followup', 'itemtype': 'Ticket', 'user_types': [1]},
+]
+
+
+def _as_list(value) -> list | None:
+    if value is None:
+        return None
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+class TagRule:
+    """
+    One declarative rule: rows of the ``trigger`` batch that pass every filter
+    set on the rule get the tag ``tag`` on their item. Filters left unset match
+    everything; list filters match any of their values.
+
+    - ``itemtype``: type of the item (``Ticket``, ``Problem``, ...)
+    - ``user_types``: actor types the author of the row has on the ticket (1 requester, 2 assigned, 3 observer)
+    - ``groups``: groups linked to the ticket
+    - ``categories``: ``itilcategories_id`` of the ticket
+    - ``status``: current status of the ticket
+
+    Each rule keeps its own counters: rows matched, tags added and time spent
+    evaluating it.
+    """
+
+    def __init__(self, name: str, tag: int, trigger: str, itemtype=None, user_types=None, groups=None,
+                 categories=None, status=None) -> None:
+        if trigger not in TRIGGERS:
+            raise ValueError(f'Regra {name}: gatilho desconhecido {trigger!r}, use um de {TRIGGERS}')
+        self.name = name
+        self.tag = int(tag)
+        self.trigger = trigger
+        self.itemtype = _as_list(itemtype)
+        self.user_types = _as_list(user_types)
+        self.groups = _as_list(groups)
+        self.categories = _as_list(categories)
+        self.status = _as_list(status)
+        self.matches = 0
+        self.tagged = 0
+        self.eval_seconds = 0.0
+
+    def evaluate(self, batch: 'RuleBatch') -> pd.Series:
+        """
+        :return: boolean mask of the batch rows matched by the rule
+        """
+        rows = batch.rows
+        mask = pd.Series(True, index=rows.index)
+        if self.itemtype is not None:
+            mask &= rows['itemtype'].isin(self.itemtype)
+        if self.categories is not None:
+            mask &= rows['itilcategories_id'].isin(self.categories)
+        if self.status is not None:
+            mask &= rows['status'].isin(self.status)
+        if self.user_types is not None:
+            mask &= batch.user_type_mask(self.user_types)
+        if self.groups is not None:
+            mask &= batch.group_mask(self.groups)
+        return mask
+
+    def stats(self) -> dict:
+        return {
+            'tag': self.tag,
+            'trigger': self.trigger,
+            'matches': self.matches,
+            'tagged': self.tagged,
+            'eval_seconds': round(self.eval_seconds, 6),
+        }
+
+
+class RuleBatch:
+    """
+    Changed rows of one trigger, shared by every rule of that trigger.
+
+    :param rows: one row per change, with ``itemtype``, ``items_id``, ``users_id``, ``status`` and ``itilcategories_id``
+    :param actors: ``tickets_id``, ``users_id``, ``type`` of the tickets in ``rows`` (only when a rule filters by user type)
+    :param groups: ``tickets_id``, ``groups_id`` of the tickets in ``rows`` (only when a rule filters by group)
+    """
+
+    def __init__(self, rows: pd.DataFrame, actors: pd.DataFrame | None = None,
+                 groups: pd.DataFrame | None = None) -> None:
+        self.rows = rows
+        self.actors = actors
+        self.groups = groups
+        self.is_ticket = rows['itemtype'] == 'Ticket'
+
+    def user_type_mask(self, user_types: list) -> pd.Series:
+        actors = self.actors[self.actors['type'].isin(user_types)]
+        keys = pd.MultiIndex.from_frame(actors[['tickets_id', 'users_id']])
+        rows = pd.MultiIndex.from_frame(self.rows[['items_id', 'users_id']])
+        return self.is_ticket & pd.Series(rows.isin(keys), index=self.rows.index)
+
+    def group_mask(self, groups: list) -> pd.Series:
+        tickets = self.groups.loc[self.groups['groups_id'].isin(groups), 'tickets_id']
+        return self.is_ticket & self.rows['items_id'].isin(tickets)
+
+
+def needs_actors(rules: list) -> bool:
+    return any(rule.user_types is not None for rule in rules)
+
+
+def needs_groups(rules: list) -> bool:
+    return any(rule.groups is not None for rule in rules)
+
+
+def evaluate_rules(rules: list, batch: RuleBatch) -> dict:
+    """
+    Runs every rule over the same batch and updates their match counters.
+
+    :return: the ``(tag, itemtype, items_id)`` links the batch asks for, with the rules that asked for each one
+    """
+    links = {}
+    for rule in rules:
+        started = time.perf_counter()
+        matched = batch.rows[rule.evaluate(batch)]
+        for itemtype, items_id in zip(matched['itemtype'].tolist(), matched['items_id'].tolist()):
+            link_rules = links.setdefault((rule.tag, itemtype, int(items_id)), [])
+            if rule not in link_rules:
+                link_rules.append(rule)
+        rule.eval_seconds += time.perf_counter() - started
+        rule.matches += len(matched)
+    return links
+
+
+def load_rules(path: str | None = None) -> list:
+    """
+    Reads the rules from a JSON file with a list of :class:`TagRule` fields, e.g.::
+
+        [{"name": "followup_do_requerente", "tag": 9, "trigger": "followup", "itemtype": "Ticket", "user_types": [1]}]
+
+    :param path: rules file; without it the runner keeps its original two rules
+    """
+    definitions = DEFAULT_RULES
+    if path:
+        with open(path, encoding='utf-8') as f:
+            definitions = json.load(f)
+    return [TagRule(**definition) for definition in definitions]
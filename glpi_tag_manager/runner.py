@@ -1,49 +1,123 @@
+import json
 import logging
-from sqlalchemy import create_engine, select, func, insert, Table, MetaData, and_
-from sqlalchemy.orm import sessionmaker
+from datetime import datetime
+from sqlalchemy import create_engine, select, func, insert, literal, true, Table, MetaData, Column, Integer, String, DateTime, and_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import scoped_session, sessionmaker
 from dotenv import load_dotenv
 import os
 import time
 import pandas as pd
+from prometheus_client import start_http_server
+
+from . import metrics
+from .change_capture import BinlogWatcher
+from .rules import RuleBatch, evaluate_rules, load_rules, needs_actors, needs_groups
+from .sharding import MySQLLease, RedisLease, acquire_shard
 
 load_dotenv()
 
 
 class Runner:
-    def __init__(self):
+    def __init__(self, engine=None):
         """
         Initializes the class instance and sets up the configuration and database connection.
 
+        Args:
+            engine (Engine or None): Engine to use instead of the MySQL one built from the `DB_*` variables, e.g. a
+                local copy of the schema in the benchmarks.
+
         Attributes:
             db_user (str): Database username from environment variable `DB_USER`.
             db_password (str): Database password from environment variable `DB_PASSWORD`.
             db_host (str): Database host from environment variable `DB_HOST`.
             db_database (str): Database name from environment variable `DB_DATABASE`.
             sleep_time (int): Time to sleep between loops, from environment variable `SLEEP_TIME` with a default of 10 seconds.
+            sleep_min (float): Interval after a loop that found work, from environment variable `SLEEP_MIN`; defaults to
+                `sleep_time`.
+            sleep_max (float): Longest interval while idle, from environment variable `SLEEP_MAX`; defaults to
+                `sleep_time`. Each idle loop doubles the interval up to it, so with `SLEEP_MIN` < `SLEEP_MAX` the
+                runner polls often during bursts and rarely when quiet.
+            change_capture (str): `poll` (default) or `binlog`, from environment variable `CHANGE_CAPTURE`. In
+                `binlog` mode a `BinlogWatcher` (replication id from `BINLOG_SERVER_ID`) starts a loop as soon as
+                follow-ups or tasks change, and the interval only bounds the wait.
+            cycle_rows (int): Changed rows handled by the current loop.
+            shard_count (int): Number of shards the tickets are split into (`ticket id % shard_count`), from
+                environment variable `SHARD_COUNT` with a default of 1 (no sharding).
+            shard_index (int or None): Shard handled by this replica, from environment variable `SHARD_INDEX`, or
+                taken through a lease when `shard_lease` is set.
+            shard_lease (str or None): `mysql` (`GET_LOCK`) or `redis` (key with TTL `SHARD_LEASE_TTL`, Redis from
+                `REDIS_HOST`/`REDIS_PORT`), from environment variable `SHARD_LEASE`. Each replica takes the lease of
+                a free shard and exits when it loses it; with `SHARD_COUNT=1` this makes extra replicas stand-bys.
+            lease (MySQLLease or RedisLease or None): Lease of the shard of this replica.
+            tasks_tracking (str): How closed tasks are detected, from environment variable `TASKS_TRACKING`:
+                `snapshot` (default) diffs the whole set of active tasks on every loop, `incremental` only reads
+                the tasks modified since the last loop.
+            state_file (str or None): Checkpoint file, from environment variable `RUNNER_STATE_FILE`. When set, the
+                active tasks are saved to it at most once per loop, only when they changed, and `max_id` to the small
+                `<state_file>.max_id` after every follow-up batch; both are restored on startup, so a restart resumes
+                exactly where the runner stopped.
+            followups_batch (int): Follow-ups handled per query while catching up, from environment variable
+                `FOLLOWUPS_BATCH` with a default of 1000.
+            checkpoint_dirty (bool): Whether the active tasks changed since the last checkpoint.
+            rules (list): Tag rules, from the JSON file in environment variable `TAG_RULES_FILE`; without it, the
+                original rules (tag 8 when a task closes, tag 9 when the requester posts a follow-up).
+            db_pool_size (int): Connections kept by the engine pool, from environment variable `DB_POOL_SIZE` with a
+                default of 2 (the runner uses one connection at a time).
+            db_pool_recycle (int): Seconds after which a pooled connection is replaced, from environment variable
+                `DB_POOL_RECYCLE` with a default of 3600, below the MySQL `wait_timeout`.
+            metrics_port (int): Port of the Prometheus `/metrics` endpoint served by `job`, from environment variable
+                `METRICS_PORT`; 0 (default) disables it.
             database_uri (str): Database URI constructed from the database credentials and host.
             max_id (int): Maximum ID value set to 100.
-            session (Session or None): SQLAlchemy session object, initialized as None.
+            session (scoped_session or None): SQLAlchemy session registry; each loop uses one session, removed at
+                the end of the loop, initialized as None.
             metadata (MetaData or None): SQLAlchemy metadata object, initialized as None.
             glpi_tickettasks (Table or None): SQLAlchemy Table object for GLPI ticket tasks, initialized as None.
             glpi_itilfollowups (Table or None): SQLAlchemy Table object for GLPI ITIL follow-ups, initialized as None.
             glpi_tickets_users (Table or None): SQLAlchemy Table object for GLPI tickets users, initialized as None.
             glpi_plugin_tag_tagitems (Table or None): SQLAlchemy Table object for GLPI plugin tag items, initialized as None.
+            glpi_tickets (Table or None): SQLAlchemy Table object for GLPI tickets, initialized as None.
+            glpi_groups_tickets (Table or None): SQLAlchemy Table object for GLPI groups tickets, initialized as None.
             logger (Logger): Logger object for logging purposes.
-            engine (Engine): SQLAlchemy engine instance created using the database URI.
-            active_tasks (List or None): List of active tasks, initialized with `get_active_tasks` method.
+            engine (Engine): SQLAlchemy engine instance created using the database URI, or the one given.
+            active_tasks (List or None): List of active tasks, initialized with `get_active_tasks` method
+                (`snapshot` tracking only).
+            active_task_ids (set or None): Ids of the active tasks (`incremental` tracking only).
+            tasks_date_mod (datetime or None): Highest `date_mod` already read from the tasks table
+                (`incremental` tracking only).
             active_targets (List or None): List of active targets, initialized as None.
 
         Methods:
             validate_config(): Validates the configuration settings.
-            create_session(): Creates a new SQLAlchemy session.
+            create_session(): Declares the tables and creates the session registry.
             get_active_tasks(): Retrieves a list of active tasks.
             load_max_id(): Loads the maximum ID value.
+            load_checkpoint(): Reads the saved state, if any.
+            save_checkpoint(): Saves the active tasks when they changed.
+            save_max_id(): Saves `max_id`.
         """
         self.db_user = os.getenv("DB_USER")
         self.db_password = os.getenv("DB_PASSWORD")
         self.db_host = os.getenv("DB_HOST")
         self.db_database = os.getenv("DB_DATABASE")
         self.sleep_time = int(os.getenv("SLEEP_TIME", 10))
+        self.sleep_min = float(os.getenv("SLEEP_MIN", self.sleep_time))
+        self.sleep_max = float(os.getenv("SLEEP_MAX", self.sleep_time))
+        self.change_capture = os.getenv("CHANGE_CAPTURE", "poll")
+        self.cycle_rows = 0
+        self.shard_count = int(os.getenv("SHARD_COUNT", 1))
+        self.shard_index = int(os.getenv("SHARD_INDEX", 0))
+        self.shard_lease = os.getenv("SHARD_LEASE")
+        self.lease = None
+        self.tasks_tracking = os.getenv("TASKS_TRACKING", "snapshot")
+        self.state_file = os.getenv("RUNNER_STATE_FILE")
+        self.followups_batch = int(os.getenv("FOLLOWUPS_BATCH", 1000))
+        self.checkpoint_dirty = False
+        self.rules = load_rules(os.getenv("TAG_RULES_FILE"))
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", 2))
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", 3600))
+        self.metrics_port = int(os.getenv("METRICS_PORT", 0))
         self.database_uri = f'mysql+mysqlconnector://{self.db_user}:{self.db_password}@{self.db_host}:3306/{self.db_database}'
         self.max_id = 100
         self.session = None
@@ -52,18 +126,111 @@ class Runner:
         self.glpi_itilfollowups = None
         self.glpi_tickets_users = None
         self.glpi_plugin_tag_tagitems = None
+        self.glpi_tickets = None
+        self.glpi_groups_tickets = None
         self.logger = logging.getLogger(__name__)
 
-        self.validate_config()
-
-        self.engine = create_engine(self.database_uri)
+        if engine is not None:
+            self.engine = engine
+        else:
+            self.validate_config()
+
+            # pool_pre_ping: conexões derrubadas pelo MySQL enquanto ociosas são descartadas antes do uso
+            self.engine = create_engine(
+                self.database_uri,
+                pool_size=self.db_pool_size,
+                max_overflow=0,
+                pool_pre_ping=True,
+                pool_recycle=self.db_pool_recycle
+            )
         self.create_session()
-
-        self.active_tasks = self.get_active_tasks()
+        self.assign_shard()
+
+        checkpoint = self.load_checkpoint()
+        self.active_tasks = None
+        self.active_task_ids = None
+        self.tasks_date_mod = None
+        if self.tasks_tracking == 'incremental':
+            if 'active_task_ids' in checkpoint:
+                self.active_task_ids = set(checkpoint['active_task_ids'])
+                self.tasks_date_mod = datetime.fromisoformat(checkpoint['tasks_date_mod'])
+            else:
+                self.active_task_ids, self.tasks_date_mod = self.get_active_task_ids()
+                self.checkpoint_dirty = True
+        else:
+            if 'active_tasks' in checkpoint:
+                self.active_tasks = pd.DataFrame(checkpoint['active_tasks'], columns=['id', 'tickets_id'])
+            else:
+                self.active_tasks = self.get_active_tasks()
+                self.checkpoint_dirty = True
         self.active_targets = None
 
-        self.create_session()
-        self.load_max_id()
+        if 'max_id' in checkpoint:
+            self.max_id = checkpoint['max_id']
+        else:
+            self.load_max_id()
+        self.save_checkpoint()
+        self.save_max_id()
+        self.session.remove()
+
+    def load_checkpoint(self):
+        """
+        Reads the state saved by `save_checkpoint` and `save_max_id`.
+
+        :return: The saved state, or an empty dict when there is no checkpoint file.
+        """
+        checkpoint = {}
+        if not self.state_file:
+            return checkpoint
+        # Checkpoints antigos guardam o max_id junto das tarefas; o arquivo próprio, quando existe, é mais recente
+        for path in (self.state_file, self.max_id_file):
+            if os.path.exists(path):
+                self.logger.info(f'loading checkpoint {path}...')
+                with open(path, encoding='utf-8') as f:
+                    checkpoint.update(json.load(f))
+        if checkpoint:
+            self.logger.info(f"Checkpoint restaurado: max_id {checkpoint.get('max_id')}")
+        return checkpoint
+
+    @property
+    def max_id_file(self):
+        return f'{self.state_file}.max_id'
+
+    def write_state(self, path, state):
+        # Substituído de forma atômica: uma queda durante a gravação mantém o checkpoint anterior
+        partial_file = path + '.part'
+        with open(partial_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(partial_file, path)
+
+    def save_checkpoint(self):
+        """
+        Saves the active tasks to `state_file`, if configured and they changed. The file is replaced atomically, so
+        a crash while saving keeps the previous checkpoint. The whole set is serialized, so `job` calls this once
+        per loop; `max_id` moves far more often and is saved apart by `save_max_id`.
+
+        :return: None
+        """
+        if not self.state_file or not self.checkpoint_dirty:
+            return
+        checkpoint = {}
+        if self.active_task_ids is not None:
+            checkpoint['active_task_ids'] = sorted(self.active_task_ids)
+            checkpoint['tasks_date_mod'] = self.tasks_date_mod.isoformat()
+        if self.active_tasks is not None:
+            checkpoint['active_tasks'] = self.active_tasks[['id', 'tickets_id']].astype(int).values.tolist()
+        self.write_state(self.state_file, checkpoint)
+        self.checkpoint_dirty = False
+
+    def save_max_id(self):
+        """
+        Saves `max_id` to `<state_file>.max_id`, if configured. It is a few bytes, written after every follow-up
+        batch.
+
+        :return: None
+        """
+        if self.state_file:
+            self.write_state(self.max_id_file, {'max_id': int(self.max_id)})
 
     def get_active_tasks(self):
         """
@@ -74,7 +241,11 @@ class Runner:
 
         ticket_tasks = self.session.execute(
             select(self.glpi_tickettasks.c.id, self.glpi_tickettasks.c.tickets_id).where(
-                self.glpi_tickettasks.c.state != 2)
+                and_(
+                    self.glpi_tickettasks.c.state != 2,
+                    self.shard_condition(self.glpi_tickettasks.c.tickets_id)
+                )
+            )
         )
         return pd.DataFrame(ticket_tasks.fetchall(), columns=ticket_tasks.keys())
 
@@ -87,55 +258,224 @@ class Runner:
         # order by id desc
         # """, con=self.engine)
 
+    def get_active_task_ids(self):
+        """
+        Loads the starting point of the `incremental` tracking: only the ids of the active tasks, kept in a set,
+        and the highest `date_mod` of the tasks table.
+
+        :return: A tuple with the set of active task ids and the high-water mark of `date_mod`.
+        """
+        self.logger.info('loading task ids...')
+
+        active_task_ids = set(self.session.execute(
+            select(self.glpi_tickettasks.c.id).where(
+                and_(
+                    self.glpi_tickettasks.c.state != 2,
+                    self.shard_condition(self.glpi_tickettasks.c.tickets_id)
+                )
+            )
+        ).scalars())
+        tasks_date_mod = self.session.execute(select(func.max(self.glpi_tickettasks.c.date_mod))).scalar()
+        return active_task_ids, tasks_date_mod or datetime(1970, 1, 1)
+
+    def check_changed_tasks(self):
+        """
+        `incremental` tracking: reads only the tasks with `date_mod` at or above the high-water mark. Active tasks
+        that moved to state 2 become the targets, other tasks are added to the active set. Tasks modified again in
+        the same second are read twice, which the set makes harmless.
+
+        :return: None
+        """
+        self.logger.info('checking changed tasks...')
+        changed_tasks = self.session.execute(
+            select(
+                self.glpi_tickettasks.c.id,
+                self.glpi_tickettasks.c.tickets_id,
+                self.glpi_tickettasks.c.state,
+                self.glpi_tickettasks.c.date_mod
+            ).where(
+                and_(
+                    self.glpi_tickettasks.c.date_mod >= self.tasks_date_mod,
+                    self.shard_condition(self.glpi_tickettasks.c.tickets_id)
+                )
+            ).order_by(self.glpi_tickettasks.c.date_mod)
+        ).fetchall()
+
+        active_count, tasks_date_mod = len(self.active_task_ids), self.tasks_date_mod
+        closed_tasks = []
+        for task_id, tickets_id, state, date_mod in changed_tasks:
+            if state == 2:
+                if task_id in self.active_task_ids:
+                    self.active_task_ids.discard(task_id)
+                    closed_tasks.append((task_id, tickets_id))
+            else:
+                self.active_task_ids.add(task_id)
+            self.tasks_date_mod = max(self.tasks_date_mod, date_mod)
+
+        if closed_tasks:
+            self.add_targets(pd.DataFrame(closed_tasks, columns=['id', 'tickets_id']))
+        # As tarefas do último segundo são relidas em todo ciclo: só grava quando o conjunto ou a marca mudaram
+        if closed_tasks or len(self.active_task_ids) != active_count or self.tasks_date_mod != tasks_date_mod:
+            self.checkpoint_dirty = True
+        self.logger.info(f"Tarefas alteradas: {len(changed_tasks)}, ativas: {len(self.active_task_ids)}")
+
     def check_active_tasks(self):
         """
         Checks and updates the list of active tasks.
 
         :return: None
         """
+        if self.tasks_tracking == 'incremental':
+            return self.check_changed_tasks()
+
         self.logger.info('checking active tasks...')
-        self.active_targets = None
         actual_tasks = self.get_active_tasks()
 
         removed_tasks = self.active_tasks[~self.active_tasks['id'].isin(actual_tasks['id'])]
         if not removed_tasks.empty:
-            self.active_targets = removed_tasks
+            self.add_targets(removed_tasks)
+        if not removed_tasks.empty or len(actual_tasks) != len(self.active_tasks):
+            self.checkpoint_dirty = True
         self.active_tasks = actual_tasks
 
+    def add_targets(self, closed_tasks):
+        """
+        Queues closed tasks for `link_return_tag`. Targets of a loop that failed before tagging are kept and
+        handled with the next ones.
+
+        :return: None
+        """
+        if self.active_targets is None:
+            self.active_targets = closed_tasks[['id', 'tickets_id']]
+        else:
+            self.active_targets = pd.concat([self.active_targets, closed_tasks[['id', 'tickets_id']]])
+
     def link_return_tag(self):
         """
-        Links a return tag to active tickets if the tag does not already exist.
+        Applies the `task_closed` rules to the tasks that were closed. The default rule links tag 8 (return tag) to
+        their tickets.
 
         :return: None
         """
         self.logger.info('linking return tag...')
 
         if self.active_targets is not None and not self.active_targets.empty:
-            self.active_targets = self.active_targets.astype(object).where(pd.notnull(self.active_targets), None)
-            for _, row in self.active_targets.iterrows():
-                ticket_id = int(row['tickets_id'])
-
-                existing_link = self.session.execute(
-                    select(self.glpi_plugin_tag_tagitems.c.id).where(
-                        and_(
-                            self.glpi_plugin_tag_tagitems.c.plugin_tag_tags_id == 8,
-                            self.glpi_plugin_tag_tagitems.c.items_id == ticket_id,
-                            self.glpi_plugin_tag_tagitems.c.itemtype == 'Ticket'
-                        )
+            task_ids = [int(task_id) for task_id in self.active_targets['id']]
+            self.cycle_rows += len(task_ids)
+            metrics.ROWS_SCANNED.labels('task_closed').inc(len(task_ids))
+            rows = self.session.execute(
+                select(
+                    literal('Ticket').label('itemtype'),
+                    self.glpi_tickettasks.c.tickets_id.label('items_id'),
+                    self.glpi_tickettasks.c.users_id_tech.label('users_id'),
+                    self.glpi_tickets.c.status,
+                    self.glpi_tickets.c.itilcategories_id
+                ).select_from(
+                    self.glpi_tickettasks.outerjoin(
+                        self.glpi_tickets, self.glpi_tickets.c.id == self.glpi_tickettasks.c.tickets_id
                     )
-                ).first()
-                if not existing_link:
-                    self.session.execute(
-                        insert(self.glpi_plugin_tag_tagitems).values(
-                            plugin_tag_tags_id=8,
-                            items_id=ticket_id,
-                            itemtype='Ticket'
-                        )
+                ).where(self.glpi_tickettasks.c.id.in_(task_ids))
+            )
+            added = self.apply_rules('task_closed', rows)
+            self.session.commit()
+            self.active_targets = None
+            self.logger.info(f"Tarefas encerradas: {len(task_ids)}, tags adicionadas: {added}")
+
+    def apply_rules(self, trigger, rows):
+        """
+        Evaluates every rule of `trigger` against the same batch of changed rows and links the tags they ask for.
+        The number of queries does not depend on the number of rules: the ticket actors and groups are loaded once
+        for the batch (only if a rule filters by them), the links that already exist are filtered with a single
+        query and the new ones are inserted with one multi-row INSERT. The caller commits.
+
+        :param rows: result with `itemtype`, `items_id`, `users_id`, `status` and `itilcategories_id` per change
+        :return: The number of tag links added.
+        """
+        rules = [rule for rule in self.rules if rule.trigger == trigger]
+        batch_rows = pd.DataFrame(rows.fetchall(), columns=list(rows.keys()))
+        if not rules or batch_rows.empty:
+            return 0
+
+        ticket_ids = [int(ticket_id) for ticket_id in batch_rows.loc[batch_rows['itemtype'] == 'Ticket', 'items_id'].unique()]
+        actors = groups = None
+        if needs_actors(rules):
+            actors = self.read_frame(
+                select(
+                    self.glpi_tickets_users.c.tickets_id,
+                    self.glpi_tickets_users.c.users_id,
+                    self.glpi_tickets_users.c.type
+                ).where(self.glpi_tickets_users.c.tickets_id.in_(ticket_ids))
+            )
+        if needs_groups(rules):
+            groups = self.read_frame(
+                select(
+                    self.glpi_groups_tickets.c.tickets_id,
+                    self.glpi_groups_tickets.c.groups_id
+                ).where(self.glpi_groups_tickets.c.tickets_id.in_(ticket_ids))
+            )
+        links = evaluate_rules(rules, RuleBatch(batch_rows, actors, groups))
+
+        if links:
+            existing = {tuple(row) for row in self.session.execute(
+                select(
+                    self.glpi_plugin_tag_tagitems.c.plugin_tag_tags_id,
+                    self.glpi_plugin_tag_tagitems.c.itemtype,
+                    self.glpi_plugin_tag_tagitems.c.items_id
+                ).where(
+                    and_(
+                        self.glpi_plugin_tag_tagitems.c.plugin_tag_tags_id.in_({tag for tag, _, _ in links}),
+                        self.glpi_plugin_tag_tagitems.c.items_id.in_({items_id for _, _, items_id in links})
                     )
-                    self.session.commit()
-                    self.logger.info(f"Tag adicionada ao ticket {ticket_id}")
-                else:
-                    self.logger.info(f"Vínculo já existente para o ticket {ticket_id}")
+                )
+            )}
+            new_links = [link for link in links if link not in existing]
+            self.add_tags(new_links)
+            metrics.TAGS_INSERTED.labels(trigger).inc(len(new_links))
+            for link in new_links:
+                for rule in links[link]:
+                    rule.tagged += 1
+        else:
+            new_links = []
+
+        for rule in rules:
+            self.logger.info(
+                f"Regra {rule.name}: {rule.matches} correspondências, {rule.tagged} tags, "
+                f"{rule.eval_seconds * 1000:.1f} ms de avaliação (acumulado)"
+            )
+        return len(new_links)
+
+    def read_frame(self, statement):
+        """
+        :return: A pandas DataFrame with the rows of `statement`.
+        """
+        result = self.session.execute(statement)
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    def add_tags(self, links):
+        """
+        Links the tags with one multi-row INSERT. The caller commits. The INSERT ignores links that already exist
+        (unique key of `glpi_plugin_tag_tagitems`), so replaying a batch or a race with another replica never
+        duplicates a tag.
+
+        :param links: `(tag_id, itemtype, items_id)` tuples
+        :return: None
+        """
+        if not links:
+            return
+        self.session.execute(
+            insert(self.glpi_plugin_tag_tagitems).prefix_with('IGNORE', dialect='mysql').values([
+                {'plugin_tag_tags_id': tag_id, 'itemtype': itemtype, 'items_id': items_id}
+                for tag_id, itemtype, items_id in links
+            ])
+        )
+        self.logger.info(f"{len(links)} tags adicionadas")
+        self.logger.debug(f"Tags adicionadas: {list(links)}")
+
+    def rule_stats(self):
+        """
+        :return: The counters of each rule (matches, tags added and evaluation time), by rule name.
+        """
+        return {rule.name: rule.stats() for rule in self.rules}
 
     def validate_config(self):
         """
@@ -156,32 +496,168 @@ class Runner:
         Handles the main job execution loop that performs routine checks and processes tasks.
 
         The loop runs indefinitely, logging the current state, checking active tasks, linking return tags,
-        processing GLPI followups, and then pauses for a pre-defined sleep time.
+        processing GLPI followups, and then pauses for the interval given by `next_interval` (or, in `binlog`
+        mode, until the watched tables change). With `metrics_port` set, the loop durations, rows scanned and tags
+        inserted are served at `/metrics`.
 
         :return: None
         """
+        if self.metrics_port:
+            start_http_server(self.metrics_port)
+        binlog_watcher = self.create_binlog_watcher() if self.change_capture == 'binlog' else None
+        interval = self.sleep_time
         while True:
+            if self.lease is not None and not self.lease.renew():
+                # Outra réplica pode já ter assumido o shard: encerra para não processá-lo em dobro
+                raise RuntimeError(f'lease do shard {self.shard_index} perdido')
             self.logger.info('running...')
-            self.check_active_tasks()
-            self.link_return_tag()
-            self.process_glpi_followups()
-            self.logger.info('sleeping...')
-            time.sleep(self.sleep_time)
+            self.cycle_rows = 0
+            started = time.perf_counter()
+            try:
+                self.check_active_tasks()
+                self.link_return_tag()
+                self.save_checkpoint()
+                self.process_glpi_followups()
+            except DBAPIError as e:
+                # Ex.: MySQL fora do ar; o pool reconecta no próximo ciclo e os alvos pendentes são mantidos
+                self.logger.info(f"Erro de banco de dados: {e}")
+                metrics.CYCLE_ERRORS.inc()
+            finally:
+                # Encerra a transação do ciclo e devolve a conexão ao pool
+                self.session.remove()
+                self.logger.info("Sessão encerrada")
+            metrics.CYCLE_SECONDS.observe(time.perf_counter() - started)
+            metrics.LAST_CYCLE.set_to_current_time()
+            interval = self.next_interval(interval, self.cycle_rows > 0)
+            self.logger.info(f'sleeping {interval:g}s...')
+            if binlog_watcher is not None:
+                binlog_watcher.wait(interval)
+            else:
+                time.sleep(interval)
+
+    def shard_condition(self, tickets_id_column):
+        """
+        :return: The condition selecting the tickets of the shard of this replica (always true without sharding).
+        """
+        if self.shard_count <= 1:
+            return true()
+        return tickets_id_column % self.shard_count == self.shard_index
+
+    def create_lease(self, name):
+        """
+        :return: A lease named `name`, on the backend chosen by `shard_lease`.
+        """
+        if self.shard_lease == 'mysql':
+            return MySQLLease(self.engine, name)
+        import redis
+
+        ttl_seconds = float(os.getenv("SHARD_LEASE_TTL", max(60.0, 3 * self.sleep_max)))
+        redis_client = redis.Redis(host=os.getenv("REDIS_HOST"), port=int(os.getenv("REDIS_PORT", 6379)))
+        return RedisLease(redis_client, name, ttl_seconds)
+
+    def assign_shard(self):
+        """
+        With `shard_lease`, waits until the lease of a free shard is taken and uses that shard. The checkpoint file
+        of a sharded runner gets the shard index as suffix, so each shard resumes from its own state.
+
+        :return: None
+        """
+        if self.shard_lease:
+            while True:
+                self.shard_index, self.lease = acquire_shard(self.create_lease, self.shard_count)
+                if self.lease is not None:
+                    break
+                self.logger.info('todos os shards estão ocupados, aguardando...')
+                time.sleep(self.sleep_time)
+        if self.shard_count > 1:
+            self.logger.info(f"Shard {self.shard_index} de {self.shard_count}")
+            if self.state_file:
+                self.state_file = f'{self.state_file}.{self.shard_index}'
+
+    def next_interval(self, interval, found_work):
+        """
+        Adaptive interval: back to `sleep_min` right after a loop that found work, doubled (up to `sleep_max`)
+        after each idle loop. The doubling starts from at least 1 second, so `SLEEP_MIN=0` (no wait while there
+        is work) still backs off when idle instead of polling the database in a tight loop.
+
+        :return: The seconds to wait before the next loop.
+        """
+        if found_work:
+            return self.sleep_min
+        return min(max(interval, self.sleep_min, 1) * 2, self.sleep_max)
+
+    def create_binlog_watcher(self):
+        """
+        Starts the `BinlogWatcher` of the `binlog` change capture mode, with the runner database credentials.
+
+        :return: The started watcher.
+        """
+        self.logger.info('starting binlog watcher...')
+        binlog_watcher = BinlogWatcher(
+            connection_settings={
+                'host': self.db_host,
+                'port': 3306,
+                'user': self.db_user,
+                'passwd': self.db_password
+            },
+            schema=self.db_database,
+            server_id=int(os.getenv("BINLOG_SERVER_ID", 4242))
+        )
+        binlog_watcher.start()
+        return binlog_watcher
 
     def create_session(self):
         """
-        Creates a new database session and initializes metadata for specific tables.
+        Declares the columns the runner uses from each table, so startup does not reflect the schema from the
+        database, and creates the scoped session registry used by every loop.
 
         :return: None
         """
         self.logger.info('creating session...')
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        self.session = scoped_session(sessionmaker(bind=self.engine))
         self.metadata = MetaData()
-        self.glpi_tickettasks = Table('glpi_tickettasks', self.metadata, autoload_with=self.engine)
-        self.glpi_itilfollowups = Table('glpi_itilfollowups', self.metadata, autoload_with=self.engine)
-        self.glpi_tickets_users = Table('glpi_tickets_users', self.metadata, autoload_with=self.engine)
-        self.glpi_plugin_tag_tagitems = Table('glpi_plugin_tag_tagitems', self.metadata, autoload_with=self.engine)
+        self.glpi_tickettasks = Table(
+            'glpi_tickettasks', self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('tickets_id', Integer),
+            Column('state', Integer),
+            Column('users_id_tech', Integer),
+            Column('date_mod', DateTime)
+        )
+        self.glpi_itilfollowups = Table(
+            'glpi_itilfollowups', self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('itemtype', String(100)),
+            Column('items_id', Integer),
+            Column('users_id', Integer)
+        )
+        self.glpi_tickets_users = Table(
+            'glpi_tickets_users', self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('tickets_id', Integer),
+            Column('users_id', Integer),
+            Column('type', Integer)
+        )
+        self.glpi_plugin_tag_tagitems = Table(
+            'glpi_plugin_tag_tagitems', self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('plugin_tag_tags_id', Integer),
+            Column('items_id', Integer),
+            Column('itemtype', String(255))
+        )
+        self.glpi_tickets = Table(
+            'glpi_tickets', self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('status', Integer),
+            Column('itilcategories_id', Integer)
+        )
+        self.glpi_groups_tickets = Table(
+            'glpi_groups_tickets', self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('tickets_id', Integer),
+            Column('groups_id', Integer),
+            Column('type', Integer)
+        )
         self.logger.info('session created...')
 
     def load_max_id(self):
@@ -197,52 +673,55 @@ class Runner:
         """
         Processes follow-ups from the GLPI ITILFollowups table.
 
-        This method fetches follow-ups from the database, filters by those which have an id greater than `max_id`, and processes them. For each follow-up, if the item type is "Ticket" and meets specific user and type criteria, it adds a tag to the ticket. It commits changes to the database and logs the actions performed or any errors encountered.
+        The follow-ups with an id greater than `max_id` are handled as sets of up to `followups_batch` rows, each
+        one read with a single query and passed to the `followup` rules (by default, tag 9 when the author is a
+        requester of the ticket), in one transaction. `max_id` only moves forward (and is checkpointed) after the
+        commit; after a long outage the backlog is caught up batch by batch.
 
         :return: None
         """
         self.logger.info('processing glpi followups...')
         try:
-
-            followups = self.session.execute(
-                select(
-                    self.glpi_itilfollowups.c.id,
-                    self.glpi_itilfollowups.c.itemtype,
-                    self.glpi_itilfollowups.c.items_id,
-                    self.glpi_itilfollowups.c.users_id
-                ).where(self.glpi_itilfollowups.c.id > self.max_id).order_by(self.glpi_itilfollowups.c.id)
-            ).fetchall()
-
-            for followup in followups:
-                self.max_id, new_itemtype, new_items_id, new_users_id = followup
-
-                if new_itemtype == 'Ticket':
-                    result = self.session.execute(
-                        select(
-                            self.glpi_tickets_users.c.tickets_id
-                        ).where(
+            while True:
+                # Lotes de até `followups_batch` followups; os que chegarem durante as consultas ficam para o próximo
+                batch = select(self.glpi_itilfollowups.c.id).where(
+                    self.glpi_itilfollowups.c.id > self.max_id
+                ).order_by(self.glpi_itilfollowups.c.id).limit(self.followups_batch).subquery()
+                last_id, batch_size = self.session.execute(select(func.max(batch.c.id), func.count())).one()
+                if last_id is None:
+                    break
+                self.cycle_rows += batch_size
+                metrics.ROWS_SCANNED.labels('followup').inc(batch_size)
+
+                rows = self.session.execute(
+                    select(
+                        self.glpi_itilfollowups.c.itemtype,
+                        self.glpi_itilfollowups.c.items_id,
+                        self.glpi_itilfollowups.c.users_id,
+                        self.glpi_tickets.c.status,
+                        self.glpi_tickets.c.itilcategories_id
+                    ).select_from(
+                        self.glpi_itilfollowups.outerjoin(
+                            self.glpi_tickets,
                             and_(
-                                self.glpi_tickets_users.c.tickets_id == new_items_id,
-                                self.glpi_tickets_users.c.type == 1,
-                                self.glpi_tickets_users.c.users_id == new_users_id
+                                self.glpi_itilfollowups.c.itemtype == 'Ticket',
+                                self.glpi_tickets.c.id == self.glpi_itilfollowups.c.items_id
                             )
                         )
-                    ).first()
-
-                    if result:
-                        self.session.execute(
-                            insert(self.glpi_plugin_tag_tagitems).values(
-                                plugin_tag_tags_id=9,
-                                items_id=new_items_id,
-                                itemtype='Ticket'
-                            )
+                    ).where(
+                        and_(
+                            self.glpi_itilfollowups.c.id > self.max_id,
+                            self.glpi_itilfollowups.c.id <= last_id,
+                            self.shard_condition(self.glpi_itilfollowups.c.items_id)
                         )
-                        self.session.commit()
-                        self.logger.info(f"Tag adicionada ao ticket {new_items_id} pelo usuário {new_users_id}")
-                    else:
-                        self.logger.info(f"O followup de ID {new_users_id} do ticket {new_items_id} não atende os requisitos!")
-                else:
-                    self.logger.info(f"Tipo de item {new_itemtype} desconhecido")
+                    )
+                )
+                self.apply_rules('followup', rows)
+                self.session.commit()
+                self.max_id = last_id
+                self.save_max_id()
+                if batch_size < self.followups_batch:
+                    break
 
         except Exception as e:
             self.logger.info(f"Erro: {e}")
@@ -250,8 +729,6 @@ class Runner:
 
         finally:
             self.logger.info(f"Max ID: {self.max_id}")
-            self.session.close()
-            self.logger.info("Sessão encerrada")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+import logging
+import uuid
+
+from sqlalchemy import text
+
+LEASE_NAME = 'glpi_tag_runner:shard:{shard_index}'
+
+
+class MySQLLease:
+    """
+    Shard lease held with ``GET_LOCK`` on a dedicated connection: MySQL releases
+    it by itself when the connection (or the replica) dies.
+    """
+
+    def __init__(self, engine, name: str) -> None:
+        self.engine = engine
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+        self._connection = None
+
+    def acquire(self) -> bool:
+        connection = self.engine.connect()
+        if connection.execute(text('SELECT GET_LOCK(:name, 0)'), {'name': self.name}).scalar() == 1:
+            self._connection = connection
+            return True
+        connection.close()
+        return False
+
+    def renew(self) -> bool:
+        """
+        :return: False when the lock was lost (e.g. its connection was dropped)
+        """
+        try:
+            owner, connection_id = self._connection.execute(
+                text('SELECT IS_USED_LOCK(:name), CONNECTION_ID()'), {'name': self.name}
+            ).one()
+            return owner == connection_id
+        except Exception as e:
+            self.logger.info(f"Lease {self.name} perdido: {e}")
+            return False
+
+    def release(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': self.name})
+            finally:
+                self._connection.close()
+                self._connection = None
+
+
+class RedisLease:
+    """
+    Shard lease stored in a Redis key with a TTL; the owner renews it every
+    loop, so the TTL must be longer than a loop plus the longest interval.
+    """
+
+    RENEW_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, redis_client, name: str, ttl_seconds: float) -> None:
+        self.redis = redis_client
+        self.name = name
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.token = uuid.uuid4().hex
+        self.logger = logging.getLogger(__name__)
+        self._renew = redis_client.register_script(self.RENEW_SCRIPT)
+        self._release = redis_client.register_script(self.RELEASE_SCRIPT)
+
+    def acquire(self) -> bool:
+        return bool(self.redis.set(self.name, self.token, nx=True, px=self.ttl_ms))
+
+    def renew(self) -> bool:
+        try:
+            return self._renew(keys=[self.name], args=[self.token, self.ttl_ms]) == 1
+        except Exception as e:
+            self.logger.info(f"Lease {self.name} perdido: {e}")
+            return False
+
+    def release(self) -> None:
+        self._release(keys=[self.name], args=[self.token])
+
+
+def acquire_shard(create_lease, shard_count: int):
+    """
+    Tries the leases of every shard once.
+
+    :param create_lease: builds the lease of a shard from its name
+    :return: ``(shard_index, lease)`` of the shard taken, or ``(None, None)`` when all of them are taken
+    """
+    for shard_index in range(shard_count):
+        lease = create_lease(LEASE_NAME.format(shard_index=shard_index))
+        if lease.acquire():
+            return shard_index, lease
+    return None, None
@@ -1,22 +1,70 @@
 # pages/Status_da_importação.py
 import streamlit as st
 import os
-from celery.result import AsyncResult
-from celery import Celery
-import pandas as pd
-from dotenv import load_dotenv
 from app_utils.auto_refresh import set_auto_refresh_controller
+from app_utils.connections import get_celery_app, get_redis_client, get_result_backend
+from glpi_importer.progress import read_progress
 
 global count
 
-load_dotenv()
-redis_host = os.getenv('REDIS_HOST')
-redis_port = os.getenv('REDIS_PORT')
-celery_app = Celery(
-    'tasks',
-    broker=f'redis://{redis_host}:{redis_port}/0',
-    backend=f'redis://{redis_host}:{redis_port}/0'
-)
+
+def show_result_toggle(task_id, result_csv_path):
+    # Fica aberto entre os reruns, para a paginação e os filtros
+    if st.toggle(f"Ver resultado da tarefa {task_id}", key=f'show_{task_id}'):
+        # pandas/pyarrow só são importados quando algum resultado é aberto
+        from app_utils.result_view import show_result
+        show_result(st, result_csv_path, task_id)
+
+
+def show_celery_state(task_id):
+    # Tarefa que ainda não publicou progresso (na fila) ou cujo progresso já expirou no Redis
+    from celery.result import AsyncResult
+
+    try:
+        task_result = AsyncResult(task_id, backend=get_result_backend(), app=get_celery_app())
+    except Exception as e:
+        task_result = None
+    if task_result is None:
+        st.error('Ocorreu um erro durante o processamento.')
+    elif task_result.state == 'PENDING':
+        st.info('A tarefa está na fila de processamento.')
+    elif task_result.state == 'SUCCESS':
+        result = task_result.result
+        if result['status'] != 'failed' and os.path.exists(result['result_csv']):
+            st.success('Processamento concluído!')
+            show_result_toggle(task_id, result['result_csv'])
+        else:
+            st.error('O processamento falhou.')
+            if result.get('result_csv'):
+                show_result_toggle(task_id, result['result_csv'])
+    else:
+        st.write(f'Status da tarefa: {task_result.state}')
+
+
+def show_progress(task_id, progress):
+    if progress['status'] == 'PROGRESS':
+        total = progress['total'] or 1
+        st.progress(min(progress['done'] / total, 1.0))
+        st.write(f"Processando linha {progress['done']} de {progress['total']} ({progress['failed']} com falha)")
+        from app_utils.task_rows import load_task_rows
+        rows = load_task_rows(st, get_redis_client(), task_id)
+        if rows is not None:
+            with st.expander('Linhas concluídas'):
+                st.dataframe(rows)
+    elif progress['status'] in ('completed', 'completed_with_fail'):
+        if progress['status'] == 'completed':
+            st.success('Processamento concluído!')
+        else:
+            st.warning(f"Processamento concluído com {progress['failed']} linhas com falha.")
+        show_result_toggle(task_id, progress['result_csv'])
+    else:
+        st.error('O processamento falhou.')
+        for error in progress['error']:
+            st.write(error)
+        # Linhas concluídas antes da falha (tickets já criados) e as demais marcadas com a falha
+        if progress['result_csv']:
+            show_result_toggle(task_id, progress['result_csv'])
+
 
 def main():
     st.title('Status do Processamento')
@@ -27,36 +75,14 @@ def main():
         st.write("Nenhuma tarefa em andamento.")
         return
 
+    # Progresso de todas as tarefas em uma única ida ao Redis
+    progress_by_task = read_progress(get_redis_client(), st.session_state.task_ids)
     for task_id in st.session_state.task_ids:
-        try:
-            task_result = AsyncResult(task_id, app=celery_app)
-            # task_result.get()
-        except Exception as e:
-            task_result = None
         st.write(f"**Tarefa ID:** {task_id}")
-        if task_result is None:
-            st.error('Ocorreu um erro durante o processamento.')
-        elif task_result.state == 'PENDING':
-            st.info('A tarefa está na fila de processamento.')
-        elif task_result.state == 'PROGRESS':
-            progress = task_result.info
-            current = progress.get('current', 0)
-            total = progress.get('total', 1)
-            percent = int((current / total) * 100)
-            st.progress(percent / 100.0)
-            st.write(f'Processando linha {current} de {total}')
-        elif task_result.state == 'SUCCESS':
-            result = task_result.result
-            if result['status'] == 'completed':
-                st.success('Processamento concluído!')
-                if st.button(f"Ver resultado da tarefa {task_id}"):
-                    result_csv_path = result['result_csv']
-                    result_df = pd.read_csv(result_csv_path)
-                    st.dataframe(result_df)
-            else:
-                st.error('O processamento falhou.')
+        if task_id in progress_by_task:
+            show_progress(task_id, progress_by_task[task_id])
         else:
-            st.write(f'Status da tarefa: {task_result.state}')
+            show_celery_state(task_id)
 
 if __name__ == '__main__':
     main()
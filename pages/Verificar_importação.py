@@ -1,23 +1,12 @@
 # pages/Verificar_importação.py
 import streamlit as st
-from celery.result import AsyncResult
-from celery import Celery
-import pandas as pd
 import os
-from dotenv import load_dotenv
 from app_utils.auto_refresh import set_auto_refresh_controller
+from app_utils.connections import get_redis_client
+from glpi_importer.progress import read_progress
 
 global count
 
-load_dotenv()
-redis_host = os.getenv('REDIS_HOST')
-redis_port = os.getenv('REDIS_PORT')
-celery_app = Celery(
-    'tasks',
-    broker=f'redis://{redis_host}:{redis_port}/0',
-    backend=f'redis://{redis_host}:{redis_port}/0'
-)
-
 def csv_finder(folder, task_id):
     filename = f'{task_id}_processed.csv'
     file = os.path.join(folder, filename)
@@ -37,43 +26,66 @@ def main():
 
     if st.button('Verificar o resultado da tarefa'):
         if task_id_input:
-            task_result = csv_finder(processed_folder, task_id_input)
-            st.write(f"**Tarefa ID:** {task_id_input}")
+            # Guardado na sessão: a tarefa continua na tela nos reruns (auto-refresh, paginação do resultado)
+            st.session_state.checked_task_id = task_id_input
+        else:
+            st.warning('Por favor, insira um ID de tarefa válido.')
+
+    checked_task_id = st.session_state.get('checked_task_id')
+    if checked_task_id:
+        st.write(f"**Tarefa ID:** {checked_task_id}")
+        progress = read_progress(get_redis_client(), [checked_task_id]).get(checked_task_id)
 
+        if progress is not None and progress['status'] == 'PROGRESS':
+            # Só as linhas concluídas desde a última verificação são lidas do Redis
+            st.progress(min(progress['done'] / (progress['total'] or 1), 1.0))
+            st.write(f"Processando linha {progress['done']} de {progress['total']} ({progress['failed']} com falha)")
+            from app_utils.task_rows import load_task_rows
+            rows = load_task_rows(st, get_redis_client(), checked_task_id)
+            if rows is not None:
+                st.dataframe(rows)
+        elif progress is not None and progress['status'] == 'failed':
+            st.error('O processamento falhou.')
+            for error in progress['error']:
+                st.write(error)
+            # Linhas concluídas antes da falha (tickets já criados) e as demais marcadas com a falha
+            if progress['result_csv']:
+                from app_utils.result_view import show_result
+                show_result(st, progress['result_csv'], checked_task_id)
+        else:
+            task_result = csv_finder(processed_folder, checked_task_id)
             if not task_result:
                 st.info('Tarefa não encontrada, ou não finalizada.')
             else:
                 st.success('Processamento da tarefa foi concluído!')
-                result_df = pd.read_csv(task_result)
-                st.dataframe(result_df)
+                from app_utils.result_view import show_result
+                show_result(st, task_result, checked_task_id)
 
-            # elif task_result.state == 'PROGRESS':
-            #     progress = task_result.info
-            #     current = progress.get('current', 0)
-            #     total = progress.get('total', 1)
-            #     percent = int((current / total) * 100)
-            #     st.progress(percent / 100.0)
-            #     st.write(f'Processando linha {current} de {total}')
-            # elif task_result.state == 'SUCCESS':
-            #     result = task_result.result
-            #     if result['status'] == 'completed':
-            #         st.success('Processamento concluído!')
-            #         # Exibir botão para ver o resultado
-            #         if st.button(f"Ver resultado da tarefa {task_id_input}"):
-            #             result_csv_path = result['result_csv']
-            #             if os.path.exists(result_csv_path):
-            #                 result_df = pd.read_csv(result_csv_path)
-            #                 st.dataframe(result_df)
-            #             else:
-            #                 st.error('O arquivo de resultado não foi encontrado.')
-            #     else:
-            #         st.error('O processamento falhou.')
-            # elif task_result.state == 'FAILURE':
-            #     st.error('Ocorreu um erro durante o processamento.')
-            # else:
-            #     st.write(f'Status da tarefa: {task_result.state}')
-        else:
-            st.warning('Por favor, insira um ID de tarefa válido.')
+        # elif task_result.state == 'PROGRESS':
+        #     progress = task_result.info
+        #     current = progress.get('current', 0)
+        #     total = progress.get('total', 1)
+        #     percent = int((current / total) * 100)
+        #     st.progress(percent / 100.0)
+        #     st.write(f'Processando linha {current} de {total}')
+        # elif task_result.state == 'SUCCESS':
+        #     result = task_result.result
+        #     if result['status'] == 'completed':
+        #         st.success('Processamento concluído!')
+        #         # Exibir botão para ver o resultado
+        #         if st.button(f"Ver resultado da tarefa {task_id_input}"):
+        #             result_csv_path = result['result_csv']
+        #             if os.path.exists(result_csv_path):
+        #                 result_df = pd.read_csv(result_csv_path)
+        #                 st.dataframe(result_df)
+        #             else:
+        #                 st.error('O arquivo de resultado não foi encontrado.')
+        #     else:
+        #         st.error('O processamento falhou.')
+        # elif task_result.state == 'FAILURE':
+        #     st.error('Ocorreu um erro durante o processamento.')
+        # else:
+        #     st.write(f'Status da tarefa: {task_result.state}')
 
 if __name__ == '__main__':
     main()
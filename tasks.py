@@ -1,15 +1,33 @@
-# tasks.py
-from asyncio import sleep
-from datetime import datetime
-from sre_constants import error
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 
-from celery import Celery
+from celery import Celery, chord, group
+from celery.backends.redis import RedisBackend
+from celery.signals import before_task_publish, task_prerun, worker_init, worker_process_shutdown, worker_shutdown
 import pandas as pd
 import time
 import os
 from dotenv import load_dotenv
 
+from glpi_client.async_interface import AsyncGLPIApiClient
 from glpi_client.interface import GLPIApiClient
+from glpi_client.rate_limit import rate_limiter_from_env
+from glpi_client.session_pool import GLPISessionPool
+from glpi_importer import metrics
+from glpi_importer.journal import ImportJournal, JournalEntry, file_digest
+from glpi_importer.plan import ImportPlan, RowPlan, iter_planned_rows
+from glpi_importer.progress import ProgressPublisher
+from glpi_importer.result_store import ParquetResultWriter, remove_columnar_files
+from glpi_importer.streaming import (
+    CSV_OPTIONS,
+    RAW_CSV_OPTIONS,
+    OrderedResultWriter,
+    count_csv_rows,
+    iter_csv_chunks,
+    path_with_suffix,
+    read_csv_header,
+    result_columns,
+)
 
 global count
 
@@ -18,107 +36,653 @@ redis_host = os.getenv('REDIS_HOST')
 redis_port = os.getenv('REDIS_PORT')
 glpi_usr = os.getenv('GLPI_APP_USER')
 glpi_pwd = os.getenv('GLPI_APP_PASS')
+# Quantidade máxima de linhas do CSV processadas ao mesmo tempo por tarefa
+import_concurrency = max(int(os.getenv('IMPORT_CONCURRENCY', 1)), 1)
+# 'threads' (GLPIApiClient + pool de threads) ou 'asyncio' (AsyncGLPIApiClient em um único event loop)
+import_engine = os.getenv('IMPORT_ENGINE', 'threads')
+# Envia todos os usuários (e depois todos os grupos) de um ticket em um único POST
+import_batch_actors = os.getenv('IMPORT_BATCH_ACTORS', '0') == '1'
+# Cria o ticket já com atores e status no mesmo POST (com fallback para o fluxo de várias chamadas)
+import_single_shot = os.getenv('IMPORT_SINGLE_SHOT', '0') == '1'
+# Espera antes de atualizar o status: 'sleep' (pausa fixa) ou 'poll' (consulta os atores com backoff)
+import_status_wait = os.getenv('IMPORT_STATUS_WAIT', 'sleep')
+# Pausa fixa no modo 'sleep' e prazo máximo da consulta no modo 'poll', em segundos
+import_ready_timeout = float(os.getenv('IMPORT_READY_TIMEOUT', 10))
+# Arquivos com mais linhas que isso são divididos em blocos processados em paralelo pelos workers (0 = desligado)
+import_chunk_rows = int(os.getenv('IMPORT_CHUNK_ROWS', 0))
+# Linhas lidas do CSV por vez; a memória do worker não depende do tamanho do arquivo
+import_read_chunk_rows = int(os.getenv('IMPORT_READ_CHUNK_ROWS', 1000))
+# Registra no Redis cada etapa concluída por linha; uma tarefa reentregue ou o mesmo arquivo enviado de novo
+# retoma de onde parou, sem duplicar tickets, atores ou tarefas
+import_journal = os.getenv('IMPORT_JOURNAL', '0') == '1'
+# Por quanto tempo (segundos) o diário de uma linha fica guardado no Redis
+import_journal_ttl = int(os.getenv('IMPORT_JOURNAL_TTL', 7 * 24 * 60 * 60))
+# Com o diário ligado (acks_late), o Redis reentrega a mensagem não confirmada depois deste tempo (segundos): tem que
+# ser maior que a importação mais longa, senão um segundo worker pega o mesmo arquivo enquanto o primeiro ainda roda
+import_visibility_timeout = int(os.getenv('IMPORT_VISIBILITY_TIMEOUT', 24 * 60 * 60))
+# Intervalo mínimo (segundos) entre publicações do progresso e das linhas concluídas no Redis
+import_progress_interval = float(os.getenv('IMPORT_PROGRESS_INTERVAL', 1))
+# Por quanto tempo (segundos) o progresso e as linhas publicadas ficam no Redis
+import_progress_ttl = int(os.getenv('IMPORT_PROGRESS_TTL', 24 * 60 * 60))
+# Grava também o resultado em Parquet (colunas tipadas e logs dos atores em tabela própria), lido em páginas pelo app
+import_result_parquet = os.getenv('IMPORT_RESULT_PARQUET', '1') == '1'
+# Porta do endpoint /metrics (Prometheus) do worker (0 = desligado)
+metrics_port = int(os.getenv('METRICS_PORT', 0))
+
+redis_url = f'redis://{redis_host}:{redis_port}/0'
+
+# Sessões do GLPI reaproveitadas por todas as tarefas deste processo do worker
+session_pool = GLPISessionPool(
+    username=glpi_usr,
+    password=glpi_pwd,
+    max_idle_seconds=float(os.getenv('GLPI_SESSION_MAX_IDLE', 300)),
+    # Limite de requisições ao GLPI compartilhado por todos os workers através do Redis do broker
+    rate_limiter=rate_limiter_from_env(redis_url=redis_url),
+)
 
 app = Celery(
     'tasks',
-    broker=f'redis://{redis_host}:{redis_port}/0',
-    backend=f'redis://{redis_host}:{redis_port}/0'
+    broker=redis_url,
+    backend=redis_url
 )
+app.conf.broker_transport_options = {'visibility_timeout': import_visibility_timeout}
 
+def _journaled(journal_entry: JournalEntry | None, step: str, method: str, kwargs: dict):
+    """
+    Yields one client call, unless the row journal already holds the result of
+    ``step``, and checkpoints the result once the call returns. Only a
+    successful result is checkpointed: a status PUT that returned ``False`` is
+    sent again when the row is resumed.
+    """
+    if journal_entry is not None and step in journal_entry:
+        return journal_entry[step]
+    result = yield method, kwargs
+    if journal_entry is not None and result is not None and result is not False:
+        yield 'record', dict(journal_entry=journal_entry, step=step, value=result)
+    return result
 
-@app.task(bind=True)
-def process_csv(self, file_path):
-    required = [
-        'ticket_name',
-        'ticket_content',
-        'task_content',
-        'ticket_actors_users', # Para a adição dos usuários no ticket
-        'ticket_actors_groups', # Para adição dos grupos no ticket
-        'Resultado'
+
+def _actor_key(actor: dict, target_str: str) -> str:
+    return f"{actor[target_str]}:{actor['type']}"
+
+
+def _parse_actors(actors: str, target_str: str) -> list:
+    # 'id:tipo,...' devolvido pelo single shot para os atores que o GLPI não criou
+    if not actors:
+        return []
+    return [
+        {target_str: int(object_id), 'type': int(type_actor)}
+        for object_id, type_actor in (pair.split(':') for pair in actors.split(','))
     ]
-    error_signal = False
-    error_list = []
+
+
+def _linked_actors(actors: list, logs: list) -> list:
+    """
+    :param logs: one log per actor, in the order of ``actors`` (as returned by :func:`_journaled_actors`)
+    :return: the actors whose POST succeeded
+    """
+    return [actor for actor, log in zip(actors, logs) if log.get('status') == 'success']
+
+
+def _journaled_actors(journal_entry: JournalEntry | None, step: str, method: str, tickets_id, actors: str | list,
+                      target_str: str, actors_arg: str):
+    """
+    Actor POSTs of one row, checkpointed per actor: the journal keeps the log
+    of each actor already linked (``{'id:type': log}``), so a resumed row only
+    sends the actors that are missing or whose POST failed.
+
+    :param actors: parsed actors (:class:`RowPlan`) or an ``'id:type,...'`` string (missing after a single shot)
+    :return: one log per actor, in the order of ``actors``
+    """
+    if isinstance(actors, str):
+        actors = _parse_actors(actors, target_str)
+    done = dict(journal_entry[step]) if journal_entry is not None and step in journal_entry else {}
+    pending = [actor for actor in actors if _actor_key(actor, target_str) not in done]
+    logs = {}
+    if pending:
+        results = yield method, {'tickets_id': tickets_id, actors_arg: pending, 'batched': import_batch_actors}
+        logs = {_actor_key(actor, target_str): log for actor, log in zip(pending, results)}
+        succeeded = {key: log for key, log in logs.items() if log.get('status') == 'success'}
+        if journal_entry is not None and succeeded:
+            done.update(succeeded)
+            yield 'record', dict(journal_entry=journal_entry, step=step, value=done)
+    return [done.get(key) or logs[key] for key in (_actor_key(actor, target_str) for actor in actors)]
+
+
+def _row_calls(row: pd.Series, row_plan: RowPlan, journal_entry: JournalEntry | None = None):
+    """
+    Call chain of one CSV row: ticket -> actors -> status -> task.
+
+    Written once as a generator so the sync and asyncio engines share it: it
+    yields ``(client_method_name, kwargs)`` and receives the result of each call
+    (``'sleep'`` and the journal ``'record'`` are handled by the engine itself). The steps of a row always run
+    in this order, so rows can be processed concurrently without breaking the
+    dependencies between calls. The request arguments come ready from the
+    :class:`RowPlan`; steps found in ``journal_entry`` are not sent again.
+    """
+    if import_single_shot and (row_plan.users or row_plan.groups):
+        yield from _single_shot_calls(row, row_plan, journal_entry)
+    else:
+        row['created_ticket_id'] = ticket_id = yield from _journaled(
+            journal_entry, 'ticket', 'add_tiket', dict(row_plan.ticket_args)
+        )
+        users = groups = []
+        if row_plan.users:
+            row['ticket_actors_users_response'] = yield from _journaled_actors(
+                journal_entry, 'users', 'add_ticket_user_actors', ticket_id, row_plan.users, 'users_id', 'actors_users'
+            )
+            users = _linked_actors(row_plan.users, row['ticket_actors_users_response'])
+        if row_plan.groups:
+            row['ticket_actors_groups_response'] = yield from _journaled_actors(
+                journal_entry, 'groups', 'add_ticket_group_actors', ticket_id, row_plan.groups, 'groups_id', 'actors_groups'
+            )
+            groups = _linked_actors(row_plan.groups, row['ticket_actors_groups_response'])
+        if row_plan.users or row_plan.groups:
+            yield from _status_calls(row, row_plan, ticket_id, journal_entry, users, groups)
+    if row_plan.status != 6:
+        row['created_task_id'] = yield from _journaled(journal_entry, 'task', 'add_task_on_ticket', dict(
+            tickets_id=row['created_ticket_id'],
+            **row_plan.task_args
+        ))
+    row['Resultado'] = "OK"
+
+
+def _status_calls(row: pd.Series, row_plan: RowPlan, ticket_id, journal_entry: JournalEntry | None,
+                  users: list, groups: list):
+    """
+    Wait between adding the actors and the status PUT, then the PUT. ``sleep``
+    keeps the fixed pause; ``poll`` asks GLPI until the actors are linked, with
+    backoff and a deadline. The time spent goes to the ``ticket_ready_wait``
+    column. A status already in the journal skips both, and a row without
+    status has nothing to restore.
+
+    :param users: actors whose POST succeeded, the only ones ``poll`` waits for
+        (a rejected actor never shows up and would hold the row until the deadline)
+    :param groups: same, for the groups
+    """
+    if row_plan.status is None:
+        return
+    if journal_entry is None or 'status' not in journal_entry:
+        if import_status_wait == 'poll':
+            if users or groups:
+                row['ticket_ready_wait'] = yield 'wait_ticket_ready', dict(
+                    tickets_id=ticket_id,
+                    actors_users=users,
+                    actors_groups=groups,
+                    timeout=import_ready_timeout
+                )
+            else:
+                row['ticket_ready_wait'] = 0
+        else:
+            yield 'sleep', dict(seconds=import_ready_timeout)
+            row['ticket_ready_wait'] = import_ready_timeout
+    row['ticket_update_status_response'] = yield from _journaled(journal_entry, 'status', 'update_ticket_status', dict(
+        tickets_id=ticket_id,
+        status_id=row_plan.status
+    ))
+
+
+def _single_shot_calls(row: pd.Series, row_plan: RowPlan, journal_entry: JournalEntry | None):
+    """
+    Ticket created with actors and status in the same POST. Whatever GLPI did not
+    honor falls back to the multi-call flow: missing actors go through the actor
+    endpoints (followed by the usual wait and status PUT) and a wrong status gets
+    a direct PUT.
+    """
+    created = yield from _journaled(journal_entry, 'single_shot', 'add_ticket_single_shot', dict(
+        actors_users=row_plan.users,
+        actors_groups=row_plan.groups,
+        **row_plan.ticket_args
+    ))
+    row['created_ticket_id'] = ticket_id = created['ticket_id']
+    if row_plan.users:
+        row['ticket_actors_users_response'] = created['users_response']
+    if row_plan.groups:
+        row['ticket_actors_groups_response'] = created['groups_response']
+
+    # Atores que o GLPI já criou com o ticket, mais os do fallback que deram certo
+    missing_users = _parse_actors(created['missing_users'], 'users_id')
+    missing_groups = _parse_actors(created['missing_groups'], 'groups_id')
+    users = [actor for actor in row_plan.users if actor not in missing_users]
+    groups = [actor for actor in row_plan.groups if actor not in missing_groups]
+    if missing_users:
+        logs = yield from _journaled_actors(
+            journal_entry, 'users', 'add_ticket_user_actors', ticket_id, missing_users, 'users_id', 'actors_users'
+        )
+        row['ticket_actors_users_response'] += logs
+        users += _linked_actors(missing_users, logs)
+    if missing_groups:
+        logs = yield from _journaled_actors(
+            journal_entry, 'groups', 'add_ticket_group_actors', ticket_id, missing_groups, 'groups_id', 'actors_groups'
+        )
+        row['ticket_actors_groups_response'] += logs
+        groups += _linked_actors(missing_groups, logs)
+    if missing_users or missing_groups:
+        yield from _status_calls(row, row_plan, ticket_id, journal_entry, users, groups)
+    elif not created['status_honored']:
+        row['ticket_update_status_response'] = yield from _journaled(journal_entry, 'status', 'update_ticket_status', dict(
+            tickets_id=ticket_id,
+            status_id=row_plan.status
+        ))
+    else:
+        row['ticket_update_status_response'] = True
+
+
+def process_row(glpi_client: GLPIApiClient, row: pd.Series, row_plan: RowPlan,
+                journal_entry: JournalEntry | None = None) -> tuple[pd.Series, str | None]:
+    """
+    Runs :func:`_row_calls` with the synchronous client.
+
+    :return: the mutated row and the error message (None when the row succeeded)
+    """
+    try:
+        calls = _row_calls(row, row_plan, journal_entry)
+        result = None
+        while True:
+            try:
+                method, kwargs = calls.send(result)
+            except StopIteration:
+                break
+            if method == 'sleep':
+                result = time.sleep(kwargs['seconds'])
+            elif method == 'record':
+                result = kwargs['journal_entry'].record(kwargs['step'], kwargs['value'])
+            else:
+                result = getattr(glpi_client, method)(**kwargs)
+        return row, None
+    except Exception as e:
+        row['Resultado'] = f'FALHA: {e}'
+        return row, str(e)
+
+
+async def process_row_async(glpi_client: AsyncGLPIApiClient, row: pd.Series, row_plan: RowPlan,
+                            journal_entry: JournalEntry | None = None) -> tuple[pd.Series, str | None]:
+    """
+    Runs :func:`_row_calls` with the asyncio client.
+    """
+    try:
+        calls = _row_calls(row, row_plan, journal_entry)
+        result = None
+        while True:
+            try:
+                method, kwargs = calls.send(result)
+            except StopIteration:
+                break
+            if method == 'sleep':
+                result = await asyncio.sleep(kwargs['seconds'])
+            elif method == 'record':
+                result = await kwargs['journal_entry'].record_async(kwargs['step'], kwargs['value'])
+            else:
+                result = await getattr(glpi_client, method)(**kwargs)
+        return row, None
+    except Exception as e:
+        row['Resultado'] = f'FALHA: {e}'
+        return row, str(e)
+
+
+def _run_rows_threaded(rows, on_row_done) -> None:
+    """
+    :param rows: iterator of ``(position, row, row_plan, journal_entry)``; it is consumed
+        as rows finish, so at most ``import_concurrency`` rows are held by the engine
+    """
+    def run(row, row_plan, journal_entry):
+        # Cada linha em andamento usa uma sessão própria do pool
+        with session_pool.session() as glpi_client:
+            return process_row(glpi_client, row, row_plan, journal_entry)
+
+    with ThreadPoolExecutor(max_workers=import_concurrency) as executor:
+        pending = {}
+        try:
+            for position, row, row_plan, journal_entry in rows:
+                pending[executor.submit(run, row, row_plan, journal_entry)] = position
+                if len(pending) >= import_concurrency:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        on_row_done(pending.pop(future), *future.result())
+            for future in as_completed(list(pending)):
+                on_row_done(pending.pop(future), *future.result())
+        except Exception:
+            # As linhas já enviadas terminam e entram no resultado antes de a falha subir
+            for future in as_completed(list(pending)):
+                if future.exception() is None:
+                    on_row_done(pending.pop(future), *future.result())
+            raise
+
+
+async def _run_rows_async(rows, on_row_done) -> None:
+    # Uma única sessão (emprestada do pool) e um único pool de conexões atendem todas as linhas em andamento
+    pooled_client = session_pool.acquire()
     try:
-        glpi_client = GLPIApiClient(
+        async with AsyncGLPIApiClient(
             username=glpi_usr,
             password=glpi_pwd,
+            max_connections=import_concurrency,
+            session_token=pooled_client.session_token,
+            retry_policy=session_pool.retry_policy,
+            rate_limiter=session_pool.rate_limiter,
+        ) as glpi_client:
+
+            async def run(position, row, row_plan, journal_entry):
+                return position, await process_row_async(glpi_client, row, row_plan, journal_entry)
+
+            def finish_rows(done):
+                for task in done:
+                    position, (processed_row, error) = task.result()
+                    on_row_done(position, processed_row, error)
+
+            # Ler o CSV e o diário, gravar o resultado e publicar o progresso bloqueiam (arquivo e Redis): rodam no
+            # executor, um de cada vez (esta corrotina espera cada um), para não parar as linhas em andamento
+            loop = asyncio.get_running_loop()
+
+            async def finish(done):
+                await loop.run_in_executor(None, finish_rows, done)
+
+            pending = set()
+            try:
+                while (planned := await loop.run_in_executor(None, next, rows, None)) is not None:
+                    pending.add(asyncio.create_task(run(*planned)))
+                    if len(pending) >= import_concurrency:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        await finish(done)
+                if pending:
+                    done, pending = await asyncio.wait(pending)
+                    await finish(done)
+            except Exception:
+                # As linhas já enviadas terminam e entram no resultado antes de a falha subir
+                if pending:
+                    done, _ = await asyncio.wait(pending)
+                    await finish([task for task in done if task.exception() is None])
+                raise
+            finally:
+                # A sessão pode ter sido renovada após um 401
+                pooled_client.session_token = glpi_client.session_token
+    finally:
+        session_pool.release(pooled_client)
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def close_glpi_sessions(**kwargs):
+    session_pool.close_all()
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    # Processo principal do worker, antes do pool de processos filhos
+    if metrics_port:
+        metrics.start_metrics_server(metrics_port)
+
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    # Tarefas publicadas pelo próprio worker (chord do fan-out); o app Streamlit envia o cabeçalho no send_task
+    headers['published_at'] = time.time()
+
+
+@task_prerun.connect
+def observe_queue_wait(task=None, **kwargs):
+    published_at = task.request.get('published_at')
+    if published_at is not None:
+        metrics.QUEUE_WAIT_SECONDS.labels(task.name).observe(max(time.time() - published_at, 0))
+
+
+def _import_journal(task_id: str, upload_digest: str | None) -> ImportJournal | None:
+    if not import_journal or upload_digest is None:
+        return None
+    return ImportJournal(app.backend.client, upload_digest, task_id, ttl_seconds=import_journal_ttl)
+
+
+def _progress_publisher(task_id: str, on_publish, total_rows: int | None = None) -> ProgressPublisher:
+    # Backends sem cliente Redis (execução eager com backend em memória) só atualizam o estado do Celery
+    return ProgressPublisher(
+        app.backend.client if isinstance(app.backend, RedisBackend) else None,
+        task_id,
+        total_rows=total_rows,
+        min_interval=import_progress_interval,
+        ttl_seconds=import_progress_ttl,
+        on_publish=on_publish,
+    )
+
+
+def _planned_rows(file_path: str, plan: ImportPlan, journal: ImportJournal | None, row_offset: int, on_row_done):
+    """
+    Rows handed to the engines, with their :class:`RowPlan` and journal entry.
+    Malformed rows are finished here with their error and never reach GLPI.
+    """
+    for position, row, row_plan in iter_planned_rows(file_path, import_read_chunk_rows, plan):
+        if row_plan.error is not None:
+            row['Resultado'] = f'FALHA: {row_plan.error}'
+            on_row_done(position, row, row_plan.error)
+            continue
+        journal_entry = None
+        if journal is not None:
+            journal_entry = journal.entry(ImportJournal.row_hash(row_offset + position, row, plan.columns))
+        yield position, row, row_plan, journal_entry
+
+
+def _import_rows(file_path: str, result_csv_path: str, progress: ProgressPublisher,
+                 journal: ImportJournal | None = None, row_offset: int = 0) -> list:
+    """
+    Streams the upload through the configured engine: rows are read
+    ``import_read_chunk_rows`` at a time and appended to the result CSV (and
+    its Parquet copy, with ``import_result_parquet``), in upload order, as
+    they finish.
+
+    :param progress: gets the outcome of each row and publishes them every ``import_progress_interval`` seconds
+    :param journal: checkpoints of the upload; steps already recorded for a row are skipped
+    :param row_offset: position of the first row of ``file_path`` in the upload (fan-out chunks)
+    :return: the row errors
+    """
+    error_list = []
+    plan = ImportPlan(read_csv_header(file_path))
+    columns = result_columns(plan.columns + ['Resultado'])
+    columnar = ParquetResultWriter(result_csv_path, columns, row_offset=row_offset) if import_result_parquet else None
+    writer = OrderedResultWriter(result_csv_path, columns, columnar=columnar)
+    processed_rows = 0
+    started = time.perf_counter()
+
+    def on_row_done(position, processed_row, error):
+        nonlocal processed_rows
+        writer.add(position, processed_row)
+        if error is not None:
+            error_list.append(error)
+        metrics.IMPORT_ROWS.labels('ok' if error is None else 'failed').inc()
+        processed_rows += 1
+        progress.row_done(row_offset + position, processed_row, error)
+
+    rows = _planned_rows(file_path, plan, journal, row_offset, on_row_done)
+    try:
+        if import_engine == 'asyncio':
+            asyncio.run(_run_rows_async(rows, on_row_done))
+        else:
+            _run_rows_threaded(rows, on_row_done)
+    except Exception as e:
+        _fail_pending_rows(file_path, writer, str(e))
+        raise
+    finally:
+        # Mesmo em caso de erro o resultado é fechado: as linhas concluídas (tickets já criados) ficam com os ids
+        writer.close()
+        progress.publish()
+    metrics.observe_import(processed_rows, time.perf_counter() - started)
+    print('GLPI retries (processo):', session_pool.retry_policy.counters())
+    return error_list
+
+
+def _fail_pending_rows(file_path: str, writer: OrderedResultWriter, error: str) -> None:
+    """
+    Adds to ``writer`` every row of the upload that did not finish, marked with
+    the error that stopped the import, with its cells as they are in the file.
+    """
+    position = 0
+    for chunk in iter_csv_chunks(file_path, import_read_chunk_rows, **RAW_CSV_OPTIONS):
+        for _, row in chunk.iterrows():
+            if not writer.is_added(position):
+                row['Resultado'] = f'FALHA: {error}'
+                writer.add(position, row)
+            position += 1
+
+
+def _processed_csv_path(task_id: str) -> str:
+    return os.getenv('PROCESSED_FOLDER') + '/' + task_id + '_processed.csv'
+
+
+def _import_result(result_csv_path: str, error_list: list) -> dict:
+    if error_list:
+        return {'status': 'completed_with_fail','result_csv': result_csv_path, 'error': error_list}
+    return {'status': 'completed', 'result_csv': result_csv_path}
+
+
+def _fan_out_signature(file_path: str, total_rows: int, parent_id: str, upload_digest: str | None):
+    """
+    Splits the upload in files of ``import_chunk_rows`` rows and builds a chord:
+    one :func:`process_csv_chunk` per file, spread over every worker, merged by
+    :func:`merge_processed_chunks`.
+    """
+    chunk_tasks = []
+    for index, chunk in enumerate(iter_csv_chunks(file_path, import_chunk_rows, **RAW_CSV_OPTIONS)):
+        chunk_path = path_with_suffix(file_path, f'_chunk{index}')
+        chunk.to_csv(chunk_path, index=False, **CSV_OPTIONS)
+        chunk_tasks.append(
+            process_csv_chunk.s(chunk_path, parent_id, total_rows, upload_digest, index * import_chunk_rows)
         )
-        df = pd.read_csv(file_path, sep=';', encoding='utf-8', )
+    return chord(group(chunk_tasks), merge_processed_chunks.s(total_rows))
+
+
+# Com o diário ligado, a mensagem só é confirmada ao final: se o worker cair, a tarefa é reentregue e retomada
+@app.task(bind=True, acks_late=import_journal, reject_on_worker_lost=import_journal)
+def process_csv(self, file_path):
+    progress = _progress_publisher(
+        self.request.id,
+        lambda current, total: self.update_state(state='PROGRESS', meta={'current': current, 'total': total})
+    )
+    try:
+        # Cabeçalho inválido: o arquivo é recusado antes de qualquer chamada ao GLPI
+        ImportPlan(read_csv_header(file_path))
+        total_rows = count_csv_rows(file_path)
+        upload_digest = file_digest(file_path) if import_journal else None
     except Exception as e:
         self.update_state(state='FAILURE', meta={'error': str(e)})
+        progress.finish('failed', error=[str(e)])
         print(e)
         return {'status': 'failed', 'error': str(e)}
+    progress.start(total_rows)
 
-    total_rows = len(df)
-    result_data = []
-    df['Resultado'] = 'WAIT'
+    if import_chunk_rows and total_rows > import_chunk_rows:
+        # A tarefa é substituída pelo chord: o callback herda o id desta tarefa, então a página de status e o
+        # arquivo {task_id}_processed.csv continuam usando o mesmo id
+        self.update_state(state='PROGRESS', meta={'current': 0, 'total': total_rows})
+        return self.replace(_fan_out_signature(file_path, total_rows, self.request.id, upload_digest))
 
-    for index, row in df.iterrows():
-        print('--- row ---')
-        print(row)
-        print('-----------')
-
-        self.update_state(state='PROGRESS', meta={'current': index + 1, 'total': total_rows})
-        try:
-            print('trying')
-            enable_ticket_add_users = 'ticket_actors_users' in df.columns
-            enable_ticket_add_groups = 'ticket_actors_groups' in df.columns
-            ticket_extra_args = task_extra_args = {}
-            ticket_extra_columns = [col for col in df.columns if col not in required and col.find('ticket_') != -1]
-            task_extra_columns = [col for col in df.columns if col not in required and col.find('task_') != -1]
-
-            if ticket_extra_columns:
-                print('ticket_extra_columns')
-                ticket_extra_args = { col.replace('ticket_', ''): row[col] for col in ticket_extra_columns }
-                print(ticket_extra_args)
-            if task_extra_columns:
-                print('task_extra_columns')
-                task_extra_args = { col.replace('task_', ''): row[col] for col in task_extra_columns}
-                print(task_extra_args)
-
-            row['created_ticket_id'] = ticket_id = glpi_client.add_tiket(
-                name=row['ticket_name'],
-                content=row['ticket_content'],
-                **ticket_extra_args
-            )
-            if enable_ticket_add_users:
-                row['ticket_actors_users_response'] = glpi_client.add_ticket_user_actors(
-                    tickets_id=ticket_id,
-                    actors_users=row['ticket_actors_users']
-                )
-            if enable_ticket_add_groups:
-                row['ticket_actors_groups_response'] = glpi_client.add_ticket_group_actors(
-                    tickets_id=row['created_ticket_id'],
-                    actors_groups=row['ticket_actors_groups']
-                )
-            if enable_ticket_add_groups or enable_ticket_add_users:
-                time.sleep(10)
-                row['ticket_update_status_response'] = glpi_client.update_ticket_status(
-                    tickets_id=row['created_ticket_id'],
-                    status_id=row['ticket_status']
-                )
-            if str(ticket_extra_args.get('status')) != '6':
-                row['created_task_id'] = glpi_client.add_task_on_ticket(
-                    tickets_id=row['created_ticket_id'],
-                    content=row['task_content'],
-                    **task_extra_args
-                )
-            row['Resultado'] = "OK"
-        except Exception as e:
-            error_signal = True
-            error_list.append(str(e))
-            row['Resultado'] = f'FALHA: {e}'
-
-        # Exemplo de processamento (substitua pela sua lógica)
-        processed_row = row  # Implementar a lógica de processamento aqui
-        result_data.append(processed_row)
-
-    # Salvar resultado em um novo arquivo CSV
-    result_df = pd.DataFrame(result_data)
-    result_csv_path = os.getenv('PROCESSED_FOLDER') + '/' + self.request.id + '_processed.csv'
+    # Salvar resultado em um novo arquivo CSV, linha a linha, conforme o processamento avança
+    result_csv_path = _processed_csv_path(self.request.id)
     # result_csv_path = file_path.replace('.csv', '_processed.csv').replace('temp_files', os.getenv('PROCESSED_FOLDER'))
+    try:
+        error_list = _import_rows(
+            file_path,
+            result_csv_path,
+            progress,
+            journal=_import_journal(self.request.id, upload_digest),
+        )
+    except Exception as e:
+        self.update_state(state='FAILURE', meta={'error': str(e)})
+        # O resultado parcial mostra o que já foi criado no GLPI antes da falha
+        partial_csv_path = result_csv_path if os.path.exists(result_csv_path) else None
+        progress.finish('failed', result_csv=partial_csv_path, error=[str(e)])
+        print(e)
+        return {'status': 'failed', 'result_csv': partial_csv_path, 'error': str(e)}
+    result = _import_result(result_csv_path, error_list)
+    progress.finish(result['status'], result_csv=result_csv_path, error=error_list)
+    return result
 
-    result_df.to_csv(result_csv_path, index=False)
-    if error_signal:
-        return {'status': 'completed_with_fail','result_csv': result_csv_path, 'error': error_list}
-    return {'status': 'completed', 'result_csv': result_csv_path}
+
+@app.task(bind=True, acks_late=import_journal, reject_on_worker_lost=import_journal)
+def process_csv_chunk(self, chunk_path, parent_id, total_rows, upload_digest=None, row_offset=0):
+    """
+    Imports one chunk created by :func:`process_csv`. Progress is summed in the
+    progress hash of the parent task id, shared by the chunks, and also
+    published as the PROGRESS state of the parent task.
+    """
+    progress = _progress_publisher(
+        parent_id,
+        lambda current, total: self.app.backend.store_result(parent_id, {'current': current, 'total': total}, 'PROGRESS'),
+        total_rows=total_rows,
+    )
+    result_csv_path = path_with_suffix(chunk_path, '_processed')
+    try:
+        error_list = _import_rows(
+            chunk_path,
+            result_csv_path,
+            progress,
+            journal=_import_journal(parent_id, upload_digest),
+            row_offset=row_offset,
+        )
+    except Exception as e:
+        print(e)
+        # O resultado do bloco já traz as linhas concluídas antes da falha e as demais marcadas com ela
+        if os.path.exists(result_csv_path):
+            return {'status': 'failed', 'chunk': chunk_path, 'result_csv': result_csv_path, 'error': [str(e)]}
+        return {'status': 'failed', 'chunk': chunk_path, 'error': [str(e)]}
+    return {'status': 'completed', 'chunk': chunk_path, 'result_csv': result_csv_path, 'error': error_list}
+
+
+def _merge_failed_chunk(writer: OrderedResultWriter, columnar: ParquetResultWriter | None, chunk_result: dict,
+                        chunk_csv_path: str) -> None:
+    """
+    Chunk that failed without closing its result. The rows already in its
+    ``.part`` (tickets created before the failure) are kept with their ids;
+    only the rows after them are marked with the failure.
+    """
+    done_rows = 0
+    partial_path = chunk_csv_path + '.part'
+    if os.path.exists(partial_path):
+        # Escrito pelo OrderedResultWriter (separador padrão), em ordem: as linhas formam o início do bloco
+        for frame in pd.read_csv(partial_path, chunksize=import_read_chunk_rows, **RAW_CSV_OPTIONS):
+            writer.append_frame(frame)
+            if columnar is not None:
+                columnar.write(frame)
+            done_rows += len(frame)
+        os.remove(partial_path)
+    position = 0
+    for frame in iter_csv_chunks(chunk_result['chunk'], import_read_chunk_rows, **RAW_CSV_OPTIONS):
+        skip = max(done_rows - position, 0)
+        position += len(frame)
+        if skip >= len(frame):
+            continue
+        frame = frame.iloc[skip:].assign(Resultado=f"FALHA: {'; '.join(chunk_result['error'])}")
+        writer.append_frame(frame)
+        if columnar is not None:
+            columnar.write(frame)
+
+
+@app.task(bind=True)
+def merge_processed_chunks(self, chunk_results, total_rows):
+    """
+    Chord callback of the fan-out: appends the chunk results, in upload order,
+    to ``{task_id}_processed.csv`` (and its Parquet copy). It runs with the id
+    of the original :func:`process_csv` task.
+    """
+    error_list = []
+    columns = result_columns(read_csv_header(chunk_results[0]['chunk']) + ['Resultado'])
+    result_csv_path = _processed_csv_path(self.request.id)
+    writer = OrderedResultWriter(result_csv_path, columns)
+    # Os blocos já gravaram o próprio Parquet: ele é copiado direto, sem passar pelo CSV (que perde os tipos)
+    columnar = ParquetResultWriter(result_csv_path, columns) if import_result_parquet else None
+    for chunk_result in chunk_results:
+        error_list.extend(chunk_result['error'])
+        chunk_csv_path = path_with_suffix(chunk_result['chunk'], '_processed')
+        if 'result_csv' in chunk_result:
+            # Copiado sem reler com o pandas, que inferiria tipos de novo (ids com vazios viram float)
+            writer.append_csv(chunk_result['result_csv'])
+            os.remove(chunk_result['result_csv'])
+            if columnar is not None:
+                columnar.append_file(chunk_csv_path)
+        else:
+            _merge_failed_chunk(writer, columnar, chunk_result, chunk_csv_path)
+        remove_columnar_files(chunk_csv_path)
+        os.remove(chunk_result['chunk'])
+    if columnar is not None:
+        columnar.close()
+    writer.close()
+    result = _import_result(result_csv_path, error_list)
+    _progress_publisher(self.request.id, None).finish(result['status'], result_csv=result_csv_path, error=error_list)
+    return result
@@ -0,0 +1,6 @@
+import os
+
+# tasks.py lê a configuração ao ser importado; nenhum teste conecta no Redis ou no GLPI de verdade
+os.environ.setdefault('REDIS_HOST', 'localhost')
+os.environ.setdefault('REDIS_PORT', '6379')
+os.environ.setdefault('GLPI_RATE_LIMIT_SCOPE', 'local')
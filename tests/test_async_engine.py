@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from itertools import count
+
+import fakeredis
+import pandas as pd
+import pytest
+
+import tasks
+from glpi_importer.journal import ImportJournal
+from glpi_importer.progress import ProgressPublisher
+from glpi_importer.streaming import CSV_OPTIONS
+
+
+class ThreadRecordingRedis:
+    """FakeRedis that notes the thread of every call, to catch round trips made on the event loop."""
+
+    def __init__(self, threads):
+        self._redis = fakeredis.FakeRedis()
+        self._threads = threads
+
+    def __getattr__(self, name):
+        self._threads.append(threading.current_thread())
+        return getattr(self._redis, name)
+
+
+class FakeAsyncClient:
+    def __init__(self, **kwargs):
+        self.session_token = kwargs['session_token']
+        self.ids = count(100)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def add_tiket(self, **kwargs):
+        await asyncio.sleep(0)
+        return next(self.ids)
+
+    async def add_task_on_ticket(self, **kwargs):
+        await asyncio.sleep(0)
+        return next(self.ids)
+
+
+class PooledClient:
+    session_token = 'sessao'
+
+
+@pytest.fixture
+def asyncio_engine(monkeypatch):
+    monkeypatch.setattr(tasks, 'import_engine', 'asyncio')
+    monkeypatch.setattr(tasks, 'import_concurrency', 3)
+    monkeypatch.setattr(tasks, 'import_read_chunk_rows', 4)
+    monkeypatch.setattr(tasks, 'import_result_parquet', False)
+    monkeypatch.setattr(tasks, 'AsyncGLPIApiClient', FakeAsyncClient)
+    monkeypatch.setattr(tasks.session_pool, 'acquire', lambda: PooledClient())
+    monkeypatch.setattr(tasks.session_pool, 'release', lambda client: None)
+
+
+def test_journal_and_progress_stay_off_the_event_loop(tmp_path, asyncio_engine):
+    file_path = tmp_path / 'upload.csv'
+    pd.DataFrame({
+        'ticket_name': [f'Ticket {index}' for index in range(10)],
+        'ticket_content': ['a'] * 10,
+        'task_content': ['x'] * 10,
+    }).to_csv(file_path, index=False, **CSV_OPTIONS)
+    threads = []
+    journal = ImportJournal(ThreadRecordingRedis(threads), 'upload', 'task')
+    progress = ProgressPublisher(ThreadRecordingRedis(threads), 'task', total_rows=10, min_interval=0)
+    loop_thread = threading.current_thread()
+
+    errors = tasks._import_rows(str(file_path), str(tmp_path / 'upload_processed.csv'), progress, journal=journal)
+
+    assert errors == []
+    assert pd.read_csv(tmp_path / 'upload_processed.csv')['Resultado'].tolist() == ['OK'] * 10
+    # Cada linha lê o diário e grava ticket e tarefa; o progresso é publicado a cada linha
+    assert len(threads) >= 10 * 3
+    # asyncio.run roda o loop nesta thread: nenhuma ida ao Redis pode acontecer nela
+    assert [thread for thread in threads if thread is loop_thread] == []
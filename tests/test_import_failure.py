@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+from itertools import count
+
+import pandas as pd
+import pytest
+
+import tasks
+from glpi_importer.progress import ProgressPublisher
+from glpi_importer.streaming import CSV_OPTIONS
+
+
+class FakeClient:
+    def __init__(self):
+        self.ids = count(100)
+
+    def add_tiket(self, **kwargs):
+        return next(self.ids)
+
+    def add_task_on_ticket(self, **kwargs):
+        return next(self.ids)
+
+
+class FailingJournal:
+    """Journal whose Redis goes away after ``healthy_rows`` rows."""
+
+    def __init__(self, healthy_rows):
+        self.healthy_rows = healthy_rows
+
+    def entry(self, row_hash):
+        if self.healthy_rows == 0:
+            raise ConnectionError('Redis fora do ar')
+        self.healthy_rows -= 1
+        return None
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    client = FakeClient()
+
+    @contextmanager
+    def session():
+        yield client
+
+    monkeypatch.setattr(tasks.session_pool, 'session', session)
+    monkeypatch.setattr(tasks, 'import_engine', 'threads')
+    monkeypatch.setattr(tasks, 'import_concurrency', 2)
+    monkeypatch.setattr(tasks, 'import_read_chunk_rows', 2)
+    monkeypatch.setattr(tasks, 'import_result_parquet', False)
+    file_path = tmp_path / 'upload.csv'
+    pd.DataFrame({
+        'ticket_name': ['A', 'B', 'C', 'D', 'E'],
+        'ticket_content': ['a', 'b', 'c', 'd', 'e'],
+        'task_content': ['x', 'y', 'z', 'w', '007'],
+    }).to_csv(file_path, index=False, **CSV_OPTIONS)
+    return str(file_path)
+
+
+def test_failed_import_keeps_finished_rows(tmp_path, upload):
+    result_csv_path = str(tmp_path / 'upload_processed.csv')
+
+    with pytest.raises(ConnectionError):
+        tasks._import_rows(upload, result_csv_path, ProgressPublisher(None, 'task'), journal=FailingJournal(3))
+
+    result = pd.read_csv(result_csv_path, dtype=str, keep_default_na=False)
+    # As linhas enviadas antes da falha mantêm os ids criados; as demais ficam como vieram, marcadas com a falha
+    assert result['Resultado'].tolist() == ['OK'] * 3 + ['FALHA: Redis fora do ar'] * 2
+    assert all(result['created_ticket_id'][:3] != '')
+    assert result['created_ticket_id'][3:].tolist() == ['', '']
+    assert result['task_content'].tolist() == ['x', 'y', 'z', 'w', '007']
+    assert not (tmp_path / 'upload_processed.csv.part').exists()
@@ -0,0 +1,192 @@
+import fakeredis
+import pandas as pd
+import pytest
+
+import tasks
+from glpi_importer.journal import ImportJournal
+from glpi_importer.plan import RowPlan
+
+
+def _run_row(row_plan, journal_entry, responses):
+    """
+    Drives ``tasks._row_calls`` answering each call with ``responses[method]``.
+
+    :return: the calls sent, as ``(method, kwargs)``
+    """
+    calls = []
+    generator = tasks._row_calls(pd.Series({'Resultado': 'WAIT'}, dtype=object), row_plan, journal_entry)
+    result = None
+    while True:
+        try:
+            method, kwargs = generator.send(result)
+        except StopIteration:
+            return calls
+        if method == 'record':
+            # Tratado pelo motor, como o 'sleep'
+            result = kwargs['journal_entry'].record(kwargs['step'], kwargs['value'])
+            continue
+        calls.append((method, kwargs))
+        response = responses[method]
+        result = response(kwargs) if callable(response) else response
+
+
+def _actor_logs(status_by_user):
+    def respond(kwargs):
+        return [
+            {'ticket': kwargs['tickets_id'], 'action': 'add_user_actor', 'status': status_by_user[actor['users_id']]}
+            for actor in kwargs['actors_users']
+        ]
+    return respond
+
+
+@pytest.fixture
+def journal():
+    return ImportJournal(fakeredis.FakeRedis(), 'upload', 'task')
+
+
+@pytest.fixture
+def row_plan():
+    return RowPlan(
+        ticket_args={'name': 'Ticket', 'content': 'Conteúdo', 'status': 5},
+        task_args={'content': 'Tarefa'},
+        users=[{'users_id': 2, 'type': 1}, {'users_id': 7, 'type': 2}],
+        groups=[],
+        status=5,
+    )
+
+
+def test_resume_retries_failed_actors_and_status(monkeypatch, journal, row_plan):
+    monkeypatch.setattr(tasks, 'import_single_shot', False)
+    monkeypatch.setattr(tasks, 'import_status_wait', 'poll')
+
+    first = _run_row(row_plan, journal.entry('row'), {
+        'add_tiket': 10,
+        'add_ticket_user_actors': _actor_logs({2: 'success', 7: 'fail'}),
+        'wait_ticket_ready': 0.1,
+        'update_ticket_status': False,
+        'add_task_on_ticket': 20,
+    })
+    assert [method for method, _ in first] == [
+        'add_tiket', 'add_ticket_user_actors', 'wait_ticket_ready', 'update_ticket_status', 'add_task_on_ticket'
+    ]
+
+    # Retomada: o ticket e a tarefa não são criados de novo; só o ator que falhou e o status são reenviados
+    resumed = _run_row(row_plan, journal.entry('row'), {
+        'add_ticket_user_actors': _actor_logs({7: 'success'}),
+        'wait_ticket_ready': 0.1,
+        'update_ticket_status': True,
+    })
+    assert [method for method, _ in resumed] == ['add_ticket_user_actors', 'wait_ticket_ready', 'update_ticket_status']
+    assert resumed[0][1]['actors_users'] == [{'users_id': 7, 'type': 2}]
+    assert resumed[0][1]['tickets_id'] == 10
+
+    # Tudo concluído: nada mais é enviado
+    assert _run_row(row_plan, journal.entry('row'), {}) == []
+
+
+def test_failed_steps_are_not_recorded(monkeypatch, journal, row_plan):
+    monkeypatch.setattr(tasks, 'import_single_shot', False)
+    monkeypatch.setattr(tasks, 'import_status_wait', 'poll')
+
+    _run_row(row_plan, journal.entry('row'), {
+        'add_tiket': 10,
+        'add_ticket_user_actors': _actor_logs({2: 'fail', 7: 'fail'}),
+        'wait_ticket_ready': 0.1,
+        'update_ticket_status': False,
+        'add_task_on_ticket': 20,
+    })
+
+    entry = journal.entry('row')
+    assert 'ticket' in entry and 'task' in entry
+    assert 'users' not in entry
+    assert 'status' not in entry
+
+
+def test_visibility_timeout_covers_long_imports():
+    # acks_late com o timeout padrão (1 h) reentregaria importações longas a um segundo worker
+    assert tasks.app.conf.broker_transport_options['visibility_timeout'] == tasks.import_visibility_timeout
+    assert tasks.import_visibility_timeout > 60 * 60
+
+
+def test_single_shot_missing_actors_are_journaled_per_actor(monkeypatch, journal, row_plan):
+    monkeypatch.setattr(tasks, 'import_single_shot', True)
+    monkeypatch.setattr(tasks, 'import_status_wait', 'poll')
+    created = {
+        'ticket_id': 10,
+        'users_response': [{'ticket': 10, 'action': 'add_user_actor', 'status': 'success'}],
+        'groups_response': [],
+        'missing_users': '7:2',
+        'missing_groups': '',
+        'status_honored': False,
+    }
+
+    _run_row(row_plan, journal.entry('row'), {
+        'add_ticket_single_shot': created,
+        'add_ticket_user_actors': _actor_logs({7: 'fail'}),
+        'wait_ticket_ready': 0.1,
+        'update_ticket_status': True,
+        'add_task_on_ticket': 20,
+    })
+    resumed = _run_row(row_plan, journal.entry('row'), {
+        'add_ticket_user_actors': _actor_logs({7: 'success'}),
+    })
+
+    # O status já foi gravado na primeira passada: nem a espera nem o PUT se repetem
+    assert [method for method, _ in resumed] == ['add_ticket_user_actors']
+    assert resumed[0][1]['actors_users'] == [{'users_id': 7, 'type': 2}]
+
+
+def test_poll_waits_only_for_linked_actors(monkeypatch, row_plan):
+    monkeypatch.setattr(tasks, 'import_single_shot', False)
+    monkeypatch.setattr(tasks, 'import_status_wait', 'poll')
+
+    calls = dict(_run_row(row_plan, None, {
+        'add_tiket': 10,
+        'add_ticket_user_actors': _actor_logs({2: 'success', 7: 'fail'}),
+        'wait_ticket_ready': 0.1,
+        'update_ticket_status': True,
+        'add_task_on_ticket': 20,
+    }))
+
+    # O ator recusado nunca aparece no Ticket_User: esperar por ele seguraria a linha até o prazo
+    assert calls['wait_ticket_ready']['actors_users'] == [{'users_id': 2, 'type': 1}]
+    assert calls['wait_ticket_ready']['actors_groups'] == []
+
+
+def test_poll_skipped_when_no_actor_was_linked(monkeypatch, row_plan):
+    monkeypatch.setattr(tasks, 'import_single_shot', False)
+    monkeypatch.setattr(tasks, 'import_status_wait', 'poll')
+
+    calls = _run_row(row_plan, None, {
+        'add_tiket': 10,
+        'add_ticket_user_actors': _actor_logs({2: 'fail', 7: 'fail'}),
+        'update_ticket_status': True,
+        'add_task_on_ticket': 20,
+    })
+
+    assert [method for method, _ in calls] == [
+        'add_tiket', 'add_ticket_user_actors', 'update_ticket_status', 'add_task_on_ticket'
+    ]
+
+
+def test_single_shot_poll_waits_for_honored_and_fallback_actors(monkeypatch, row_plan):
+    monkeypatch.setattr(tasks, 'import_single_shot', True)
+    monkeypatch.setattr(tasks, 'import_status_wait', 'poll')
+    row_plan.users.append({'users_id': 9, 'type': 3})
+
+    calls = dict(_run_row(row_plan, None, {
+        'add_ticket_single_shot': {
+            'ticket_id': 10,
+            'users_response': [{'ticket': 10, 'action': 'add_user_actor', 'status': 'success'}],
+            'groups_response': [],
+            'missing_users': '7:2,9:3',
+            'missing_groups': '',
+            'status_honored': False,
+        },
+        'add_ticket_user_actors': _actor_logs({7: 'fail', 9: 'success'}),
+        'wait_ticket_ready': 0.1,
+        'update_ticket_status': True,
+        'add_task_on_ticket': 20,
+    }))
+
+    assert calls['wait_ticket_ready']['actors_users'] == [{'users_id': 2, 'type': 1}, {'users_id': 9, 'type': 3}]
@@ -0,0 +1,114 @@
+import os
+
+import pandas as pd
+import pytest
+
+import tasks
+from glpi_importer.progress import ProgressPublisher
+from glpi_importer.streaming import CSV_OPTIONS, OrderedResultWriter, path_with_suffix, result_columns
+
+INPUT_COLUMNS = ['ticket_name', 'ticket_content', 'ticket_status', 'task_content']
+ROWS = [
+    {'ticket_name': 'A', 'ticket_content': 'a', 'ticket_status': 2, 'task_content': 'x',
+     'Resultado': 'OK', 'created_ticket_id': 10, 'created_task_id': 20},
+    # Fechado: sem tarefa, created_task_id fica vazio
+    {'ticket_name': 'B', 'ticket_content': 'b', 'ticket_status': 6, 'task_content': 'y',
+     'Resultado': 'OK', 'created_ticket_id': 11},
+    {'ticket_name': 'C', 'ticket_content': 'c', 'ticket_status': 2, 'task_content': 'z',
+     'Resultado': 'OK', 'created_ticket_id': 12, 'created_task_id': 21},
+]
+
+
+def _write_result(path, rows):
+    writer = OrderedResultWriter(str(path), result_columns(INPUT_COLUMNS + ['Resultado']))
+    for position, row in enumerate(rows):
+        writer.add(position, pd.Series(row, dtype=object))
+    writer.close()
+
+
+def test_path_with_suffix_only_changes_the_file_name():
+    assert path_with_suffix('/data/uploads.csv/abc.csv', '_chunk0') == '/data/uploads.csv/abc_chunk0.csv'
+
+
+def test_ids_with_gaps_stay_integers(tmp_path):
+    result_path = tmp_path / 'direct.csv'
+    _write_result(result_path, ROWS)
+
+    assert pd.read_csv(result_path, dtype=str, keep_default_na=False)['created_task_id'].tolist() == ['20', '', '21']
+
+
+@pytest.fixture
+def merge_env(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROCESSED_FOLDER', str(tmp_path))
+    monkeypatch.setattr(tasks, 'import_result_parquet', False)
+    monkeypatch.setattr(tasks, '_progress_publisher', lambda task_id, on_publish, total_rows=None: ProgressPublisher(
+        None, task_id, total_rows=total_rows
+    ))
+
+
+def _chunk(tmp_path, index, rows):
+    chunk_path = tmp_path / f'upload_chunk{index}.csv'
+    pd.DataFrame(rows)[INPUT_COLUMNS].to_csv(chunk_path, index=False, **CSV_OPTIONS)
+    return str(chunk_path)
+
+
+def test_merged_result_matches_direct_result(tmp_path, merge_env):
+    _write_result(tmp_path / 'direct.csv', ROWS)
+    chunk_results = []
+    for index, rows in enumerate([ROWS[:2], ROWS[2:]]):
+        chunk_path = _chunk(tmp_path, index, rows)
+        result_csv = path_with_suffix(chunk_path, '_processed')
+        _write_result(result_csv, rows)
+        chunk_results.append({'status': 'completed', 'chunk': chunk_path, 'result_csv': result_csv, 'error': []})
+
+    result = tasks.merge_processed_chunks.apply(args=[chunk_results, len(ROWS)], task_id='merged').result
+
+    assert result['status'] == 'completed'
+    with open(tmp_path / 'direct.csv', 'rb') as direct, open(result['result_csv'], 'rb') as merged:
+        assert merged.read() == direct.read()
+    assert sorted(os.listdir(tmp_path)) == ['direct.csv', 'merged_processed.csv']
+
+
+def test_failed_chunk_keeps_its_cells_as_written(tmp_path, merge_env):
+    rows = [dict(ROWS[0], ticket_status=''), dict(ROWS[1], ticket_status='007')]
+    chunk_path = _chunk(tmp_path, 0, rows)
+    chunk_results = [{'status': 'failed', 'chunk': chunk_path, 'error': ['GLPI fora do ar']}]
+
+    result = tasks.merge_processed_chunks.apply(args=[chunk_results, len(rows)], task_id='merged').result
+
+    merged = pd.read_csv(result['result_csv'], dtype=str, keep_default_na=False)
+    assert merged['ticket_status'].tolist() == ['', '007']
+    assert merged['Resultado'].tolist() == ['FALHA: GLPI fora do ar'] * 2
+
+
+def test_failed_chunk_keeps_rows_finished_before_the_failure(tmp_path, merge_env, monkeypatch):
+    monkeypatch.setattr(tasks, 'import_read_chunk_rows', 2)
+    chunk_path = _chunk(tmp_path, 0, ROWS)
+    # O bloco parou depois da primeira linha, sem fechar o resultado
+    _write_result(tmp_path / 'partial.csv', ROWS[:1])
+    os.replace(tmp_path / 'partial.csv', path_with_suffix(chunk_path, '_processed') + '.part')
+    chunk_results = [{'status': 'failed', 'chunk': chunk_path, 'error': ['Sessão recusada']}]
+
+    result = tasks.merge_processed_chunks.apply(args=[chunk_results, len(ROWS)], task_id='merged').result
+
+    merged = pd.read_csv(result['result_csv'], dtype=str, keep_default_na=False)
+    assert merged['Resultado'].tolist() == ['OK', 'FALHA: Sessão recusada', 'FALHA: Sessão recusada']
+    assert merged['created_ticket_id'].tolist() == ['10', '', '']
+    assert merged['ticket_name'].tolist() == ['A', 'B', 'C']
+    assert sorted(os.listdir(tmp_path)) == ['merged_processed.csv']
+
+
+def test_failed_chunk_with_closed_result_is_copied(tmp_path, merge_env):
+    chunk_path = _chunk(tmp_path, 0, ROWS)
+    result_csv = path_with_suffix(chunk_path, '_processed')
+    failed_rows = [ROWS[0], dict(ROWS[1], Resultado='FALHA: Redis fora do ar', created_ticket_id=None),
+                   dict(ROWS[2], Resultado='FALHA: Redis fora do ar', created_ticket_id=None, created_task_id=None)]
+    _write_result(result_csv, failed_rows)
+    chunk_results = [{'status': 'failed', 'chunk': chunk_path, 'result_csv': result_csv, 'error': ['Redis fora do ar']}]
+
+    result = tasks.merge_processed_chunks.apply(args=[chunk_results, len(ROWS)], task_id='merged').result
+
+    assert result['status'] == 'completed_with_fail'
+    merged = pd.read_csv(result['result_csv'], dtype=str, keep_default_na=False)
+    assert merged['created_ticket_id'].tolist() == ['10', '', '']
+    assert merged['Resultado'].tolist()[0] == 'OK'
@@ -0,0 +1,46 @@
+import httpx
+
+from glpi_client.payloads import batched_actor_logs
+
+
+def test_mixed_207_gives_one_log_per_actor_in_order():
+    response = httpx.Response(207, json=[
+        {'id': 31, 'message': ''},
+        {'id': False, 'message': 'Usuário inexistente'},
+        {'id': 33, 'message': ''},
+    ])
+
+    logs = batched_actor_logs(10, 'add_user_actor', 3, response.status_code, response)
+
+    assert [log['status'] for log in logs] == ['success', 'fail', 'success']
+    assert logs[1]['response'] == 'Usuário inexistente'
+    assert all(log['ticket'] == 10 and log['action'] == 'add_user_actor' for log in logs)
+
+
+def test_201_marks_every_actor_as_success():
+    response = httpx.Response(201, json=[{'id': 31, 'message': ''}, {'id': 32, 'message': ''}])
+
+    logs = batched_actor_logs(10, 'add_group_actor', 2, response.status_code, response)
+
+    assert logs == [{'ticket': 10, 'action': 'add_group_actor', 'status': 'success'}] * 2
+
+
+def test_list_with_other_length_fails_every_actor():
+    # Sem uma entrada por ator não há como saber qual foi criado
+    response = httpx.Response(207, json=[{'id': 31, 'message': ''}])
+
+    logs = batched_actor_logs(10, 'add_user_actor', 3, response.status_code, response)
+
+    assert len(logs) == 3
+    assert [log['status'] for log in logs] == ['fail'] * 3
+    assert all(log['response'] == response.text for log in logs)
+
+
+def test_non_json_error_body_fails_every_actor():
+    response = httpx.Response(500, text='<html>Internal Server Error</html>')
+
+    logs = batched_actor_logs(10, 'add_user_actor', 2, response.status_code, response)
+
+    assert logs == [{
+        'ticket': 10, 'action': 'add_user_actor', 'status': 'fail', 'response': '<html>Internal Server Error</html>'
+    }] * 2
@@ -0,0 +1,65 @@
+import pandas as pd
+
+from glpi_importer.plan import ImportPlan, iter_planned_rows
+from glpi_importer.streaming import CSV_OPTIONS
+
+
+def test_prepare_without_extra_columns(tmp_path):
+    # Sem colunas ticket_*/task_* extras (ex.: sem task_state), nenhuma linha pode ser descartada
+    file_path = tmp_path / 'minimal.csv'
+    pd.DataFrame({
+        'ticket_name': ['Primeiro', 'Segundo', 'Terceiro'],
+        'ticket_content': ['a', 'b', 'c'],
+        'task_content': ['x', 'y', 'z'],
+    }).to_csv(file_path, index=False, **CSV_OPTIONS)
+    plan = ImportPlan(['ticket_name', 'ticket_content', 'task_content'])
+
+    rows = list(iter_planned_rows(str(file_path), 2, plan))
+
+    assert [position for position, _, _ in rows] == [0, 1, 2]
+    assert [row_plan.ticket_args for _, _, row_plan in rows] == [
+        {'name': 'Primeiro', 'content': 'a'},
+        {'name': 'Segundo', 'content': 'b'},
+        {'name': 'Terceiro', 'content': 'c'},
+    ]
+    assert [row_plan.task_args for _, _, row_plan in rows] == [{'content': 'x'}, {'content': 'y'}, {'content': 'z'}]
+    assert all(row_plan.error is None for _, _, row_plan in rows)
+
+
+def test_prepare_with_extra_columns():
+    plan = ImportPlan(['ticket_name', 'ticket_content', 'task_content', 'ticket_status', 'task_state'])
+    frame = pd.DataFrame({
+        'ticket_name': ['Primeiro', ''],
+        'ticket_content': ['a', 'b'],
+        'task_content': ['x', 'y'],
+        'ticket_status': [2, 5],
+        'task_state': [1, 2],
+    })
+
+    plans = plan.prepare(frame)
+
+    assert len(plans) == 2
+    assert plans[0].ticket_args == {'name': 'Primeiro', 'content': 'a', 'status': 2}
+    assert plans[0].task_args == {'content': 'x', 'state': 1}
+    assert plans[0].status == 2
+    assert plans[1].error == 'ticket_name vazio'
+
+
+def test_prepare_rejects_non_integer_status():
+    plan = ImportPlan(['ticket_name', 'ticket_content', 'task_content', 'ticket_status'])
+    frame = pd.DataFrame({
+        'ticket_name': ['Primeiro', 'Segundo', 'Terceiro', ''],
+        'ticket_content': ['a', 'b', 'c', 'd'],
+        'task_content': ['x', 'y', 'z', 'w'],
+        'ticket_status': ['2', '2.5', 'novo', '1.5'],
+    })
+
+    # Deve rejeitar as linhas, e não levantar TypeError no meio da importação
+    plans = plan.prepare(frame)
+
+    assert [row_plan.error for row_plan in plans] == [
+        None, 'ticket_status inválido', 'ticket_status inválido', 'ticket_name vazio'
+    ]
+    assert plans[0].ticket_args['status'] == 2
+    assert plans[1].ticket_args['status'] is None
+    assert plans[3].status is None
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+import fakeredis
+import pandas as pd
+
+from glpi_importer.progress import ProgressPublisher, read_new_rows, read_progress
+
+
+def test_module_does_not_import_pandas():
+    # As páginas do Streamlit importam o módulo a cada carga; o pandas só entra quando um resultado é aberto
+    code = 'import sys, glpi_importer.progress; sys.exit("pandas" in sys.modules)'
+    assert subprocess.run([sys.executable, '-c', code]).returncode == 0
+
+
+def test_rows_are_read_incrementally():
+    redis_client = fakeredis.FakeRedis()
+    publisher = ProgressPublisher(redis_client, 'task', min_interval=3600)
+    publisher.start(3)
+    publisher.row_done(0, pd.Series({'Resultado': 'OK', 'created_ticket_id': 10, 'created_task_id': float('nan')}), None)
+    publisher.row_done(1, pd.Series({'Resultado': 'FALHA: erro'}), 'erro')
+    publisher.publish()
+
+    rows, last_id = read_new_rows(redis_client, 'task')
+    assert rows == [
+        {'position': 0, 'Resultado': 'OK', 'created_ticket_id': '10', 'created_task_id': ''},
+        {'position': 1, 'Resultado': 'FALHA: erro', 'created_ticket_id': '', 'created_task_id': ''},
+    ]
+
+    publisher.row_done(2, pd.Series({'Resultado': 'OK'}), None)
+    publisher.finish('completed_with_fail', result_csv='/tmp/result.csv', error=['erro'])
+
+    rows, _ = read_new_rows(redis_client, 'task', last_id)
+    assert [row['position'] for row in rows] == [2]
+    assert read_progress(redis_client, ['task', 'unknown']) == {'task': {
+        'status': 'completed_with_fail', 'total': 3, 'done': 3, 'failed': 1,
+        'result_csv': '/tmp/result.csv', 'error': ['erro'],
+    }}
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from glpi_client.rate_limit import RedisTokenBucket
+
+
+class SlowRedis:
+    """Redis client stub whose script answers after ``delay`` seconds, like a slow EVALSHA."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    def register_script(self, script):
+        def run(keys, args):
+            time.sleep(self.delay)
+            return '0'
+        return run
+
+
+def test_redis_bucket_does_not_block_the_event_loop():
+    bucket = RedisTokenBucket(SlowRedis(0.2), key='test', rate=100)
+    ticks = []
+
+    async def ticker():
+        for _ in range(10):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def acquire():
+        await bucket.acquire_async()
+        return time.monotonic()
+
+    async def main():
+        _, acquired_at = await asyncio.gather(ticker(), acquire())
+        return acquired_at
+
+    acquired_at = asyncio.run(main())
+
+    # As outras corrotinas continuam rodando enquanto o script do Redis responde
+    assert len([tick for tick in ticks if tick < acquired_at]) == 10
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from glpi_client.error import ClientGlpiError401
+from glpi_client.interface import GLPIApiClient
+from glpi_client.retry import RetryPolicy
+
+ENDPOINT = 'http://glpi.test/apirest.php'
+
+
+def _response(status_code, headers=None):
+    return httpx.Response(status_code, headers=headers)
+
+
+@pytest.mark.parametrize('status_code', [500, 502, 504])
+def test_post_not_retried_when_glpi_may_have_processed_it(status_code):
+    # Repetir um POST que o GLPI pode ter gravado duplicaria o ticket
+    assert not RetryPolicy().should_retry('POST', 0, response=_response(status_code))
+
+
+@pytest.mark.parametrize('status_code', [429, 503])
+def test_post_retried_when_glpi_did_not_process_it(status_code):
+    assert RetryPolicy().should_retry('POST', 0, response=_response(status_code))
+
+
+def test_post_retried_only_when_the_request_was_never_sent():
+    policy = RetryPolicy()
+
+    assert policy.should_retry('POST', 0, error=httpx.ConnectError('recusada'))
+    assert not policy.should_retry('POST', 0, error=httpx.ReadTimeout('sem resposta'))
+
+
+@pytest.mark.parametrize('method', ['GET', 'PUT'])
+@pytest.mark.parametrize('status_code', [500, 502, 503, 504])
+def test_idempotent_requests_retried_on_5xx(method, status_code):
+    policy = RetryPolicy()
+
+    assert policy.should_retry(method, 0, response=_response(status_code))
+    assert policy.should_retry(method, 0, error=httpx.ReadTimeout('sem resposta'))
+    assert not policy.should_retry(method, 0, response=_response(404))
+
+
+def test_attempts_run_out():
+    policy = RetryPolicy(attempts=3)
+
+    assert policy.should_retry('GET', 1, response=_response(503))
+    assert not policy.should_retry('GET', 2, response=_response(503))
+
+
+def test_retry_after_in_seconds_is_capped():
+    policy = RetryPolicy(max_backoff=30)
+
+    assert policy.delay(0, _response(503, {'Retry-After': '7'})) == 7
+    assert policy.delay(0, _response(503, {'Retry-After': '120'})) == 30
+
+
+def test_retry_after_as_http_date_is_capped():
+    policy = RetryPolicy(max_backoff=30)
+    soon = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(minutes=5), usegmt=True)
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(minutes=5), usegmt=True)
+
+    assert 8 <= policy.delay(0, _response(503, {'Retry-After': soon})) <= 10
+    assert policy.delay(0, _response(503, {'Retry-After': later})) == 30
+    assert policy.delay(0, _response(503, {'Retry-After': past})) == 0
+
+
+def test_backoff_without_retry_after_stays_below_the_cap():
+    policy = RetryPolicy(backoff=0.5, max_backoff=2)
+
+    assert all(0 <= policy.delay(retry) <= 2 for retry in range(10))
+
+
+@pytest.fixture
+def glpi(monkeypatch):
+    """
+    Client talking to a ``MockTransport``: ``handlers`` answers each ``'METHOD /path'``
+    and ``requests`` keeps what was sent, with the session token used.
+    """
+    monkeypatch.setenv('GLPI_API_ENDPOINT', ENDPOINT)
+    monkeypatch.setattr('glpi_client.interface.time.sleep', lambda seconds: None)
+    requests = []
+    handlers = {}
+
+    def handle(request):
+        key = f"{request.method} {request.url.path.removeprefix('/apirest.php')}"
+        requests.append((key, request.headers.get('Session-Token')))
+        return handlers[key](request)
+
+    client = GLPIApiClient('glpi', 'glpi', session_token='expirado', retry_policy=RetryPolicy(attempts=3))
+    client._api_client = httpx.Client(transport=httpx.MockTransport(handle))
+    return client, handlers, requests
+
+
+def test_401_refreshes_the_session_once_and_replays(glpi):
+    client, handlers, requests = glpi
+    handlers['POST /initSession'] = lambda request: httpx.Response(200, json={'session_token': 'novo'})
+    handlers['POST /Ticket'] = lambda request: (
+        httpx.Response(201, json={'id': 42}) if request.headers['Session-Token'] == 'novo' else httpx.Response(401)
+    )
+
+    assert client.add_tiket('Ticket', 'Conteúdo') == 42
+    assert [key for key, _ in requests] == ['POST /Ticket', 'POST /initSession', 'POST /Ticket']
+    assert requests[2][1] == 'novo'
+    assert client.retry_policy.counters() == {'POST /Ticket': {'session_refresh': 1}}
+
+
+def test_second_401_is_not_replayed(glpi):
+    client, handlers, requests = glpi
+    handlers['POST /initSession'] = lambda request: httpx.Response(200, json={'session_token': 'novo'})
+    handlers['POST /Ticket'] = lambda request: httpx.Response(401)
+
+    with pytest.raises(ClientGlpiError401):
+        client.add_tiket('Ticket', 'Conteúdo')
+    assert [key for key, _ in requests] == ['POST /Ticket', 'POST /initSession', 'POST /Ticket']
+
+
+def test_post_500_is_sent_once(glpi):
+    client, handlers, requests = glpi
+    handlers['POST /Ticket'] = lambda request: httpx.Response(500)
+
+    response = client._request('POST', ENDPOINT + '/Ticket', json={})
+
+    assert response.status_code == 500
+    assert [key for key, _ in requests] == ['POST /Ticket']
+
+
+def test_post_503_is_retried_until_it_succeeds(glpi):
+    client, handlers, requests = glpi
+    responses = iter([httpx.Response(503), httpx.Response(201, json={'id': 42})])
+    handlers['POST /Ticket'] = lambda request: next(responses)
+
+    assert client.add_tiket('Ticket', 'Conteúdo') == 42
+    assert [key for key, _ in requests] == ['POST /Ticket', 'POST /Ticket']
+    assert client.retry_policy.counters() == {'POST /Ticket': {'retry': 1}}
+
+
+def test_get_retried_on_read_timeout(glpi):
+    client, handlers, requests = glpi
+    outcomes = iter([httpx.ReadTimeout('sem resposta'), httpx.Response(200, json=[])])
+
+    def respond(request):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    handlers['GET /Ticket/1/Ticket_User'] = respond
+
+    response = client._request('GET', ENDPOINT + '/Ticket/1/Ticket_User')
+
+    assert response.status_code == 200
+    assert len(requests) == 2
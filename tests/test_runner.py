@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from benchmarks.tag_runner import PHASES, glpi_plugin_tag_tagitems, metadata, seed, simulate_changes
+from glpi_tag_manager.runner import Runner
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setenv('SLEEP_MIN', '0')
+    monkeypatch.setenv('SLEEP_MAX', '30')
+    engine = create_engine('sqlite://')
+    # Tabelas do GLPI vazias, declaradas pelo benchmark do runner
+    metadata.create_all(engine)
+    return Runner(engine=engine)
+
+
+def test_idle_interval_backs_off_from_zero_sleep_min(runner):
+    intervals = []
+    interval = runner.sleep_min
+    for _ in range(6):
+        interval = runner.next_interval(interval, found_work=False)
+        intervals.append(interval)
+
+    # Com SLEEP_MIN=0 o runner ocioso não pode ficar consultando o banco sem pausa
+    assert intervals == [2, 4, 8, 16, 30, 30]
+
+
+def test_interval_resets_after_work(runner):
+    assert runner.next_interval(16, found_work=True) == 0
+    assert runner.next_interval(0, found_work=False) == 2
+
+
+@pytest.mark.filterwarnings('error::DeprecationWarning')
+def test_linked_tags_are_not_duplicated(monkeypatch):
+    for variable in ('RUNNER_STATE_FILE', 'SHARD_LEASE', 'SHARD_COUNT', 'CHANGE_CAPTURE'):
+        monkeypatch.delenv(variable, raising=False)
+    engine = create_engine('sqlite://')
+    open_tasks = seed(engine, tickets=50, tasks=80, followups=80, users=10, tagged=0.2)
+    runner = Runner(engine=engine)
+    tags = glpi_plugin_tag_tagitems.c
+    rng = np.random.default_rng(1)
+
+    for _ in range(2):
+        # Tarefas fechadas e follow-ups novos em tickets que já têm parte das tags
+        simulate_changes(engine, open_tasks, 20, 40, 50, 10, rng)
+        for phase in PHASES:
+            getattr(runner, phase)()
+        runner.save_checkpoint()
+        runner.session.remove()
+
+    with engine.connect() as connection:
+        duplicated = connection.execute(
+            select(tags.plugin_tag_tags_id, tags.itemtype, tags.items_id)
+            .group_by(tags.plugin_tag_tags_id, tags.itemtype, tags.items_id)
+            .having(func.count() > 1)
+        ).all()
+    assert sum(rule.tagged for rule in runner.rules) > 0
+    assert duplicated == []
+
+
+def _cycle(runner):
+    # Mesma ordem do job
+    runner.check_active_tasks()
+    runner.link_return_tag()
+    runner.save_checkpoint()
+    runner.process_glpi_followups()
+    runner.session.remove()
+
+
+@pytest.mark.parametrize('tracking', ['snapshot', 'incremental'])
+def test_followup_batches_do_not_rewrite_active_tasks(tmp_path, monkeypatch, tracking):
+    for variable in ('SHARD_LEASE', 'SHARD_COUNT', 'CHANGE_CAPTURE'):
+        monkeypatch.delenv(variable, raising=False)
+    state_file = str(tmp_path / 'runner.json')
+    monkeypatch.setenv('RUNNER_STATE_FILE', state_file)
+    monkeypatch.setenv('TASKS_TRACKING', tracking)
+    monkeypatch.setenv('FOLLOWUPS_BATCH', '10')
+    engine = create_engine('sqlite://')
+    open_tasks = seed(engine, tickets=50, tasks=80, followups=80, users=10, tagged=0.2)
+    runner = Runner(engine=engine)
+    writes = []
+    write_state = runner.write_state
+    monkeypatch.setattr(runner, 'write_state', lambda path, state: (writes.append(path), write_state(path, state)))
+    rng = np.random.default_rng(1)
+
+    simulate_changes(engine, open_tasks, 5, 45, 50, 10, rng)
+    _cycle(runner)
+    # 45 follow-ups em lotes de 10: max_id a cada lote, as tarefas ativas uma vez no ciclo
+    assert writes.count(state_file) == 1
+    assert writes.count(runner.max_id_file) == 5
+
+    writes.clear()
+    simulate_changes(engine, open_tasks, 0, 3, 50, 10, rng)
+    _cycle(runner)
+    # Só follow-ups novos: o conjunto de tarefas não mudou e não é regravado
+    assert writes == [runner.max_id_file]
+
+    restarted = Runner(engine=engine)
+    assert restarted.max_id == runner.max_id
+    if tracking == 'incremental':
+        assert restarted.active_task_ids == runner.active_task_ids
+    else:
+        assert restarted.active_tasks.values.tolist() == runner.active_tasks.values.tolist()